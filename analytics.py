@@ -0,0 +1,302 @@
+import csv
+import io
+import itertools
+import os
+from collections import OrderedDict
+import numpy as np
+
+# ---------------------------
+# Streaming Columnar Analytics Engine
+# ---------------------------
+# Datasets are registered once and referred to by a short handle (e.g. "ds-1"), so agent
+# tools only exchange handles and compact summaries instead of whole CSV dumps.
+# Files are scanned in fixed-size chunks that are converted into NumPy columns, and
+# aggregations are folded chunk by chunk, so memory stays bounded for multi-GB CSVs.
+# When a CSV has an up-to-date columnar store (columnar.py), aggregations read its
+# memory-mapped columns instead and never parse text. Only the ANALYTICS_MAX_DATASETS most
+# recently used handles are kept, so memory stays flat over thousands of agent runs.
+
+CHUNK_ROWS = int(os.getenv("ANALYTICS_CHUNK_ROWS", "200000"))
+MAX_DATASETS = int(os.getenv("ANALYTICS_MAX_DATASETS", "256"))
+UNDATED = int(np.iinfo(np.int32).min)  # Day number (and period key) of rows whose date doesn't parse.
+UNDATED_LABEL = "undated"
+
+_datasets = OrderedDict()
+_handle_counter = itertools.count(1)
+
+
+class Dataset:
+    """A registered CSV source: either a file path or an in-memory CSV string."""
+
+    def __init__(self, handle, name, columns, path=None, text=None):
+        self.handle = handle
+        self.name = name
+        self.columns = columns
+        self.path = path
+        self.text = text
+        self.columnar = None  # columnar.ColumnarTable when an up-to-date store exists.
+        self.cleaned = False
+        self.row_count = None
+        self.dropped_rows = None
+
+    @property
+    def value_column(self) -> str:
+        """Revenue (quantity * price) for transactional data, otherwise the first numeric-looking column."""
+        if "quantity" in self.columns and "price" in self.columns:
+            return "revenue"
+        return self.columns[1] if len(self.columns) > 1 else self.columns[0]
+
+    def open(self):
+        if self.path is not None:
+            return open(self.path, newline="", encoding="utf-8")
+        return io.StringIO(self.text)
+
+    def summary(self) -> str:
+        parts = [f"Dataset handle: {self.handle}", f"source: {self.name}", f"columns: {', '.join(self.columns)}"]
+        if self.columnar is not None:
+            parts.append("format: columnar")
+        if self.row_count is not None:
+            parts.append(f"rows: {self.row_count}")
+        if self.dropped_rows:
+            parts.append(f"dropped rows: {self.dropped_rows}")
+        return "; ".join(parts)
+
+
+def _register(name, path=None, text=None) -> Dataset:
+    with (open(path, newline="", encoding="utf-8") if path is not None else io.StringIO(text)) as f:
+        header = next(csv.reader(f), [])
+    columns = [column.strip().lower() for column in header]
+    handle = f"ds-{next(_handle_counter)}"
+    dataset = Dataset(handle, name, columns, path=path, text=text)
+    _datasets[handle] = dataset
+    while len(_datasets) > MAX_DATASETS:
+        _datasets.popitem(last=False)
+    return dataset
+
+
+def register_csv(path: str, use_columnar: bool = True) -> Dataset:
+    """Register a CSV file; only its header is read now (and the columnar store's metadata, if fresh)."""
+    dataset = _register(os.path.basename(path), path=path)
+    if use_columnar:
+        import columnar
+        dataset.columnar = columnar.open_fresh(path)
+    return dataset
+
+
+def register_text(name: str, csv_text: str) -> Dataset:
+    """Register a small in-memory CSV string (e.g. the demo monthly/quarterly data)."""
+    return _register(name, text=csv_text)
+
+
+def get_dataset(handle: str) -> Dataset:
+    handle = handle.strip()
+    if handle not in _datasets:
+        raise KeyError(f"Unknown dataset handle '{handle}'. Call load_data first.")
+    _datasets.move_to_end(handle)
+    return _datasets[handle]
+
+
+def _period_keys(dates: np.ndarray, group_by: str) -> np.ndarray:
+    """Vectorized YYYY-MM or YYYY-Qn keys from ISO date strings."""
+    months = dates.astype("U7")
+    if group_by == "month":
+        return months
+    month_numbers = np.char.partition(months, "-")[:, 2].astype(np.int64)
+    quarters = (month_numbers - 1) // 3 + 1
+    return np.char.add(np.char.add(dates.astype("U4"), "-Q"), quarters.astype("U1"))
+
+
+def day_numbers(dates: np.ndarray) -> np.ndarray:
+    """Days since 1970-01-01 for ISO date strings; UNDATED where a date doesn't parse."""
+    try:
+        days = dates.astype("datetime64[D]").astype(np.int64)
+    except ValueError:
+        days = np.full(len(dates), UNDATED, dtype=np.int64)
+        for i, date in enumerate(dates.tolist()):
+            try:
+                days[i] = np.datetime64(date, "D").astype(np.int64)
+            except ValueError:
+                pass
+    days[days == np.iinfo(np.int64).min] = UNDATED  # NaT
+    return days
+
+
+def iter_chunks(dataset: Dataset, chunk_rows: int = None):
+    """
+    Yield (columns, dropped) per chunk, where columns maps column name -> NumPy array
+    (plus a 'value' column) and dropped counts malformed rows skipped in that chunk.
+    """
+    chunk_rows = chunk_rows or CHUNK_ROWS
+    columns = dataset.columns
+    width = len(columns)
+    numeric = [c for c in columns if c in ("quantity", "price")] or [dataset.value_column]
+    with dataset.open() as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        while True:
+            raw_rows = list(itertools.islice(reader, chunk_rows))
+            if not raw_rows:
+                return
+            rows = [row for row in raw_rows if len(row) == width]
+            ragged = len(raw_rows) - len(rows)
+            if not rows:
+                yield {c: np.array([], dtype=str) for c in columns} | {"value": np.array([])}, ragged
+                continue
+            table = np.array(rows, dtype=str)
+            valid = np.all(np.char.str_len(table) > 0, axis=1)
+            parsed = {}
+            for column in numeric:
+                raw = table[:, columns.index(column)]
+                values = np.full(len(raw), np.nan)
+                try:
+                    values[valid] = raw[valid].astype(np.float64)
+                except ValueError:
+                    # Slow path only for chunks that contain non-numeric cells.
+                    for idx in np.flatnonzero(valid):
+                        try:
+                            values[idx] = float(raw[idx])
+                        except ValueError:
+                            pass
+                parsed[column] = values
+                valid &= ~np.isnan(values)
+            dropped = int(len(table) - valid.sum()) + ragged
+            chunk = {c: table[valid, i] for i, c in enumerate(columns) if c not in parsed}
+            chunk.update({c: v[valid] for c, v in parsed.items()})
+            if dataset.value_column == "revenue":
+                chunk["value"] = chunk["quantity"] * chunk["price"]
+            else:
+                chunk["value"] = chunk[dataset.value_column]
+            yield chunk, dropped
+
+
+def clean(dataset: Dataset) -> Dataset:
+    """One streaming pass that counts valid and malformed rows; later scans skip malformed rows the same way."""
+    if dataset.columnar is not None:  # Malformed rows were already dropped during conversion.
+        dataset.row_count, dataset.dropped_rows, dataset.cleaned = dataset.columnar.rows, dataset.columnar.dropped, True
+        return dataset
+    rows = dropped = 0
+    for chunk, chunk_dropped in iter_chunks(dataset):
+        rows += len(chunk["value"])
+        dropped += chunk_dropped
+    dataset.row_count, dataset.dropped_rows, dataset.cleaned = rows, dropped, True
+    return dataset
+
+
+def aggregate(dataset: Dataset, group_by: str = None) -> dict:
+    """
+    Total/mean of the value column overall and, optionally, per group.
+    `group_by` is a column name, or 'month'/'quarter' for a 'date' column.
+    """
+    by_period = group_by in ("month", "quarter") and "date" in dataset.columns
+    if group_by and not by_period and group_by not in dataset.columns:
+        raise ValueError(f"Cannot group {dataset.handle} by '{group_by}'; columns are {', '.join(dataset.columns)}.")
+    if dataset.columnar is not None and group_by in (None, "product", "date", "month", "quarter"):
+        return _aggregate_columnar(dataset, group_by)
+    total = 0.0
+    rows = dropped = 0
+    groups = {}
+    for chunk, chunk_dropped in iter_chunks(dataset):
+        values = chunk["value"]
+        rows += len(values)
+        dropped += chunk_dropped
+        total += float(values.sum())
+        if not group_by or not len(values):
+            continue
+        if group_by in ("date", "month", "quarter") and "date" in dataset.columns:
+            # Day numbers, like the columnar path, so both label (and bucket undated rows) the same way.
+            labels, codes = np.unique(_day_keys(day_numbers(chunk["date"]), group_by), return_inverse=True)
+            names = _day_key_labels(labels, group_by)
+        else:
+            labels, codes = np.unique(chunk[group_by], return_inverse=True)
+            names = labels.tolist()
+        sums = np.bincount(codes, weights=values, minlength=len(labels))
+        counts = np.bincount(codes, minlength=len(labels))
+        quantities = (np.bincount(codes, weights=chunk["quantity"], minlength=len(labels))
+                      if "quantity" in chunk else counts)
+        for label, value_sum, count, quantity in zip(names, sums, counts, quantities):
+            group = groups.setdefault(label, {"total": 0.0, "rows": 0, "quantity": 0.0})
+            group["total"] += float(value_sum)
+            group["rows"] += int(count)
+            group["quantity"] += float(quantity)
+    dataset.row_count, dataset.dropped_rows = rows, dropped
+    return {
+        "value": dataset.value_column,
+        "rows": rows,
+        "dropped": dropped,
+        "total": total,
+        "mean": total / rows if rows else 0.0,
+        "groups": dict(sorted(groups.items())),
+    }
+
+
+def _day_keys(days: np.ndarray, group_by: str) -> np.ndarray:
+    """Integer group keys for day numbers: the day itself, months or quarters since 1970 (UNDATED stays)."""
+    if group_by == "date":
+        return days
+    undated = days == UNDATED
+    months = np.where(undated, 0, days).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return np.where(undated, UNDATED, months if group_by == "month" else months // 3)
+
+
+def _day_key_labels(keys: np.ndarray, group_by: str) -> list:
+    """YYYY-MM-DD, YYYY-MM or YYYY-Qn labels for sorted keys (np.unique); UNDATED sorts first."""
+    undated = int(np.count_nonzero(keys == UNDATED))
+    keys = keys[undated:]
+    if group_by == "date":
+        labels = keys.astype("datetime64[D]").astype(str).tolist()
+    elif group_by == "month":
+        labels = keys.astype("datetime64[M]").astype(str).tolist()
+    else:
+        labels = [f"{1970 + key // 4}-Q{key % 4 + 1}" for key in keys.tolist()]
+    return [UNDATED_LABEL] * undated + labels
+
+
+def _aggregate_columnar(dataset: Dataset, group_by: str = None) -> dict:
+    """aggregate() over the memory-mapped columns, in CHUNK_ROWS slices to bound temporaries."""
+    table = dataset.columnar
+    quantity, price = table.column("quantity"), table.column("price")
+    key_column = table.column("product") if group_by == "product" else table.column("day") if group_by else None
+    total = 0.0
+    groups = {}
+    for start in range(0, table.rows, CHUNK_ROWS):
+        quantities = quantity[start:start + CHUNK_ROWS]
+        values = quantities * price[start:start + CHUNK_ROWS]
+        total += float(values.sum())
+        if not group_by:
+            continue
+        keys = key_column[start:start + CHUNK_ROWS]
+        if group_by != "product":
+            keys = _day_keys(keys, group_by)
+        labels, codes = np.unique(keys, return_inverse=True)
+        sums = np.bincount(codes, weights=values, minlength=len(labels))
+        counts = np.bincount(codes, minlength=len(labels))
+        quantity_sums = np.bincount(codes, weights=quantities, minlength=len(labels))
+        names = table.products[labels].tolist() if group_by == "product" else _day_key_labels(labels, group_by)
+        for label, value_sum, count, quantity_sum in zip(names, sums, counts, quantity_sums):
+            group = groups.setdefault(label, {"total": 0.0, "rows": 0, "quantity": 0.0})
+            group["total"] += float(value_sum)
+            group["rows"] += int(count)
+            group["quantity"] += float(quantity_sum)
+    dataset.row_count, dataset.dropped_rows = table.rows, table.dropped
+    return {
+        "value": dataset.value_column,
+        "rows": table.rows,
+        "dropped": table.dropped,
+        "total": total,
+        "mean": total / table.rows if table.rows else 0.0,
+        "groups": dict(sorted(groups.items())),
+    }
+
+
+def format_aggregate(result: dict, group_by: str = None, max_groups: int = 24) -> str:
+    """Compact, model-friendly text for an aggregate() result."""
+    value = result["value"].capitalize()
+    lines = [f"Rows = {result['rows']} (dropped {result['dropped']}), "
+             f"Total {value} = ${result['total']:,.2f}, Average {value} per row = ${result['mean']:,.2f}"]
+    if group_by and result["groups"]:
+        lines.append(f"{value} by {group_by}:")
+        for label, group in list(result["groups"].items())[:max_groups]:
+            lines.append(f"  {label}: ${group['total']:,.2f} ({group['rows']} rows, quantity {group['quantity']:,.0f})")
+        if len(result["groups"]) > max_groups:
+            lines.append(f"  ... {len(result['groups']) - max_groups} more groups")
+    return "\n".join(lines)
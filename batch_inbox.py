@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import mailbox
+import os
+import time
+from llm_client import priority
+from metrics import latency_summary, format_summary
+from transcripts import transcript
+
+# ---------------------------
+# Batch Inbox Processing for the Level 5 Event Agent
+# ---------------------------
+# Reads a mailbox dump (mbox or JSONL), runs the level5 agent on many emails
+# concurrently, and appends one JSON result per line to the output file as soon
+# as each email finishes. The output file doubles as the checkpoint: on restart,
+# emails that already have an "ok" result are skipped.
+
+
+def _mbox_text(message) -> str:
+    """Flatten an mbox message into the 'Subject: ...' + body text the agent expects."""
+    if message.is_multipart():
+        parts = [part.get_payload(decode=True) or b"" for part in message.walk()
+                 if part.get_content_type() == "text/plain"]
+        body = b"\n".join(parts).decode("utf-8", errors="replace")
+    else:
+        payload = message.get_payload(decode=True)
+        body = payload.decode("utf-8", errors="replace") if payload else str(message.get_payload())
+    return f"Subject: {message.get('Subject', '')}\n\n{body}"
+
+
+def read_mbox(path):
+    for idx, message in enumerate(mailbox.mbox(path)):
+        email_id = (message.get("Message-ID") or f"mbox-{idx}").strip()
+        yield email_id, _mbox_text(message)
+
+
+def read_jsonl(path):
+    """
+    Yield (id, text) from a JSONL dump. The id comes from 'id', 'request_id' or 'message_id'
+    (falling back to the line number); the text from 'email'/'text', or 'subject'/'title' + 'body'.
+    """
+    with open(path, encoding="utf-8") as f:
+        for idx, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            email_id = str(record.get("id") or record.get("request_id") or record.get("message_id") or f"line-{idx}")
+            text = record.get("email") or record.get("text")
+            if text is None:
+                subject = record.get("subject") or record.get("title") or ""
+                text = f"Subject: {subject}\n\n{record.get('body', '')}"
+            yield email_id, text
+
+
+def read_inbox(path):
+    if path.endswith((".jsonl", ".ndjson")):
+        return read_jsonl(path)
+    return read_mbox(path)
+
+
+def load_checkpoint(output_path) -> set:
+    """Return the ids that already completed successfully in a previous run."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A torn last line from a crash; that email is redone.
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def drop_torn_line(output_path):
+    """Cut a partial last line left by a crash, so the next record starts on a line of its own."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        size = end = f.seek(0, os.SEEK_END)
+        keep = 0
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            end = start
+        if keep < size:
+            f.truncate(keep)
+
+
+async def process_inbox(inbox_path, output_path, concurrency: int = 10, run_email=None) -> dict:
+    """
+    Process every email in `inbox_path` not yet present in `output_path`.
+    `run_email` is an async callable (text -> str); by default it runs the level5 agent.
+    Returns the latency summary of this run.
+    """
+    if run_email is None:
+        from level5 import agent
+        from history import compaction
+
+        async def run_email(text):
+            with compaction():
+                result = await agent.run(text, deps={})
+            return result.data
+
+    done = load_checkpoint(output_path)
+    drop_torn_line(output_path)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = []
+    skipped = failed = 0
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        async def worker():
+            nonlocal failed
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        return
+                    email_id, text = item
+                    start = time.perf_counter()
+                    run = None
+                    try:
+                        # The agent's steps go to the transcript log; the result line points at them.
+                        with priority("batch"), transcript("batch_inbox", email_id=email_id) as run:
+                            record = {"id": email_id, "status": "ok", "output": await run_email(text)}
+                    except Exception as e:
+                        record = {"id": email_id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                        failed += 1
+                    if run is not None:
+                        record["transcript"] = run.run_id
+                    record["latency_s"] = round(time.perf_counter() - start, 4)
+                    latencies.append(record["latency_s"])
+                    # Stream each result out immediately so a crash loses at most in-flight emails.
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                finally:
+                    queue.task_done()
+
+        async def feed():
+            nonlocal skipped
+            for email_id, text in read_inbox(inbox_path):
+                if email_id in done:
+                    skipped += 1
+                    continue
+                await queue.put((email_id, text))
+            for _ in workers:
+                await queue.put(None)
+
+        started = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        # A worker that fails (e.g. the output disk is full) fails the batch instead of leaving
+        # feed() blocked on a full queue.
+        tasks = [asyncio.create_task(feed()), *workers]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        elapsed = time.perf_counter() - started
+
+    summary = latency_summary(latencies, elapsed)
+    summary.update({"skipped": skipped, "failed": failed})
+    return summary
+
+
+# ---------------------------
+# Running the Batch from the Command Line
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the level5 event agent over a mailbox dump.")
+    parser.add_argument("inbox", help="Path to an mbox file or a JSONL dump.")
+    parser.add_argument("-o", "--output", default="inbox_results.jsonl", help="Results/checkpoint JSONL file.")
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    summary = asyncio.run(process_inbox(args.inbox, args.output, concurrency=args.concurrency))
+    print("\n🔹 Batch Inbox Summary:")
+    print(format_summary(summary, unit="emails"))
+    print(f"Skipped (already done): {summary['skipped']}, failed: {summary['failed']}")
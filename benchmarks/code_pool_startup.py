@@ -0,0 +1,55 @@
+import argparse
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from code_runner import CodeWorkerPool, DEFAULT_PRELOAD
+
+# ---------------------------
+# Benchmark: Cold Process vs. Warm Worker Pool for Generated Code
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.code_pool_startup
+
+SNIPPET = (
+    "import csv\n"
+    "def main():\n"
+    "    with open('sales.csv') as f:\n"
+    "        return sum(float(r['quantity']) * float(r['price']) for r in csv.DictReader(f))\n"
+)
+
+
+def cold_run(code: str) -> float:
+    """Fresh interpreter that imports the same libraries, like the old per-run cost."""
+    imports = "".join(f"try:\n    import {m}\nexcept ImportError:\n    pass\n" for m in DEFAULT_PRELOAD)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", imports + code + "\nmain()\n"], check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-execution startup cost: cold interpreter vs. warm pool.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    cold = [cold_run(SNIPPET) for _ in range(3)]
+    print(f"cold interpreter:     {sum(cold) / len(cold) * 1000:8.1f} ms/run")
+
+    pool = CodeWorkerPool(size=args.workers, max_runs=10_000)
+    try:
+        pool.run(SNIPPET)  # Wait for the first worker to finish preloading.
+        sequential = [pool.run(SNIPPET)["duration"] for _ in range(args.runs)]
+        print(f"warm pool:            {sum(sequential) / len(sequential) * 1000:8.1f} ms/run")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.workers) as executor:
+            list(executor.map(pool.run, [SNIPPET] * args.runs * args.workers))
+        elapsed = time.perf_counter() - start
+        print(f"warm pool, parallel:  {args.runs * args.workers / elapsed:8.1f} runs/sec on {args.workers} workers")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
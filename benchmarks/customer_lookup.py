@@ -0,0 +1,65 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from customer_store import CustomerStore, QUERY_TYPES
+from metrics import percentile
+
+# ---------------------------
+# Benchmark: Customer Lookup Latency (level3 database backend)
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.customer_lookup [--customers 50000]
+
+
+def report(label, latencies):
+    us = [latency * 1e6 for latency in latencies]
+    print(f"{label:<28} p50 {percentile(us, 50):7.1f} us | p99 {percentile(us, 99):7.1f} us | max {max(us):8.1f} us")
+
+
+def timed_lookups(store, keys):
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        store.lookup(*key)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of CustomerStore lookups.")
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=5, help="Keys per batched lookup (tool calls per response).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CustomerStore(os.path.join(tmp, "customers.db"), cache_size=args.customers * 2)
+        start = time.perf_counter()
+        store.seed(args.customers)
+        print(f"Seeded {args.customers} customers in {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(1)
+        keys = [(rng.randint(1, args.customers), rng.choice(QUERY_TYPES)) for _ in range(args.lookups)]
+
+        store.cache_size = 0  # Every lookup goes to SQLite.
+        report("uncached", timed_lookups(store, keys))
+
+        store.cache_size = args.customers * 2
+        timed_lookups(store, keys)  # Fill the cache.
+        report("cached", timed_lookups(store, keys))
+
+        store.cache_size = 0
+        batches = [keys[i:i + args.batch] for i in range(0, len(keys), args.batch)]
+        latencies = []
+        for batch in batches:
+            start = time.perf_counter()
+            store.lookup_many(batch)
+            latencies.append(time.perf_counter() - start)
+        report(f"batched ({args.batch}/call, uncached)", latencies)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
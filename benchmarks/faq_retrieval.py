@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import faq_index
+from faq_index import FAQIndex
+from metrics import latency_summary, format_summary
+
+# ---------------------------
+# Benchmark: FAQ Retrieval Index
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.faq_retrieval [--docs 3000]
+# Builds an index over a synthetic FAQ corpus and reports build, incremental re-index and load
+# times, brute-force vs. IVF query latency and recall, and prompt size of the retrieved chunks
+# compared with sending the whole corpus.
+
+
+def synthetic_corpus(docs_dir, n_docs, rng):
+    # Documents fall into product areas with their own vocabulary; each page uses a subset of it.
+    areas = [[f"area{a}term{i}" for i in range(300)] for a in range(60)]
+    for d in range(n_docs):
+        topic = rng.sample(rng.choice(areas), 40)
+        paragraphs = []
+        for _ in range(rng.randint(2, 6)):
+            sentences = [" ".join(rng.choices(topic, k=rng.randint(8, 16))).capitalize() + "."
+                         for _ in range(rng.randint(2, 5))]
+            paragraphs.append(" ".join(sentences))
+        with open(os.path.join(docs_dir, f"doc{d:05d}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# FAQ page {d}\n\n" + "\n\n".join(paragraphs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, load and query cost of the FAQ retrieval index.")
+    parser.add_argument("--docs", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists scanned per query.")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docs_dir, index_dir = os.path.join(tmp, "docs"), os.path.join(tmp, "index")
+        os.makedirs(docs_dir)
+        synthetic_corpus(docs_dir, args.docs, rng)
+
+        faq_index.IVF_MIN_CHUNKS = 0  # Always build the approximate index so both paths can be compared.
+        stats = FAQIndex(index_dir).build(docs_dir)
+        print(f"full build:        {stats['chunks']} chunks from {args.docs} docs in {stats['seconds']:.2f}s")
+
+        for name in rng.sample(sorted(os.listdir(docs_dir)), 10):
+            with open(os.path.join(docs_dir, name), "a", encoding="utf-8") as f:
+                f.write("\n\nUpdated answer term1 term2 term3.")
+        stats = FAQIndex(index_dir).build(docs_dir)
+        print(f"incremental build: {stats['embedded']} re-embedded, {stats['reused']} reused in {stats['seconds']:.2f}s")
+
+        start = time.perf_counter()
+        index = FAQIndex(index_dir)
+        print(f"load:              {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        # Queries are word subsets of random chunks; the source chunk is the right answer.
+        rows = [rng.randrange(len(index)) for _ in range(args.queries)]
+        queries = []
+        for row in rows:
+            words = index.chunk_text(row).split(": ", 1)[1].split()
+            queries.append(" ".join(rng.sample(words, min(6, len(words)))))
+
+        results = {}
+        for label, exact in (("brute-force", True), ("ivf", False)):
+            latencies, hits = [], []
+            for query in queries:
+                start = time.perf_counter()
+                hits.append([hit["row"] for hit in index.search(query, k=args.k, exact=exact, nprobe=args.nprobe)])
+                latencies.append(time.perf_counter() - start)
+            results[label] = hits
+            recall = sum(row in found for row, found in zip(rows, hits)) / len(rows)
+            print(f"{label + ':':<18} {format_summary(latency_summary(latencies), unit='queries')} | hit@{args.k} {recall:.0%}")
+        overlap = sum(len(set(a) & set(b)) for a, b in zip(results["brute-force"], results["ivf"]))
+        print(f"ivf recall vs brute-force top-{args.k}: {overlap / (args.k * len(queries)):.0%}")
+
+        corpus_tokens = index._offsets[-1] // 4
+        sample = queries[:50]
+        context_tokens = sum(len(hit["text"]) for q in sample for hit in index.search(q, k=args.k)) / len(sample) / 4
+        print(f"prompt context:    ~{context_tokens:.0f} tokens retrieved vs ~{corpus_tokens} for the whole corpus")
+
+
+if __name__ == "__main__":
+    main()
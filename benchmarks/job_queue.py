@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ["JOB_RETRY_BACKOFF"] = "0.05"  # Read by the worker processes too.
+from job_queue import JobQueue, run_workers
+
+# ---------------------------
+# Benchmark: Job Queue Throughput Across Worker Processes
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.job_queue [--jobs 200] [--cpu-ms 50] [--io-ms 200]
+# Queues synthetic report jobs (CPU work, as the analysis and generated code do, plus waiting,
+# as on model calls). They run with 1 worker process and then with one per core, and the
+# benchmark reports jobs/sec and the queue stats. Every job is submitted twice to show that
+# deduplication works. Every tenth job fails on its first attempt to exercise retries.
+
+KINDS = {"simulated": "benchmarks.job_queue:simulated_report"}
+
+
+async def simulated_report(report: int, cpu_ms: float, io_ms: float, fail_marker: str = None) -> str:
+    if fail_marker and not os.path.exists(fail_marker):
+        open(fail_marker, "w").close()
+        raise RuntimeError("transient failure")
+    deadline = time.process_time() + cpu_ms / 1000
+    while time.process_time() < deadline:
+        pass
+    await asyncio.sleep(io_ms / 1000)
+    return f"report {report}"
+
+
+def run(processes: int, args, tmp: str) -> dict:
+    path = os.path.join(tmp, f"jobs-{processes}.db")
+    queue = JobQueue(path)
+    added = 0
+    for i in range(args.jobs):
+        payload = {"report": i, "cpu_ms": args.cpu_ms, "io_ms": args.io_ms,
+                   "fail_marker": os.path.join(tmp, f"fail-{processes}-{i}") if i % 10 == 0 else None}
+        for _ in range(2):
+            added += queue.enqueue("simulated", payload, priority=i % 3)[1]
+    print(f"{processes} process(es): queued {added} of {2 * args.jobs} submissions "
+          f"(oldest pending {queue.stats()['oldest_pending_age_s']:.2f}s old)")
+    started = time.perf_counter()
+    run_workers(processes, args.concurrency, path, KINDS, drain=True)
+    elapsed = time.perf_counter() - started
+    stats = queue.stats()
+    assert stats["done"] == args.jobs, stats
+    retried = queue._db.execute("SELECT COUNT(*) FROM jobs WHERE attempts > 1").fetchone()[0]
+    print(f"  {args.jobs / elapsed:6.1f} jobs/s over {elapsed:.2f}s, {retried} retried, "
+          f"stats: {json.dumps(stats)}")
+    return {"processes": processes, "jobs_per_sec": args.jobs / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job queue throughput with one vs. many worker processes.")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--cpu-ms", type=float, default=50)
+    parser.add_argument("--io-ms", type=float, default=200)
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs in flight per worker process.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [run(n, args, tmp) for n in sorted({1, args.processes})]
+    if len(results) > 1:
+        print(f"\nspeed-up with {args.processes} processes: {results[-1]['jobs_per_sec'] / results[0]['jobs_per_sec']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
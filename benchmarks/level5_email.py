@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+import llm_client
+import mailer
+from metrics import latency_summary
+from mock_llm_server import MockLLMServer, Script, ScriptedResponder, ToolCall, first_user_message, last_tool_output
+from mock_smtp_server import MockSMTPServer
+
+# ---------------------------
+# Benchmark: Templated Decision Emails vs. Model-Driven Email Turns (level5)
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.level5_email [--signups 40] [--smtp-error-rate 0.05]
+# Runs the level5 agent over distinct signup emails twice: first with generate_email and
+# send_email as their own model turns (LEVEL5_TEMPLATED_EMAIL=0), then with the decision email
+# rendered from templates and sent through the batched SMTP outbox inside classify_and_decide.
+# Mail goes to the local debugging SMTP server, which injects transient failures. The benchmark
+# reports model calls and tokens per signup, latency, SMTP connections and delivered messages.
+
+
+def signup_email(i: int) -> str:
+    return (f"Subject: Event Signup Request\n\nHi,\nI'd like to sign up for Tech Expo 2025. My name is Attendee {i}, "
+            f"my email is attendee{i}@example.com. I work at Company {i}, a provider of AI solutions.\nBest")
+
+
+def _assessment(payload) -> str:
+    i = re.search(r"Attendee (\d+)", first_user_message(payload)).group(1)
+    return json.dumps({
+        "type": "signup", "question": None, "decision": "VIP Attendee" if int(i) % 2 else "Standard Attendee",
+        "explanation": "Innovative AI company.",
+        "details": {"customer_name": f"Attendee {i}", "customer_email": f"attendee{i}@example.com",
+                    "company": f"Company {i}", "company_description": "AI solutions", "event": "Tech Expo 2025"},
+    })
+
+
+def _addressed(payload) -> str:
+    """The generated email with a To: line for the attendee, as the model would write it."""
+    to = re.search(r"attendee\d+@example\.com", first_user_message(payload)).group(0)
+    return last_tool_output(payload).replace("Generated Email:\n", f"To: {to}\n", 1)
+
+
+RESPONDER = ScriptedResponder([
+    Script(lambda p: bool(p.get("response_format")), [_assessment]),
+    Script("Event Signup", [
+        ToolCall("classify_and_decide", lambda p: {"message": first_user_message(p)}),
+        lambda p: ("The signup email has been sent." if "Email sent to" in last_tool_output(p)
+                   else ToolCall("generate_email", {"decision": last_tool_output(p)})),
+        lambda p: ToolCall("send_email", {"email_content": _addressed(p)}),
+        "The signup email has been sent.",
+    ]),
+])
+
+
+async def run_signups(level5, signups: int, offset: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await level5.agent.run(signup_email(offset + i), deps={})
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(signups)))
+    await llm_client.aclose()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model turns and SMTP cost of level5 decision emails.")
+    parser.add_argument("--signups", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock latency per model call (s).")
+    parser.add_argument("--smtp-error-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with MockLLMServer(latency=args.latency, responder=RESPONDER) as llm, \
+            MockSMTPServer(error_rate=args.smtp_error_rate, max_per_connection=25) as smtp:
+        llm_client.configure(base_url=llm.base_url)
+        import level5
+
+        host, port = smtp.address
+        print(f"{'mode':>10} | {'calls/signup':>12} | {'tokens/signup':>13} | {'p50 ms':>7} | "
+              f"{'delivered':>9} | {'SMTP conns':>10} | {'retries':>7}")
+        for index, (label, templated) in enumerate((("model", False), ("templated", True))):
+            level5.TEMPLATED_EMAIL = templated
+            sender = mailer.SMTPSender(host, port, backoff=0.01)
+            mailer.configure(sender=sender)
+            llm.reset_usage()
+            delivered, connections = smtp.stats["messages"], smtp.stats["connections"]
+            latencies = asyncio.run(run_signups(level5, args.signups, index * args.signups, args.concurrency))
+            mailer.get_outbox().close()
+            usage = llm.usage
+            summary = latency_summary(latencies)
+            print(f"{label:>10} | {usage['calls'] / args.signups:>12.1f} | "
+                  f"{(usage['prompt_tokens'] + usage['completion_tokens']) / args.signups:>13.0f} | "
+                  f"{summary['p50_ms']:>7.0f} | {smtp.stats['messages'] - delivered:>9} | "
+                  f"{smtp.stats['connections'] - connections:>10} | {sender.counters['retries']:>7}")
+
+
+if __name__ == "__main__":
+    main()
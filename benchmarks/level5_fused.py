@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+import llm_client
+from mock_llm_server import MockLLMServer
+
+# ---------------------------
+# Benchmark: Fused classify-and-decide vs. separate calls (level5)
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.level5_fused
+# Compares model round-trips, tokens and latency of the signup classification step.
+
+SIGNUP_EMAIL = (
+    "Subject: Event Signup Request\n\n"
+    "Hi,\n"
+    "I'd like to sign up for Tech Expo 2025. My name is Alice Johnson, my email is alice@example.com. "
+    "I work at Acme Innovations, which is a leading provider of cutting-edge AI solutions and enterprise automation. "
+    "Looking forward to attending the event.\n"
+    "Best,\nAlice"
+)
+SIGNUP_DETAILS = {
+    "customer_name": "Alice Johnson", "customer_email": "alice@example.com", "company": "Acme Innovations",
+    "company_description": "Leading provider of cutting-edge AI solutions.", "event": "Tech Expo 2025",
+}
+
+
+def responder(payload):
+    """Scripted answers: structured assessment, classification JSON or a decision line."""
+    if payload.get("response_format"):
+        return json.dumps({"type": "signup", "details": SIGNUP_DETAILS, "question": None,
+                           "decision": "VIP Attendee", "explanation": "Innovative AI company."})
+    prompt = payload["messages"][-1]["content"]
+    if prompt.startswith("You are an event message classifier"):
+        return json.dumps({"type": "signup", "details": SIGNUP_DETAILS})
+    return "VIP Attendee: Innovative AI company."
+
+
+async def run_mode(level5, fused: bool, n_emails: int):
+    level5.FUSED_CLASSIFICATION = fused
+    latencies = []
+    for _ in range(n_emails):
+        start = time.perf_counter()
+        await level5.classify_and_decide(None, SIGNUP_EMAIL)
+        latencies.append(time.perf_counter() - start)
+    await llm_client.aclose()
+    return sum(latencies) / len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token/latency benchmark of the fused level5 classification.")
+    parser.add_argument("--emails", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock latency per model call (s).")
+    args = parser.parse_args()
+
+    with MockLLMServer(latency=args.latency, responder=responder) as server:
+        llm_client.configure(base_url=server.base_url)
+        import level5
+
+        print(f"{'mode':>9} | {'calls/email':>11} | {'tokens/email':>12} | {'latency/email':>13}")
+        for label, fused in (("separate", False), ("fused", True)):
+            server.reset_usage()
+            mean_latency = asyncio.run(run_mode(level5, fused, args.emails))
+            usage = server.usage
+            tokens = (usage["prompt_tokens"] + usage["completion_tokens"]) / args.emails
+            print(f"{label:>9} | {usage['calls'] / args.emails:>11.1f} | {tokens:>12.0f} | {mean_latency * 1000:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+import llm_client
+from mock_llm_server import MockLLMServer
+
+# ---------------------------
+# Benchmark: Concurrent Throughput of the Shared Async Client
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.llm_client_throughput
+
+
+async def run_batch(n_calls: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(llm_client.simple_llm_call(f"question {i}") for i in range(n_calls)))
+    elapsed = time.perf_counter() - start
+    await llm_client.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent throughput of llm_client against the mock server.")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock server latency per call (s).")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50])
+    args = parser.parse_args()
+
+    with MockLLMServer(latency=args.latency) as server:
+        print(f"{args.calls} calls, {args.latency * 1000:.0f} ms mock latency")
+        print(f"{'concurrency':>11} | {'seconds':>8} | {'calls/sec':>9}")
+        for limit in args.concurrency:
+            llm_client.configure(base_url=server.base_url, max_concurrency=limit,
+                                 max_connections=max(limit, 1))
+            elapsed = asyncio.run(run_batch(args.calls))
+            print(f"{limit:>11} | {elapsed:>8.2f} | {args.calls / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+import llm_client
+from metrics import percentile
+from mock_llm_server import MockLLMServer
+
+# ---------------------------
+# Benchmark: Rate Limiter and Retry Scheduler
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.rate_limits
+# 1. 429 storm: a share of requests gets 429 + Retry-After; every call should still succeed.
+# 2. Priority lanes: batch calls are queued first under an RPM limit, then interactive calls
+#    arrive; interactive calls should still finish first.
+# 3. Circuit breaker: the server only returns 500s; after the threshold calls fail fast.
+
+
+async def run_calls(n, lane_name="default", tag=""):
+    async def one(i):
+        started = time.perf_counter()
+        try:
+            with llm_client.priority(lane_name):
+                await llm_client.chat_completion([{"role": "user", "content": f"{tag} call {i}"}], model="mock")
+            return True, time.perf_counter() - started
+        except Exception:
+            return False, time.perf_counter() - started
+    return await asyncio.gather(*(one(i) for i in range(n)))
+
+
+def report(label, results):
+    ok = sum(1 for success, _ in results if success)
+    latencies = [latency * 1000 for _, latency in results]
+    print(f"  {label:<12} {ok}/{len(results)} ok | p50 {percentile(latencies, 50):7.1f} ms | "
+          f"max {max(latencies):7.1f} ms")
+
+
+def show_stats():
+    stats = llm_client.get_limiter().stats()
+    keys = ("granted", "throttled", "throttle_wait_s", "max_queue_depth", "retries", "rate_limited",
+            "server_errors", "failed_fast", "gave_up", "circuit", "circuit_opens")
+    print("  limiter: " + ", ".join(f"{k}={stats[k]:.2f}" if isinstance(stats[k], float) else f"{k}={stats[k]}"
+                                   for k in keys))
+
+
+async def storm(args):
+    with MockLLMServer(latency=0.01, error_rate=args.error_rate, error_status=429, retry_after=0.05, seed=1) as server:
+        llm_client.configure(base_url=server.base_url, backoff_base=0.05, max_retries=8)
+        print(f"1. 429 storm ({args.error_rate:.0%} of requests rejected, Retry-After 0.05s)")
+        report("calls", await run_calls(args.calls))
+        show_stats()
+        await llm_client.aclose()
+
+
+async def lanes(args):
+    with MockLLMServer(latency=0.01, seed=2) as server:
+        llm_client.configure(base_url=server.base_url, rpm=args.rpm)
+        print(f"2. Priority lanes under rpm={args.rpm:g}")
+        batch = asyncio.ensure_future(run_calls(args.calls, "batch", "batch"))
+        await asyncio.sleep(0.01)  # Batch work is already queued when interactive requests arrive.
+        interactive = await run_calls(args.calls // 5, "interactive", "interactive")
+        report("interactive", interactive)
+        report("batch", await batch)
+        show_stats()
+        await llm_client.aclose()
+
+
+async def breaker(args):
+    with MockLLMServer(latency=0.01, error_rate=1.0, error_status=500, seed=3) as server:
+        llm_client.configure(base_url=server.base_url, backoff_base=0.01, max_retries=2, failure_threshold=5)
+        print("3. Circuit breaker (server returns only 500s)")
+        report("calls", await run_calls(20))
+        print(f"  server saw {server.usage['errors']} requests for 20 calls")
+        show_stats()
+        await llm_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throttling, retry and circuit breaker behaviour against the mock.")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--rpm", type=float, default=1200)
+    args = parser.parse_args()
+    for scenario in (storm, lanes, breaker):
+        asyncio.run(scenario(args))
+
+
+if __name__ == "__main__":
+    main()
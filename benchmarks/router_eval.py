@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+
+from fast_router import FastRouter, LocalRouteModel, DEFAULT_MODEL_PATH
+
+# ---------------------------
+# Offline Evaluation: Fast Router vs. LLM Router
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.router_eval [questions.jsonl]
+# Each line holds {"question": ..., "llm_route": 1|2}. Records without a cached
+# "llm_route" are skipped unless --live is given, which asks level2.llm_router.
+
+DEFAULT_DATA = os.path.join(os.path.dirname(__file__), "data", "router_questions.jsonl")
+
+
+def evaluate(records, fast_router: FastRouter, live: bool = False) -> dict:
+    decided = agreed = total = 0
+    disagreements = []
+    for record in records:
+        expected = record.get("llm_route")
+        if expected is None:
+            if not live:
+                continue
+            from level2 import llm_router
+            expected = llm_router(record["question"])
+        total += 1
+        route, tier = fast_router.route(record["question"])
+        if route is None:
+            continue
+        decided += 1
+        if route == int(expected):
+            agreed += 1
+        else:
+            disagreements.append((tier, record["question"], route, expected))
+    return {
+        "questions": total,
+        "avoided_fraction": decided / total if total else 0.0,
+        "agreement": agreed / decided if decided else 0.0,
+        "tiers": dict(fast_router.counts),
+        "disagreements": disagreements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the local fast-path router with the LLM router.")
+    parser.add_argument("data", nargs="?", default=DEFAULT_DATA)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Trained model to use as the second tier.")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--live", action="store_true", help="Call the LLM router for records without llm_route.")
+    args = parser.parse_args()
+
+    with open(args.data, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    fast_router = FastRouter(LocalRouteModel.load(args.model), args.threshold)
+    report = evaluate(records, fast_router, live=args.live)
+
+    print(f"Questions evaluated:   {report['questions']}")
+    print(f"LLM calls avoided:     {report['avoided_fraction']:.1%}")
+    print(f"Agreement with LLM:    {report['agreement']:.1%} (of locally routed questions)")
+    print(f"Decisions per tier:    {report['tiers']}")
+    for tier, question, route, expected in report["disagreements"]:
+        print(f"  [{tier}] {question!r}: local={route} llm={expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+from sales_summary import RevenueSummary
+
+# ---------------------------
+# Benchmark: Incremental vs. Full Revenue Summary
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.sales_summary [--rows 2000000] [--append 20000]
+# Builds a synthetic append-only sales file and compares a from-scratch recompute
+# (csv.DictReader, as the level5+ generated code does it) with the incremental job:
+# first run, a run after a small append, and a run with nothing new.
+
+PRODUCTS = ["Widget", "Gadget", "Doohickey", "Thingamajig", "Contraption", "Gizmo", "Whatsit", "Sprocket"]
+
+
+def write_rows(path, n, rng, header=False):
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(["date", "product", "quantity", "price"])
+        for _ in range(n):
+            writer.writerow([f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(PRODUCTS),
+                             rng.randint(1, 20), f"{rng.uniform(5, 100):.2f}"])
+
+
+def full_recompute(path) -> dict:
+    totals = defaultdict(float)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            totals[row["product"]] += int(row["quantity"]) * float(row["price"])
+    return dict(totals)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental revenue summary vs. recomputing from scratch.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--append", type=int, default=20_000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "sales.csv")
+        write_rows(source, args.rows, rng, header=True)
+        job = lambda: RevenueSummary(source, os.path.join(tmp, "summary.csv"), "", os.path.join(tmp, "state.json"))
+
+        totals, seconds = timed(lambda: full_recompute(source))
+        print(f"full recompute (DictReader): {seconds * 1000:9.1f} ms for {args.rows:,} rows")
+        stats, seconds = timed(lambda: job().update())
+        print(f"incremental, first run:      {seconds * 1000:9.1f} ms ({stats['new_rows']:,} rows)")
+
+        write_rows(source, args.append, rng)
+        totals, full_seconds = timed(lambda: full_recompute(source))
+        stats, seconds = timed(lambda: job().update())
+        print(f"after appending {args.append:,} rows:")
+        print(f"  full recompute:            {full_seconds * 1000:9.1f} ms")
+        print(f"  incremental:               {seconds * 1000:9.1f} ms ({stats['new_rows']:,} new rows, "
+              f"{stats['bytes_read']:,} bytes read, summary rewritten: {stats['wrote_summary']})")
+        stats, seconds = timed(lambda: job().update())
+        print(f"  incremental, nothing new:  {seconds * 1000:9.1f} ms (summary rewritten: {stats['wrote_summary']})")
+
+        incremental = job().revenue_per_product()
+        worst = max(abs(incremental[p] - round(totals[p], 2)) for p in totals)
+        print(f"max difference vs. full recompute: ${worst:.2f}")
+
+
+if __name__ == "__main__":
+    main()
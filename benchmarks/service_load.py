@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.suite import RESPONDER
+from metrics import percentile
+from mock_llm_server import MockLLMServer, Script, ScriptedResponder, first_user_message
+
+# ---------------------------
+# Benchmark: HTTP Service Under Load
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.service_load [--endpoint route] [--target-p99 500]
+# Starts service.py in its own process against the mock server, then sends open-loop
+# (Poisson) traffic at increasing rates. A share of the questions repeats from a small hot
+# set, like real traffic. For each rate it reports achieved requests/sec, p50/p99
+# latency and 503 rejections, and for each mode the highest rate that held the target
+# p99 without rejections. Runs with micro-batching on and off.
+
+QUESTIONS = {
+    # Neither the fast router's rules nor the FAQ script match these, so every one needs the LLM.
+    "route": "Tell me something about item {}",
+    "tool_calling": "What is the return policy for product {}?",
+}
+
+
+def _routing_batch(payload):
+    """Answer for level2.llm_router_batch, which sends the questions as a JSON list."""
+    return json.dumps({"routes": [2] * len(json.loads(first_user_message(payload)))})
+
+
+RESPONDER_WITH_BATCHES = ScriptedResponder([
+    Script(lambda p: p.get("response_format", {}).get("json_schema", {}).get("name") == "RoutingBatch",
+           [_routing_batch]),
+    *RESPONDER.scripts,
+])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_service(base_url, workdir, coalesce):
+    port = _free_port()
+    env = {**os.environ, "OPENAI_API_KEY": "sk-mock", "OPENAI_BASE_URL": base_url,
+           "RESPONSE_CACHE_PATH": os.path.join(workdir, "response_cache.db"),
+           "FAQ_INDEX_DIR": os.path.join(workdir, "faq_index")}
+    command = [sys.executable, "service.py", "--port", str(port)] + ([] if coalesce else ["--no-coalesce"])
+    proc = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)  # The levels print progress.
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(url + "/stats", timeout=1)
+            return proc, url
+        except httpx.TransportError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("service did not start")
+
+
+async def run_rate(client, url, endpoint, rate, duration, repeat_share, rng):
+    """Open-loop load: requests start on a Poisson schedule whether or not earlier ones finished."""
+    async def one(question):
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{url}/{endpoint}", json={"question": question})
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        return status, time.perf_counter() - started
+
+    tasks, elapsed, n = [], 0.0, 0
+    started = time.perf_counter()
+    while elapsed < duration:
+        n += 1
+        hot = rng.random() < repeat_share
+        question = QUESTIONS[endpoint].format(f"hot-{rng.randrange(10)}" if hot else f"{rate:g}-{n}")
+        tasks.append(asyncio.ensure_future(one(question)))
+        elapsed += rng.expovariate(rate)
+        await asyncio.sleep(max(0.0, started + elapsed - time.perf_counter()))
+    results = await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    ok = [latency * 1000 for status, latency in results if status == 200]
+    return {
+        "rate": rate, "sent": len(results), "ok_per_s": len(ok) / wall,
+        "p50_ms": percentile(ok, 50) if ok else float("nan"), "p99_ms": percentile(ok, 99) if ok else float("nan"),
+        "rejected": sum(1 for status, _ in results if status == 503),
+        "failed": sum(1 for status, _ in results if status not in (200, 503)),
+    }
+
+
+async def run_mode(url, args, server):
+    rng = random.Random(0)
+    best = None
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=1000), timeout=30) as client:
+        for i in range(5):  # Warm-up: first-use imports and client set-up in the service.
+            await client.post(f"{url}/{args.endpoint}", json={"question": QUESTIONS[args.endpoint].format(f"warm-{i}")})
+        for rate in args.rates:
+            calls = server.usage["calls"]
+            r = await run_rate(client, url, args.endpoint, rate, args.duration, args.repeat_share, rng)
+            r["upstream_per_req"] = (server.usage["calls"] - calls) / r["sent"]
+            held = r["p99_ms"] <= args.target_p99 and not r["rejected"] and not r["failed"]
+            print(f"  {rate:>6} req/s offered | {r['ok_per_s']:7.1f} ok/s | p50 {r['p50_ms']:7.1f} ms | "
+                  f"p99 {r['p99_ms']:7.1f} ms | 503 {r['rejected']:>5} | failed {r['failed']:>3} | "
+                  f"model calls/req {r['upstream_per_req']:.2f}{'' if held else '  (over target)'}")
+            if held:
+                best = r
+        stats = (await client.get(url + "/stats")).json()[args.endpoint]
+    print(f"  batches {stats['batches']}, mean batch {stats['mean_batch']:.1f}, deduped {stats['deduped']}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the HTTP service against the mock LLM server.")
+    parser.add_argument("--endpoint", choices=sorted(QUESTIONS), default="route")
+    parser.add_argument("--rates", type=float, nargs="+", default=[20, 40, 80, 160, 320])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per rate.")
+    parser.add_argument("--target-p99", type=float, default=500.0, help="p99 latency target in ms.")
+    parser.add_argument("--repeat-share", type=float, default=0.3, help="Share of requests from a hot set of 10 questions.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock model latency in seconds.")
+    args = parser.parse_args()
+
+    summary = {}
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockLLMServer(latency=args.latency, latency_per_token=0.0002, responder=RESPONDER_WITH_BATCHES) as server:
+        for label, coalesce in (("micro-batching", True), ("direct", False)):
+            print(f"{label} (/{args.endpoint}, target p99 {args.target_p99:g} ms):")
+            proc, url = start_service(server.base_url, workdir, coalesce)
+            try:
+                summary[label] = asyncio.run(run_mode(url, args, server))
+            finally:
+                proc.terminate()
+                proc.wait()
+    print()
+    for label, best in summary.items():
+        held = f"{best['ok_per_s']:.0f} req/s (p99 {best['p99_ms']:.0f} ms)" if best else "no rate held the target"
+        print(f"{label:<15} at target p99: {held}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+_WORKDIR = tempfile.mkdtemp(prefix="5levels-spec-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+os.environ["FAQ_INDEX_DIR"] = os.path.join(_WORKDIR, "faq_index")
+os.environ["CUSTOMER_DB"] = os.path.join(_WORKDIR, "customers.db")
+
+import level2
+import llm_client
+from customer_store import get_store
+from metrics import latency_summary
+from mock_llm_server import MockLLMServer, first_user_message
+from speculation import Speculator
+
+# ---------------------------
+# Benchmark: Speculative vs. Sequential Routing (level2)
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.speculative_routing [--questions 100] [--latency 0.15]
+# Every question goes to the (mock) LLM router. Sequential mode runs the winning branch (customer
+# prefetch or FAQ retrieval) after the route is known. Speculative mode starts both branches while
+# the router decides. Reports latency, the latency saved and the work wasted on cancelled branches,
+# with the local branches as they are (hashing embedder, SQLite) and with --branch-latency added
+# to each branch (a networked embedder or database). Then shows the budget switching speculation
+# off when the branches cost more than the routing call.
+
+QUESTIONS = [
+    "What is the return policy?",
+    "What is my current booking status? My number is {id}",
+    "What is the schedule for Tech Expo 2025?",
+    "Why was I billed twice this month? Customer {id}",
+    "Can I exchange an item bought on sale?",
+    "When does my subscription renew? My customer number is {id}",
+]
+
+
+def route_answer(payload) -> str:
+    """The mock router: database when the question carries a customer number, else FAQ."""
+    return json.dumps({"route": 1 if re.search(r"\d{4,}", first_user_message(payload)) else 2})
+
+
+def delayed(branch, seconds):
+    return lambda question: (time.sleep(seconds), branch(question))[1]
+
+
+def run(questions, speculative: bool) -> dict:
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        level2.route_with_context(question, use_fast_path=False, speculative=speculative)
+        latencies.append(time.perf_counter() - started)
+    return latency_summary(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency saved and work wasted by speculative routing.")
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.15, help="Mock latency of the routing call (s).")
+    parser.add_argument("--branch-latency", type=float, default=0.08, help="Added latency per branch (s).")
+    args = parser.parse_args()
+
+    get_store().seed(5_000)
+    questions = [QUESTIONS[i % len(QUESTIONS)].format(id=1000 + i) for i in range(args.questions)]
+    with MockLLMServer(latency=args.latency, responder=route_answer) as server:
+        llm_client.configure(base_url=server.base_url)
+        level2.route_with_context(questions[0], use_fast_path=False)  # Build the FAQ index, warm the client.
+
+        print(f"{'branches':>9} {'mode':>12} | {'p50 ms':>7} | {'p95 ms':>7} | {'saved ms/req':>12} | "
+              f"{'wasted ms/req':>13} | {'hits':>5}")
+        for branch_latency in (0.0, args.branch_latency):
+            for label, speculative in (("sequential", False), ("speculative", True)):
+                level2._speculator = Speculator({1: delayed(level2.prefetch_customer, branch_latency),
+                                                 2: delayed(level2.retrieve_faq, branch_latency)}, budget_ms=1e9)
+                summary = run(questions, speculative)
+                stats = level2.get_speculator().stats()
+                print(f"{'+' + format(branch_latency * 1000, '.0f') + ' ms':>9} {label:>12} | "
+                      f"{summary['p50_ms']:>7.1f} | {summary['p95_ms']:>7.1f} | "
+                      f"{stats['saved_ms_per_request'] if speculative else 0:>12.2f} | "
+                      f"{stats['wasted_ms_per_request'] if speculative else 0:>13.2f} | {stats['hits']:>5}")
+
+        # Branches that cost more than the routing call: the budget turns speculation off.
+        level2._speculator = Speculator({1: delayed(level2.prefetch_customer, args.latency * 1.5),
+                                         2: delayed(level2.retrieve_faq, args.latency * 1.5)},
+                                        budget_ms=args.latency * 1000 / 2, window=10, cooldown=60)
+        run(questions, speculative=True)
+        stats = level2.get_speculator().stats()
+        print(f"\nexpensive branches, budget {args.latency * 500:.0f} ms/loser: {stats['speculated']} speculated, "
+              f"{stats['sequential']} sequential after the budget was exceeded (enabled now: {stats['enabled']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# ---------------------------
+# Benchmark: Cold-Start Time per Entry Point
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.startup [-o startup.json] [--compare baseline.json]
+# Each entry point is imported in a fresh interpreter (`python -X importtime`). Reported:
+# median wall time above a bare interpreter, the summed import time of everything the entry
+# point pulls in, and its heaviest top-level imports. The "first use" rows also build the
+# agent, which is where pydantic_ai is now loaded.
+
+_LOAD_PLUS = "import importlib.util as u; s = u.spec_from_file_location('level5_plus', 'level5+.py'); " \
+             "m = u.module_from_spec(s); s.loader.exec_module(m)"
+
+ENTRY_POINTS = {
+    "level1": "import level1",
+    "level2": "import level2",
+    "level3": "import level3",
+    "level4": "import level4",
+    "level5": "import level5",
+    "level5+": _LOAD_PLUS,
+    "batch_inbox": "import batch_inbox",
+    "faq_index": "import faq_index",
+    "level4 first use": "import level4; level4.get_agent()",
+    "level5 first use": "import level5; level5.get_agent()",
+    "level5+ first use": _LOAD_PLUS + "; m.get_agent()",
+}
+
+
+def _run(code):
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-startup")}
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{proc.stderr[-2000:]}")
+    return wall, proc.stderr
+
+
+def parse_importtime(stderr):
+    """[(depth, module, cumulative ms)] from -X importtime output; depth 0 = imported by the entry point."""
+    result = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        result.append(((len(name) - len(name.lstrip(" ")) - 1) // 2, module, int(cumulative) / 1000))
+    return result
+
+
+def _is_repo_module(module) -> bool:
+    return os.path.exists(module.split(".")[0] + ".py")
+
+
+def measure(code, repeat, baseline_modules, baseline_wall):
+    walls, imports = [], None
+    for _ in range(repeat):
+        wall, stderr = _run(code)
+        walls.append(wall)
+        if imports is None:
+            imports = [entry for entry in parse_importtime(stderr) if entry[1] not in baseline_modules]
+    # Third-party/stdlib modules imported directly by the entry point or by one of our modules.
+    # importtime prints children before their parent, so walk backwards to find each parent.
+    external, parents = [], {}
+    for depth, module, ms in reversed(imports):
+        parents[depth] = module
+        parent = parents.get(depth - 1) if depth else None
+        if not _is_repo_module(module) and (parent is None or _is_repo_module(parent)):
+            external.append((module, ms))
+    return {
+        "wall_ms": max(0.0, (statistics.median(walls) - baseline_wall) * 1000),
+        "import_ms": sum(ms for depth, _, ms in imports if depth == 0),
+        "heaviest": sorted(external, key=lambda item: -item[1])[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time of each entry point.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="Measure only these entry points.")
+    parser.add_argument("-o", "--output", help="Write results JSON here.")
+    parser.add_argument("--compare", help="Results JSON from another commit to compare against.")
+    args = parser.parse_args()
+
+    baseline_walls, baseline_modules = [], set()
+    for _ in range(args.repeat):
+        wall, stderr = _run("pass")
+        baseline_walls.append(wall)
+        baseline_modules.update(module for _, module, _ in parse_importtime(stderr))
+    baseline_wall = statistics.median(baseline_walls)
+    print(f"bare interpreter: {baseline_wall * 1000:.0f} ms (subtracted below)\n")
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)["entry_points"]
+
+    results = {}
+    print(f"{'entry point':<20} {'wall ms':>8} {'import ms':>10}   heaviest imports")
+    for label, code in ENTRY_POINTS.items():
+        if args.only and label not in args.only:
+            continue
+        r = results[label] = measure(code, args.repeat, baseline_modules, baseline_wall)
+        heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in r["heaviest"])
+        line = f"{label:<20} {r['wall_ms']:>8.0f} {r['import_ms']:>10.0f}   {heaviest}"
+        if label in previous and previous[label]["wall_ms"]:
+            line += f"   ({r['wall_ms'] / previous[label]['wall_ms'] - 1:+.0%})"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "entry_points": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import time
+from contextlib import aclosing
+
+from benchmarks.suite import RESPONDER  # Also points every cache at a temporary directory.
+import level1
+import level2
+import level4
+import llm_client
+from metrics import percentile
+from mock_llm_server import MockLLMServer, ScriptedResponder, first_user_message
+
+# ---------------------------
+# Benchmark: Streaming vs. Blocking Responses
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.streaming [--latency-per-token 0.005]
+# For a long simple_processor answer, the level4 report and the level2 routing decision,
+# compares when the user sees the first token (TTFT) with the streaming API against when
+# the blocking call returns, and the total time of both. Questions are unique per
+# iteration, so the response cache never answers.
+
+LONG_ANSWER = " ".join(f"Sentence {i} of a long answer explains one more detail of the topic." for i in range(30))
+
+
+async def timed_stream(pieces):
+    """(ttft seconds, total seconds) of consuming an async generator of text pieces."""
+    started = time.perf_counter()
+    ttft = None
+    async with aclosing(pieces):
+        async for _ in pieces:
+            if ttft is None:
+                ttft = time.perf_counter() - started
+    return ttft, time.perf_counter() - started
+
+
+async def timed_call(coroutine):
+    started = time.perf_counter()
+    await coroutine
+    return time.perf_counter() - started
+
+
+def report(label, blocking, streamed):
+    """`blocking`: total seconds per call; `streamed`: (ttft, total) per call."""
+    ms = lambda values, q: percentile([v * 1000 for v in values], q)
+    ttfts, totals = [t for t, _ in streamed], [t for _, t in streamed]
+    print(f"  {label:<16} blocking p50 {ms(blocking, 50):7.1f} ms | streamed TTFT p50 {ms(ttfts, 50):7.1f} ms "
+          f"p95 {ms(ttfts, 95):7.1f} ms | streamed total p50 {ms(totals, 50):7.1f} ms")
+
+
+async def run(args):
+    n = args.iterations
+    print("simple_processor (long answer):")
+    blocking = [await timed_call(llm_client.chat_completion([{"role": "user", "content": f"Explain topic {i}"}]))
+                for i in range(n)]
+    streamed = [await timed_stream(level1.stream_simple_processor(f"Explain streamed topic {i}")) for i in range(n)]
+    report("answer", blocking, streamed)
+
+    print("level4 report (4 tool steps, then the report):")
+    blocking = [await timed_call(level4.get_agent().run(f"Comprehensive sales performance report #{i}",
+                                                        deps="Customer Query")) for i in range(n)]
+    streamed = [await timed_stream(level4.stream_data_analysis_agent(f"Streamed sales performance report #{i}"))
+                for i in range(n)]
+    report("report", blocking, streamed)
+
+    print("level2 routing decision:")
+    blocking = [await timed_call(asyncio.to_thread(level2.llm_router, f"Where is my order {i}?")) for i in range(n)]
+    streamed = []
+    for i in range(n):
+        started = time.perf_counter()
+        await level2.llm_router_stream(f"Where is my streamed order {i}?")
+        streamed.append((time.perf_counter() - started,) * 2)
+    report("route", blocking, streamed)
+    await llm_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first token of the streaming APIs vs. blocking calls.")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock delay before the first token.")
+    parser.add_argument("--latency-per-token", type=float, default=0.005)
+    args = parser.parse_args()
+    long_answers = ScriptedResponder(RESPONDER.scripts, default=lambda p: f"{first_user_message(p)}: {LONG_ANSWER}")
+    with MockLLMServer(latency=args.latency, latency_per_token=args.latency_per_token,
+                       responder=long_answers) as server:
+        llm_client.configure(base_url=server.base_url)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep every cache and artifact of the run out of the working tree.
+_WORKDIR = tempfile.mkdtemp(prefix="5levels-bench-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(_WORKDIR, "response_cache.db")
+os.environ["CODE_ARTIFACTS_PATH"] = os.path.join(_WORKDIR, "code_artifacts.db")
+os.environ["FAQ_INDEX_DIR"] = os.path.join(_WORKDIR, "faq_index")
+os.environ["TRANSCRIPT_DIR"] = os.path.join(_WORKDIR, "transcripts")
+os.environ["CUSTOMER_DB"] = os.path.join(_WORKDIR, "customers.db")
+os.environ["JOB_QUEUE_DB"] = os.path.join(_WORKDIR, "jobs.db")
+os.environ["SALES_SUMMARY_CSV"] = os.path.join(_WORKDIR, "summary.csv")
+os.environ["SALES_SUMMARY_CHART"] = os.path.join(_WORKDIR, "revenue_per_product.png")
+os.environ["SALES_SUMMARY_STATE"] = os.path.join(_WORKDIR, "sales_summary_state.json")
+
+import llm_client
+from metrics import latency_summary
+from mock_llm_server import (MockLLMServer, Script, ScriptedResponder, ToolCall,
+                             first_user_message, last_tool_output)
+
+# ---------------------------
+# Offline Benchmark Suite for All Five Levels
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.suite [-o results.json] [--compare baseline.json]
+# Every scenario runs against the scripted mock server and reports throughput, latency
+# percentiles, model round-trips per operation and peak Python memory. Questions are made
+# unique per iteration so caches never hide the code path being measured.
+
+SIGNUP_EMAIL = (
+    "Subject: Event Signup Request\n\n"
+    "Hi,\nI'd like to sign up for Tech Expo 2025. My name is Alice Johnson, my email is alice@example.com. "
+    "I work at Acme Innovations, a leading provider of AI solutions.\nBest,\nAlice"
+)
+GENERATED_CODE = "def main():\n    return 'Total users: 5'\n"
+
+
+def _handle(payload) -> str:
+    match = re.search(r"handle: (ds-\d+)", last_tool_output(payload))
+    return match.group(1) if match else "ds-1"
+
+
+def _structured(payload):
+    """Answers for response_format requests (level2 Routing, level5 MessageAssessment)."""
+    name = payload["response_format"].get("json_schema", {}).get("name", "")
+    if name == "Routing":
+        return json.dumps({"route": 2})
+    return json.dumps({
+        "type": "signup", "question": None, "decision": "VIP Attendee", "explanation": "Innovative AI company.",
+        "details": {"customer_name": "Alice Johnson", "customer_email": "alice@example.com", "company": "Acme Innovations",
+                    "company_description": "AI solutions", "event": "Tech Expo 2025"},
+    })
+
+
+RESPONDER = ScriptedResponder([
+    Script(lambda p: bool(p.get("response_format")), [_structured]),
+    Script("autonomous code generator", [GENERATED_CODE]),
+    Script("return policy", [
+        ToolCall("query_faq", lambda p: {"topic": "returns", "question": first_user_message(p)}),
+        "Returns are accepted within 30 days.",
+    ]),
+    Script("sales performance", [
+        ToolCall("load_data", lambda p: {"query": first_user_message(p)}),
+        ToolCall("clean_data", lambda p: {"dataset_handle": _handle(p)}),
+        ToolCall("analyze_data", lambda p: {"dataset_handle": _handle(p), "group_by": "product"}),
+        ToolCall("finalize_report", lambda p: {"analysis": last_tool_output(p)}),
+        lambda p: "Report:\n" + last_tool_output(p),
+    ]),
+    Script("Event Signup", [
+        ToolCall("classify_and_decide", lambda p: {"message": first_user_message(p)}),
+        # The templated path sends the email inside classify_and_decide (level5.TEMPLATED_EMAIL).
+        lambda p: ("The signup email has been sent." if "Email sent to" in last_tool_output(p)
+                   else ToolCall("generate_email", {"decision": last_tool_output(p)})),
+        ToolCall("send_email", lambda p: {"email_content": last_tool_output(p)}),
+        "The signup email has been sent.",
+    ]),
+    Script("Write Python code", [
+        ToolCall("generate_code", lambda p: {"goal": first_user_message(p)}),
+        ToolCall("execute_code", lambda p: {"code": last_tool_output(p)}),
+        lambda p: "Result: " + last_tool_output(p),
+    ]),
+])
+
+
+def load_level5_plus():
+    """level5+.py is not importable by name because of the '+'."""
+    spec = importlib.util.spec_from_file_location("level5_plus", "level5+.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_scenarios():
+    """name -> (callable(i), is_async)."""
+    import level1
+    import level2
+    import level3
+    import level4
+    import level5
+    from history import compaction
+    level5_plus = load_level5_plus()
+    level5.FUSED_CLASSIFICATION = True
+
+    # Agent runs compact their history, as the level run functions do.
+    async def level4_agent(i):
+        with compaction():
+            return (await level4.agent.run(f"Comprehensive sales performance report #{i}", deps="Customer Query")).data
+
+    async def level5_agent(i):
+        with compaction():
+            return (await level5.agent.run(SIGNUP_EMAIL + f"\n(ref {i})", deps={})).data
+
+    async def level5_plus_agent(i):
+        with compaction():
+            return (await level5_plus.agent.run(f"Write Python code that counts users (run {i}).", deps={})).data
+
+    return {
+        "level1_simple_processor": (lambda i: level1.simple_processor(f"What is the capital of France? #{i}"), False),
+        "level2_router_llm": (lambda i: level2.router(f"Tell me about the loyalty scheme #{i}", use_fast_path=False), False),
+        "level2_router_fast": (lambda i: level2.router(f"What is the return policy? #{i}"), False),
+        "level3_tool_calling": (lambda i: level3.tool_calling(f"What is the return policy? #{i}"), False),
+        "level4_agent": (level4_agent, True),
+        "level5_agent": (level5_agent, True),
+        "level5_plus_agent": (level5_plus_agent, True),
+    }
+
+
+def _run_batch(fn, is_async, start, count, concurrency):
+    """Run fn(start..start+count) with bounded concurrency; return per-call latencies."""
+    if is_async:
+        async def runner():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i):
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    await fn(i)
+                    return time.perf_counter() - t0
+
+            try:
+                return await asyncio.gather(*(one(i) for i in range(start, start + count)))
+            finally:
+                await llm_client.aclose()
+        return asyncio.run(runner())
+
+    def one(i):
+        t0 = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(one, range(start, start + count)))
+
+
+def run_scenario(server, fn, is_async, iterations, concurrency) -> dict:
+    _run_batch(fn, is_async, 0, 1, 1)  # Warm-up: imports, worker pools, connections.
+    server.reset_usage()
+    started = time.perf_counter()
+    latencies = _run_batch(fn, is_async, 1, iterations, concurrency)
+    result = latency_summary(latencies, time.perf_counter() - started)
+    usage = dict(server.usage)
+    result["round_trips"] = usage["calls"] / iterations
+    result["tokens"] = (usage["prompt_tokens"] + usage["completion_tokens"]) / iterations
+    result["injected_errors"] = usage["errors"] / iterations
+    # Peak memory is measured separately because tracemalloc distorts latency.
+    tracemalloc.start()
+    _run_batch(fn, is_async, iterations + 1, min(3, iterations), 1)
+    result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def print_results(results, baseline=None):
+    header = (f"{'scenario':<26} {'ops/sec':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'trips/op':>8} {'tokens/op':>9} {'peak MB':>8}")
+    print(header)
+    print("-" * len(header))
+    for name, r in results["scenarios"].items():
+        line = (f"{name:<26} {r['per_sec']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                f"{r['round_trips']:>8.2f} {r['tokens']:>9.0f} {r['peak_mb']:>8.2f}")
+        old = (baseline or {}).get("scenarios", {}).get(name)
+        if old and old["p50_ms"]:
+            line += f"   p50 {r['p50_ms'] / old['p50_ms'] - 1:+.0%} vs {baseline['commit']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for all five levels.")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock latency per model call (s).")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios.")
+    parser.add_argument("-o", "--output", help="Write results JSON here.")
+    parser.add_argument("--compare", help="Results JSON from another commit to compare p50 against.")
+    args = parser.parse_args()
+
+    with MockLLMServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       responder=RESPONDER, seed=42) as server:
+        llm_client.configure(base_url=server.base_url)
+        scenarios = build_scenarios()
+        results = {
+            "commit": _git_commit(), "timestamp": time.time(), "python": sys.version.split()[0],
+            "config": {"iterations": args.iterations, "concurrency": args.concurrency, "latency": args.latency,
+                       "jitter": args.jitter, "error_rate": args.error_rate},
+            "scenarios": {},
+        }
+        for name, (fn, is_async) in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            # The level modules print progress; keep it out of the report.
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results["scenarios"][name] = run_scenario(server, fn, is_async, args.iterations, args.concurrency)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
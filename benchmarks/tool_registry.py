@@ -0,0 +1,101 @@
+import argparse
+import json
+import time
+
+from pydantic import Field, create_model
+
+import level3
+from tool_registry import Tool, ToolRegistry
+
+# ---------------------------
+# Benchmark: Tool Registry Dispatch and Schema Tokens
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.tool_registry [--tools 40] [--calls 20000]
+# Builds a synthetic catalog of tools the size ours is heading for and compares, per call,
+# the old level3 pattern (schemas rebuilt with model_json_schema, arguments through
+# json.loads + Model(**...), an if/elif chain over the names) with the registry (cached
+# schemas, TypeAdapter.validate_json, table lookup). Then reports the schema tokens per
+# request with the full catalog vs. the prefiltered subset, for level3's own tools too.
+
+TOPICS = ["billing", "subscription", "shipping", "return", "warranty", "invoice", "booking", "payment",
+          "account", "password", "delivery", "refund", "event", "ticket", "store", "loyalty", "gift", "coupon",
+          "order", "plan"]
+
+QUESTIONS = [
+    "What is the return policy?",
+    "What is my current booking status? My number is 12345",
+    "How do I reset my account password?",
+    "Where is my delivery? Order 991",
+    "Can I use a gift coupon on a subscription plan?",
+]
+
+
+def build_catalog(n: int) -> ToolRegistry:
+    registry = ToolRegistry()
+    for i in range(n):
+        topic = TOPICS[i % len(TOPICS)]
+        model = create_model(
+            f"Tool{i}Args",
+            customer_id=(int, Field(..., description="Customer ID to fetch relevant data.")),
+            query_type=(str, Field(..., description=f"Type of {topic} query.")),
+            details=(str, Field(..., description="Detailed information about the query.")),
+        )
+        registry.register(Tool(f"{topic}_tool_{i}", f"Look up {topic} information (variant {i}).", model,
+                               lambda query: query.details, keywords=frozenset({topic})))
+    return registry
+
+
+def legacy_dispatch(registry: ToolRegistry, name: str, arguments: str) -> str:
+    """level3 before the registry: an if/elif chain and json.loads + Model(**...)."""
+    for tool in registry._tools.values():
+        if name == tool.name:
+            return tool.handler(tool.arguments(**json.loads(arguments)))
+    raise ValueError(f"Unknown tool {name!r}")
+
+
+def legacy_schemas(registry: ToolRegistry) -> list:
+    return [{"type": "function", "function": {
+        "name": tool.name, "description": tool.description,
+        "parameters": {**tool.arguments.model_json_schema(), "additionalProperties": False}, "strict": True}}
+        for tool in registry._tools.values()]
+
+
+def per_call_us(fn, calls: int) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tool dispatch overhead and schema tokens per request.")
+    parser.add_argument("--tools", type=int, default=40)
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    registry = build_catalog(args.tools)
+    names = registry.names
+    arguments = json.dumps({"customer_id": 12345, "query_type": "billing", "details": "Last invoice amount"})
+    assert legacy_dispatch(registry, names[-1], arguments) == registry.dispatch(names[-1], arguments)
+
+    print(f"{args.tools} tools, {args.calls:,} calls (names spread over the catalog)")
+    legacy = per_call_us(lambda i: legacy_dispatch(registry, names[i % len(names)], arguments), args.calls)
+    cached = per_call_us(lambda i: registry.dispatch(names[i % len(names)], arguments), args.calls)
+    print(f"dispatch + validation:  legacy {legacy:7.1f} us | registry {cached:7.1f} us | {legacy / cached:4.1f}x")
+    rounds = max(1, args.calls // 100)
+    legacy = per_call_us(lambda i: legacy_schemas(registry), rounds)
+    registry.schemas()  # Schemas are built once, on first use.
+    cached = per_call_us(lambda i: registry.schemas(registry.select(QUESTIONS[i % len(QUESTIONS)])), rounds)
+    print(f"tools list per request: legacy {legacy:7.1f} us | registry {cached:7.1f} us (incl. prefilter)\n")
+
+    print(f"{'question':<55} {'catalog':>8} {'selected':>9} {'level3':>7} {'level3 sel.':>12}")
+    for question in QUESTIONS:
+        selected = registry.select(question)
+        level3_selected = level3.registry.select(question)
+        print(f"{question[:55]:<55} {registry.schema_tokens():>8} {registry.schema_tokens(selected):>9} "
+              f"{level3.registry.schema_tokens():>7} {level3.registry.schema_tokens(level3_selected):>12}")
+    print("\n(schema tokens per request, ~4 characters each)")
+
+
+if __name__ == "__main__":
+    main()
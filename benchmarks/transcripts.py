@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+_WORKDIR = tempfile.mkdtemp(prefix="5levels-transcripts-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+os.environ["TRANSCRIPT_DIR"] = os.path.join(_WORKDIR, "transcripts")
+
+# ---------------------------
+# Benchmark: Printing Captured Runs vs. the Transcript Log (level4)
+# ---------------------------
+# Run from the repo root:  python -m benchmarks.transcripts [--runs 2000] [--concurrency 10]
+# Runs the level4 data analysis agent many times against the scripted mock server, each mode in
+# its own process; the mock runs in the parent, so child RSS is the agent side only. "print" is
+# the old behaviour: capture_run_messages keeps every message of the run and all steps are
+# printed at the end (stdout goes to /dev/null). "transcript" is run_data_analysis_agent as it
+# is now, streaming each step to the compressed log. Reports time per run, current RSS sampled
+# as the runs go on, peak RSS and the size of the log on disk.
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+async def _print_run(level4, query):
+    """The old run_data_analysis_agent: capture everything, print it all at the end."""
+    from pydantic_ai import capture_run_messages
+    from history import compaction
+    with capture_run_messages() as messages, compaction():
+        final_response = await level4.get_agent().run(query, deps="Customer Query")
+    print("Final Report Output:")
+    print(final_response.data)
+    print("\n--- Steps Taken ---\n")
+    for idx, msg in enumerate(messages, start=1):
+        print(f"Step {idx} [{msg.kind}]:")
+        for part in msg.parts:
+            if part.part_kind in ("system-prompt", "user-prompt", "text"):
+                print(f"  {part.part_kind.capitalize()}: {part.content}")
+            elif part.part_kind == "tool-call":
+                print(f"  Tool Call: {part.tool_name} with args: {part.args}")
+            elif part.part_kind == "tool-return":
+                print(f"  Tool Return ({part.tool_name}): {part.content}")
+        print("-" * 50)
+    return final_response.data
+
+
+async def _runs(mode: str, runs: int, concurrency: int, samples: int) -> list:
+    import level4
+    import llm_client
+    run = (lambda query: _print_run(level4, query)) if mode == "print" else level4.run_data_analysis_agent
+    semaphore = asyncio.Semaphore(concurrency)
+    rss, every = [], max(1, runs // samples)
+
+    async def one(i):
+        async with semaphore:
+            await run(f"Comprehensive sales performance report #{i}")
+            if (i + 1) % every == 0:
+                rss.append(_rss_mb())
+
+    await asyncio.gather(*(one(i) for i in range(runs)))
+    await llm_client.aclose()
+    return rss
+
+
+def child(mode: str, base_url: str, runs: int, concurrency: int, samples: int):
+    """One mode in this process; prints a single result line for the parent."""
+    import llm_client
+
+    llm_client.configure(base_url=base_url)
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rss = asyncio.run(_runs(mode, runs, concurrency, samples))
+    elapsed = time.perf_counter() - started
+    log_bytes = sum(os.path.getsize(os.path.join(root, name))
+                    for root, _, names in os.walk(os.environ["TRANSCRIPT_DIR"]) for name in names)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6
+    print(f"{elapsed / runs * 1000:.2f} {peak:.1f} {log_bytes} " + ",".join(f"{mb:.1f}" for mb in rss))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory of printing captured runs vs. the transcript log.")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=5, help="RSS samples taken over the runs.")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "BASE_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child, args.runs, args.concurrency, args.samples)
+
+    from benchmarks.suite import RESPONDER
+    from mock_llm_server import MockLLMServer
+
+    print(f"{args.runs} level4 runs, concurrency {args.concurrency}")
+    print(f"{'mode':>10} | {'ms/run':>7} | {'peak RSS MB':>11} | {'log KB':>7} | RSS MB over the runs")
+    with MockLLMServer(latency=0.0, responder=RESPONDER) as server:
+        for mode in ("print", "transcript"):
+            server.reset_usage()
+            output = subprocess.run([sys.executable, "-m", "benchmarks.transcripts", "--child", mode, server.base_url,
+                                     "--runs", str(args.runs), "--concurrency", str(args.concurrency),
+                                     "--samples", str(args.samples)],
+                                    capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+            per_run, peak, log_bytes, rss = output.split(" ", 3)
+            print(f"{mode:>10} | {float(per_run):>7.2f} | {float(peak):>11.1f} | {int(log_bytes) / 1e3:>7.0f} | "
+                  f"{rss.replace(',', ' -> ')}")
+
+
+if __name__ == "__main__":
+    main()
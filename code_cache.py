@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from code_runner import strip_code_fences
+from response_cache import normalize
+import tracing
+
+# ---------------------------
+# Content-Addressed Store for Generated Code
+# ---------------------------
+# Code produced by generate_code is keyed by a hash of the normalized goal + model.
+# It is only persisted once execute_code ran its main() without error. It is dropped again
+# when a later execution raises an error in the code itself (not on a timeout or a crashed
+# worker) or when the files/databases the goal refers to change schema (CSV header, SQLite
+# table definitions). The schema is fingerprinted before the code runs, both when the code is
+# handed out and when a cached entry is looked up, so the two are compared like for like.
+
+MAX_PENDING = int(os.getenv("CODE_CACHE_MAX_PENDING", "256"))
+FILE_REFERENCE = re.compile(r"['\"]([\w./-]+\.(?:csv|db|sqlite3?))['\"]", re.IGNORECASE)
+
+
+def goal_key(goal: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize(goal)}".encode()).hexdigest()
+
+
+def code_digest(code: str) -> str:
+    return hashlib.sha256(strip_code_fences(code.strip()).strip().encode()).hexdigest()
+
+
+def schema_fingerprint(goal: str) -> str:
+    """Hash of the schema of every file named in the goal ('missing' for files that don't exist yet)."""
+    parts = []
+    for name in sorted(set(FILE_REFERENCE.findall(goal))):
+        if not os.path.exists(name):
+            parts.append(f"{name}:missing")
+        elif name.lower().endswith(".csv"):
+            with open(name, encoding="utf-8", errors="replace") as f:
+                parts.append(f"{name}:{f.readline().strip()}")
+        else:
+            try:
+                with sqlite3.connect(f"file:{name}?mode=ro", uri=True) as db:
+                    tables = db.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+                parts.append(f"{name}:{tables}")
+            except sqlite3.DatabaseError as e:
+                parts.append(f"{name}:unreadable:{e}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+class CodeArtifactStore:
+    """SQLite store of verified generated code, plus in-memory bookkeeping for code awaiting execution."""
+
+    def __init__(self, path: str = "code_artifacts.db"):
+        self._lock = threading.Lock()
+        # code digest -> (goal key, goal, model, fingerprint), LRU-bounded: code the agent edits
+        # before running it never comes back under the same digest.
+        self._pending = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "stored": 0, "invalidated": 0}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " goal_key TEXT PRIMARY KEY, model TEXT, goal TEXT, code TEXT, code_digest TEXT,"
+            " fingerprint TEXT, verified_at REAL, uses INTEGER DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_digest ON artifacts(code_digest)")
+        self._db.commit()
+
+    def lookup(self, goal: str, model: str):
+        """Verified code for this goal, or None (stale schemas invalidate the entry)."""
+        key = goal_key(goal, model)
+        with self._lock:
+            row = self._db.execute("SELECT code, fingerprint FROM artifacts WHERE goal_key = ?", (key,)).fetchone()
+            if row is not None and row[1] != schema_fingerprint(goal):
+                self._db.execute("DELETE FROM artifacts WHERE goal_key = ?", (key,))
+                self._db.commit()
+                self.counters["invalidated"] += 1
+                row = None
+            if row is None:
+                self.counters["misses"] += 1
+                tracing.annotate(cache="miss")
+                return None
+            self._db.execute("UPDATE artifacts SET uses = uses + 1 WHERE goal_key = ?", (key,))
+            self._db.commit()
+            self.counters["hits"] += 1
+            tracing.annotate(cache="exact")
+            self._add_pending(code_digest(row[0]), (key, goal, model, row[1]))
+            return row[0]
+
+    def register(self, goal: str, model: str, code: str):
+        """Remember freshly generated code (and the schema it will run against) until execute_code reports."""
+        fingerprint = schema_fingerprint(goal)
+        with self._lock:
+            self._add_pending(code_digest(code), (goal_key(goal, model), goal, model, fingerprint))
+
+    def _add_pending(self, digest, entry):
+        """Under the lock."""
+        self._pending[digest] = entry
+        self._pending.move_to_end(digest)
+        while len(self._pending) > MAX_PENDING:
+            self._pending.popitem(last=False)
+
+    def record_execution(self, code: str, ok: bool, failure: str = None):
+        """
+        Persist code whose main() succeeded. A failure in the code itself (`failure` "code", see
+        code_runner) drops it from the cache; timeouts and crashed workers leave it alone.
+        """
+        digest = code_digest(code)
+        with self._lock:
+            pending = self._pending.pop(digest, None)
+            if ok and pending is not None:
+                key, goal, model, fingerprint = pending
+                # Re-verifying the same code keeps its reuse count; new code for the goal starts at 0.
+                self._db.execute(
+                    "INSERT INTO artifacts (goal_key, model, goal, code, code_digest, fingerprint, verified_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(goal_key) DO UPDATE SET model = excluded.model, goal = excluded.goal,"
+                    " code = excluded.code, fingerprint = excluded.fingerprint, verified_at = excluded.verified_at,"
+                    " uses = CASE WHEN code_digest = excluded.code_digest THEN uses ELSE 0 END,"
+                    " code_digest = excluded.code_digest",
+                    (key, model, goal, code, digest, fingerprint, time.time()),
+                )
+                self.counters["stored"] += 1
+            elif not ok and failure == "code":
+                removed = self._db.execute("DELETE FROM artifacts WHERE code_digest = ?", (digest,)).rowcount
+                self.counters["invalidated"] += removed
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+        return {**self.counters, "entries": entries}
+
+
+_default_store = None
+
+
+def get_store() -> CodeArtifactStore:
+    """Shared store at CODE_ARTIFACTS_PATH (default code_artifacts.db)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = CodeArtifactStore(os.getenv("CODE_ARTIFACTS_PATH", "code_artifacts.db"))
+    return _default_store
@@ -0,0 +1,244 @@
+import asyncio
+import atexit
+import contextlib
+import importlib
+import io
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+import traceback
+
+# ---------------------------
+# Warm Worker Pool for Generated Code
+# ---------------------------
+# Generated code runs in separate worker processes instead of inside the agent. Each
+# worker imports the heavy libraries (pandas, matplotlib, ...) once at startup, then
+# executes many snippets, each under CPU-time, memory and wall-clock limits.
+# Results and captured stdout come back over a pipe. Workers retire after
+# `max_runs` executions (or when they crash or time out), and a replacement starts right away.
+# Workers come from a forkserver that did the imports once, so a replacement is a fork of a
+# clean, single-threaded process rather than of the (threaded) agent. Each snippet gets the
+# worker's working directory, environment, sys.path and module set back when it finishes.
+
+DEFAULT_PRELOAD = ("sqlite3", "csv", "json", "numpy", "pandas", "matplotlib", "matplotlib.pyplot")
+
+
+def strip_code_fences(code: str) -> str:
+    """Remove Markdown code fences if present."""
+    if code.startswith("```"):
+        lines = code.splitlines()
+        if lines[0].startswith("```"):
+            lines = lines[1:]
+        if lines and lines[-1].startswith("```"):
+            lines = lines[:-1]
+        code = "\n".join(lines)
+    return code
+
+
+def _restore_modules(before: set):
+    """Drop packages first imported by a snippet; submodules of packages loaded earlier stay."""
+    loaded = {name.partition(".")[0] for name in before}
+    for name in list(sys.modules):
+        if name not in before and name.partition(".")[0] not in loaded:
+            del sys.modules[name]
+
+
+def _execute(code: str) -> dict:
+    """Run `code`, call its main() and capture stdout/stderr (runs inside the worker)."""
+    stdout = io.StringIO()
+    namespace = {"__name__": "__generated__"}
+    reply = {"ok": False, "result": None, "error": None, "failure": None}
+    cwd, environ, path, modules = os.getcwd(), dict(os.environ), list(sys.path), set(sys.modules)
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stdout):
+            exec(strip_code_fences(code), namespace)
+            if "main" in namespace and callable(namespace["main"]):
+                reply["result"] = str(namespace["main"]())
+                reply["ok"] = True
+            else:
+                reply["error"] = "No main() function defined in the generated code."
+                reply["failure"] = "code"
+    except MemoryError:
+        reply["error"] = "Memory limit exceeded."
+        reply["failure"] = "limit"
+    except (Exception, SystemExit) as e:
+        reply["error"] = f"{type(e).__name__}: {e}"
+        reply["failure"] = "code"
+        reply["traceback"] = traceback.format_exc(limit=5)
+    finally:
+        # Later snippets must see the same process state, e.g. relative paths like 'sales.csv'.
+        os.chdir(cwd)
+        if os.environ != environ:
+            os.environ.clear()
+            os.environ.update(environ)
+        sys.path[:] = path
+        _restore_modules(modules)
+    reply["stdout"] = stdout.getvalue()
+    return reply
+
+
+def _worker_main(conn, preload, memory_mb):
+    if memory_mb:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024, hard))
+    os.environ.setdefault("MPLBACKEND", "Agg")  # No display inside workers.
+    for module in preload:  # Already loaded by the forkserver, unless it is not available.
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    if "matplotlib" in sys.modules:
+        sys.modules["matplotlib"].use("Agg")  # The forkserver imported it before MPLBACKEND was set.
+    conn.send({"ready": True})
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        code, cpu_seconds = message
+        if cpu_seconds:
+            # RLIMIT_CPU counts the whole process lifetime, so extend it from current usage.
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+        conn.send(_execute(code))
+
+
+class _Worker:
+    def __init__(self, ctx, preload, memory_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, preload, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.runs = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class CodeWorkerPool:
+    """Pool of pre-started worker processes that execute generated code with resource limits."""
+
+    def __init__(self, size: int = 2, max_runs: int = 20, cpu_seconds: int = 30, memory_mb: int = 2048,
+                 wall_timeout: float = 60, startup_timeout: float = 60, preload=DEFAULT_PRELOAD):
+        self.max_runs = max_runs
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_timeout = wall_timeout
+        self.startup_timeout = startup_timeout
+        self.preload = tuple(preload)
+        # Forking the agent from a to_thread worker while other threads hold locks can deadlock the
+        # child; the forkserver is single-threaded and already has the libraries imported.
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload([__name__, *self.preload])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._all = set()
+        self._lock = threading.Lock()
+        self.stats = {"runs": 0, "recycled": 0, "timeouts": 0, "crashes": 0}
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.preload, self.memory_mb)
+        with self._lock:
+            self._all.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker):
+        with self._lock:
+            self._all.discard(worker)
+        worker.stop()
+
+    def run(self, code: str) -> dict:
+        """
+        Execute `code` on an idle worker and return a dict with ok, result, stdout, error, failure and
+        duration. `failure` says why a run failed: "code" (the snippet raised or has no main()),
+        "limit" (memory or wall-clock limit) or "crash" (the worker died). Blocks while all workers are busy.
+        """
+        worker = self._idle.get()
+        start = time.perf_counter()
+        replace = False
+        try:
+            if not worker.ready:
+                if not worker.conn.poll(self.startup_timeout):
+                    raise TimeoutError("Worker did not start in time.")
+                worker.conn.recv()
+                worker.ready = True
+            worker.conn.send((code, self.cpu_seconds))
+            if worker.conn.poll(self.wall_timeout):
+                reply = worker.conn.recv()
+            else:
+                self.stats["timeouts"] += 1
+                reply = {"ok": False, "result": None, "stdout": "", "failure": "limit",
+                         "error": f"Wall-clock limit of {self.wall_timeout}s exceeded."}
+                replace = True
+        except (EOFError, OSError, TimeoutError) as e:
+            worker.process.join(timeout=1)
+            self.stats["crashes"] += 1
+            reason = "CPU or memory limit exceeded" if worker.process.exitcode is not None else str(e)
+            reply = {"ok": False, "result": None, "stdout": "", "failure": "crash",
+                     "error": f"Worker died ({reason}, exit code {worker.process.exitcode})."}
+            replace = True
+        worker.runs += 1
+        self.stats["runs"] += 1
+        if worker.runs >= self.max_runs:
+            self.stats["recycled"] += 1
+            replace = True
+        if replace:
+            # Stop the old worker in the background; the replacement starts importing immediately.
+            threading.Thread(target=self._retire, args=(worker,), daemon=True).start()
+            worker = self._spawn()
+        self._idle.put(worker)
+        reply["duration"] = time.perf_counter() - start
+        return reply
+
+    async def arun(self, code: str) -> dict:
+        """Async wrapper so the agent's event loop keeps running while code executes."""
+        return await asyncio.to_thread(self.run, code)
+
+    def close(self):
+        with self._lock:
+            workers = list(self._all)
+            self._all.clear()
+        for worker in workers:
+            worker.stop()
+
+
+_default_pool = None
+
+
+def get_pool() -> CodeWorkerPool:
+    """
+    Shared pool configured from CODE_POOL_SIZE, CODE_POOL_MAX_RUNS, CODE_CPU_SECONDS,
+    CODE_MEMORY_MB and CODE_WALL_TIMEOUT.
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = CodeWorkerPool(
+            size=int(os.getenv("CODE_POOL_SIZE", "2")),
+            max_runs=int(os.getenv("CODE_POOL_MAX_RUNS", "20")),
+            cpu_seconds=int(os.getenv("CODE_CPU_SECONDS", "30")),
+            memory_mb=int(os.getenv("CODE_MEMORY_MB", "2048")),
+            wall_timeout=float(os.getenv("CODE_WALL_TIMEOUT", "60")),
+        )
+        atexit.register(_default_pool.close)
+    return _default_pool
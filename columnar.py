@@ -0,0 +1,149 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+import numpy as np
+import analytics
+
+# ---------------------------
+# Columnar Sales Store
+# ---------------------------
+# Re-parsing sales.csv as text is the dominant cost of every analysis, so an ingestion step
+# converts it once into a directory of raw little-endian column files next to the CSV
+# (sales.csv -> sales.csv.col/):
+#   product.i4  int32 codes into the product dictionary kept in meta.json
+#   quantity.f8 float64 quantity (fractional quantities are kept, as in the CSV path)
+#   price.f8    float64 price
+#   day.i4      int32 days since 1970-01-01, analytics.UNDATED for dates that don't parse
+# Later runs memory-map the columns (zero-copy; the OS pages in only what is touched).
+# analytics.register_csv uses the store automatically while it matches the CSV's size and
+# modification time; otherwise it falls back to parsing the CSV.
+#
+# Convert with  python columnar.py sales.csv
+
+COLUMNS = {"product": "<i4", "quantity": "<f8", "price": "<f8", "day": "<i4"}
+FORMAT_VERSION = 2
+
+
+def store_path(csv_path: str) -> str:
+    return csv_path + ".col"
+
+
+def _source_signature(csv_path) -> dict:
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def convert(csv_path: str, out_dir: str = None) -> dict:
+    """
+    Convert a date/product/quantity/price CSV into a columnar store, streaming it in chunks.
+    Rows the CSV path would drop (missing or non-numeric values) are skipped and counted; rows
+    whose date doesn't parse are kept with the UNDATED day, so totals match the CSV path.
+    Returns the store's metadata.
+    """
+    started = time.perf_counter()
+    out_dir = out_dir or store_path(csv_path)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    dataset = analytics.Dataset(None, os.path.basename(csv_path), [c.strip().lower() for c in header], path=csv_path)
+    missing = [c for c in ("date", "product", "quantity", "price") if c not in dataset.columns]
+    if missing:
+        raise ValueError(f"{csv_path} has no {', '.join(missing)} column(s)")
+    signature = _source_signature(csv_path)
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    files = {name: open(os.path.join(tmp_dir, f"{name}.{dtype[1:]}"), "wb") for name, dtype in COLUMNS.items()}
+    dictionary, codes_by_label = [], {}
+    rows = dropped = 0
+    try:
+        for chunk, chunk_dropped in analytics.iter_chunks(dataset):
+            dropped += chunk_dropped
+            if not len(chunk["value"]):
+                continue
+            labels, inverse = np.unique(chunk["product"], return_inverse=True)
+            for label in labels.tolist():
+                if label not in codes_by_label:
+                    codes_by_label[label] = len(dictionary)
+                    dictionary.append(label)
+            mapping = np.array([codes_by_label[label] for label in labels.tolist()], dtype=np.int32)
+            columns = {
+                "product": mapping[inverse],
+                "quantity": chunk["quantity"],
+                "price": chunk["price"],
+                "day": analytics.day_numbers(chunk["date"]),
+            }
+            for name, values in columns.items():
+                values.astype(COLUMNS[name]).tofile(files[name])
+            rows += len(chunk["value"])
+    finally:
+        for f in files.values():
+            f.close()
+    meta = {"version": FORMAT_VERSION, "rows": rows, "dropped": dropped, "columns": COLUMNS,
+            "products": dictionary, "source": {"path": os.path.basename(csv_path), **signature}}
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    if _source_signature(csv_path) != signature:
+        shutil.rmtree(tmp_dir)
+        raise RuntimeError(f"{csv_path} changed during conversion; run it again")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    meta["seconds"] = time.perf_counter() - started
+    return meta
+
+
+class ColumnarTable:
+    """Memory-mapped view of a columnar store; columns are read-only NumPy arrays."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported columnar format version {self.meta.get('version')}")
+        self.rows = self.meta["rows"]
+        self.dropped = self.meta["dropped"]
+        self.products = np.array(self.meta["products"], dtype=str)
+        self._columns = {}
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            dtype = self.meta["columns"][name]
+            file = os.path.join(self.path, f"{name}.{dtype[1:]}")
+            # np.memmap cannot map an empty file.
+            self._columns[name] = (np.memmap(file, dtype=dtype, mode="r", shape=(self.rows,)) if self.rows
+                                   else np.empty(0, dtype=dtype))
+        return self._columns[name]
+
+    def matches(self, csv_path: str) -> bool:
+        """True while the CSV is the exact file this store was converted from."""
+        try:
+            signature = _source_signature(csv_path)
+        except FileNotFoundError:
+            return False
+        source = self.meta["source"]
+        return (source["size"], source["mtime_ns"]) == (signature["size"], signature["mtime_ns"])
+
+
+def open_fresh(csv_path: str):
+    """The columnar store for `csv_path` if it exists and is up to date with the CSV, else None."""
+    path = store_path(csv_path)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    try:
+        table = ColumnarTable(path)
+    except (ValueError, KeyError):
+        return None
+    return table if table.matches(csv_path) else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a sales CSV into the columnar store.")
+    parser.add_argument("csv", nargs="?", default=os.getenv("SALES_CSV", "sales.csv"))
+    parser.add_argument("-o", "--output", help="Store directory (default: <csv>.col).")
+    args = parser.parse_args()
+    meta = convert(args.csv, args.output)
+    print(f"Converted {meta['rows']} rows ({meta['dropped']} dropped, {len(meta['products'])} products) "
+          f"into {args.output or store_path(args.csv)} in {meta['seconds']:.2f}s")
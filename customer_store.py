@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+
+# ---------------------------
+# Indexed Customer Data Backend
+# ---------------------------
+# Billing and subscription records per customer in SQLite, looked up by
+# (customer_id, query_type) through a covering primary-key index. Reads go through a
+# small pool of read-only connections (sqlite3 keeps the prepared statements of its
+# constant SQL cached per connection) and an in-process read-through LRU cache that
+# writes invalidate. Every invalidation bumps a generation number; a read only fills the
+# cache if no write invalidated in between, so a racing upsert can't leave stale data cached.
+
+QUERY_TYPES = ("billing", "subscription")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customer_records (
+    customer_id INTEGER NOT NULL REFERENCES customers(customer_id),
+    query_type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (customer_id, query_type)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_customer_records_type ON customer_records(query_type);
+"""
+
+_SELECT_ONE = "SELECT data FROM customer_records WHERE customer_id = ? AND query_type = ?"
+_UPSERT = ("INSERT INTO customer_records (customer_id, query_type, data, updated_at) VALUES (?, ?, ?, ?) "
+           "ON CONFLICT(customer_id, query_type) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at")
+
+
+def normalize_query_type(query_type: str) -> str:
+    """Map free-text types from the model ('Billing info', 'subscriptions') onto QUERY_TYPES, else ''."""
+    lowered = query_type.strip().lower()
+    for known in QUERY_TYPES:
+        if known in lowered:
+            return known
+    return ""
+
+
+class CustomerStore:
+    """Pooled, cached lookups of customer records."""
+
+    def __init__(self, path: str = "customers.db", pool_size: int = 4, cache_size: int = 50_000, cache_ttl: float = 300):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._cache = OrderedDict()  # (customer_id, query_type) -> (expires_at, data or None)
+        self._cache_lock = threading.Lock()  # Also guards counters and _generation.
+        self._generation = 0
+        with closing(sqlite3.connect(path)) as db:
+            db.executescript(_SCHEMA)
+            db.execute("PRAGMA journal_mode=WAL")
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect(readonly=True))
+
+    def _connect(self, readonly: bool):
+        uri = f"file:{self.path}?mode=ro" if readonly else f"file:{self.path}"
+        db = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=64)
+        db.execute("PRAGMA mmap_size = 268435456")
+        return db
+
+    @contextmanager
+    def _connection(self):
+        db = self._pool.get()
+        try:
+            yield db
+        finally:
+            self._pool.put(db)
+
+    # ----- cache -----
+    def _cache_get(self, key):
+        """(hit, data, generation); on a miss, pass `generation` to _cache_put after reading the database."""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.counters["misses"] += 1
+                return False, None, self._generation
+            self._cache.move_to_end(key)
+            self.counters["hits"] += 1
+            return True, entry[1], self._generation
+
+    def _cache_put(self, key, data, generation):
+        with self._cache_lock:
+            if generation != self._generation:
+                return  # A write landed while we read; what we read may already be stale.
+            self._cache[key] = (time.monotonic() + self.cache_ttl, data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, customer_id: int, query_type: str = None):
+        """Drop cached entries for a customer (one type or all)."""
+        with self._cache_lock:
+            self._generation += 1
+            for known in ([query_type] if query_type else QUERY_TYPES):
+                if self._cache.pop((customer_id, known), None) is not None:
+                    self.counters["invalidations"] += 1
+
+    # ----- reads -----
+    def lookup(self, customer_id: int, query_type: str):
+        """Record dict for (customer_id, query_type), or None when there is none."""
+        key = (customer_id, query_type)
+        hit, data, generation = self._cache_get(key)
+        if hit:
+            return data
+        with self._connection() as db:
+            row = db.execute(_SELECT_ONE, key).fetchone()
+        data = json.loads(row[0]) if row else None
+        self._cache_put(key, data, generation)
+        return data
+
+    def lookup_all(self, customer_id: int) -> dict:
+        """Every record type stored for a customer."""
+        records = self.lookup_many([(customer_id, t) for t in QUERY_TYPES])
+        return {query_type: data for (_, query_type), data in records.items() if data is not None}
+
+    def lookup_many(self, keys) -> dict:
+        """Batched lookup: {(customer_id, query_type): data or None} with one query for all cache misses."""
+        results, missing, generation = {}, [], None
+        for key in dict.fromkeys(keys):
+            hit, data, current = self._cache_get(key)
+            if hit:
+                results[key] = data
+            else:
+                missing.append(key)
+                generation = current if generation is None else generation
+        if missing:
+            placeholders = ",".join("(?, ?)" for _ in missing)
+            params = [value for key in missing for value in key]
+            with self._connection() as db:
+                rows = db.execute(
+                    "SELECT customer_id, query_type, data FROM customer_records "
+                    f"WHERE (customer_id, query_type) IN (VALUES {placeholders})", params
+                ).fetchall()
+            found = {(customer_id, query_type): json.loads(data) for customer_id, query_type, data in rows}
+            for key in missing:
+                results[key] = found.get(key)
+                self._cache_put(key, results[key], generation)
+        return results
+
+    # ----- writes -----
+    def upsert(self, customer_id: int, query_type: str, data: dict):
+        with self._write() as db:
+            db.execute(_UPSERT, (customer_id, query_type, json.dumps(data), time.time()))
+        self.invalidate(customer_id, query_type)
+
+    @contextmanager
+    def _write(self):
+        db = self._connect(readonly=False)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def seed(self, n_customers: int, seed: int = 0):
+        """Fill the store with synthetic customers, each with a billing and a subscription record."""
+        rng = random.Random(seed)
+        plans = ("Basic", "Plus", "Premium", "Enterprise")
+        now = time.time()
+        with self._write() as db:
+            db.executemany("INSERT OR REPLACE INTO customers VALUES (?, ?, ?)",
+                           ((i, f"Customer {i}", f"customer{i}@example.com") for i in range(1, n_customers + 1)))
+            rows = []
+            for i in range(1, n_customers + 1):
+                plan = rng.choice(plans)
+                rows.append((i, "billing", json.dumps({
+                    "balance_due": round(rng.uniform(0, 500), 2), "last_invoice": f"INV-{i:07d}",
+                    "payment_method": rng.choice(("card", "invoice", "direct debit")),
+                }), now))
+                rows.append((i, "subscription", json.dumps({
+                    "plan": plan, "status": rng.choice(("active", "active", "active", "paused", "cancelled")),
+                    "renews_on": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                }), now))
+            db.executemany(_UPSERT, rows)
+        with self._cache_lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._cache_lock:
+            return {**self.counters, "cached": len(self._cache)}
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+_default_store = None
+
+
+def get_store() -> CustomerStore:
+    """Shared store at CUSTOMER_DB (default customers.db)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = CustomerStore(os.getenv("CUSTOMER_DB", "customers.db"))
+    return _default_store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the customer lookup database.")
+    parser.add_argument("command", choices=["seed"])
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--db", default=os.getenv("CUSTOMER_DB", "customers.db"))
+    args = parser.parse_args()
+    store = CustomerStore(args.db)
+    store.seed(args.customers)
+    print(f"Seeded {args.customers} customers into {args.db}")
@@ -0,0 +1,401 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import zlib
+import numpy as np
+
+# ---------------------------
+# Local FAQ Retrieval Index
+# ---------------------------
+# FAQ documents (FAQ_DOCS_DIR, *.md / *.txt) are split into chunks and embedded ahead of time.
+# The index directory (FAQ_INDEX_DIR) holds the normalized embeddings as a .npy matrix that is
+# memory-mapped on load, the chunk texts as one UTF-8 blob with an offsets array, and a small
+# manifest. Loading therefore reads only the manifest; search is a vectorized dot product
+# (or an IVF probe of the nearest clusters for large corpora). Re-indexing only re-embeds
+# documents whose content changed and copies the rows of everything else. The shared index
+# looks for changed docs at most every FAQ_STALE_CHECK_S seconds (0 = on every query, -1 =
+# never); call reindex() after editing the docs to pick the change up at once.
+
+DOCS_DIR = os.getenv("FAQ_DOCS_DIR", "faq_docs")
+INDEX_DIR = os.getenv("FAQ_INDEX_DIR", "faq_index")
+CHUNK_WORDS = int(os.getenv("FAQ_CHUNK_WORDS", "120"))
+IVF_MIN_CHUNKS = int(os.getenv("FAQ_IVF_MIN_CHUNKS", "20000"))
+STALE_CHECK_S = float(os.getenv("FAQ_STALE_CHECK_S", "30"))
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it my of on or our the to we what when "
+    "where which who will with you your".split()
+)
+
+
+# ---------------------------
+# Embedders
+# ---------------------------
+def _stem(word: str) -> str:
+    """Crude suffix stripping so 'returns'/'returned' and 'policies'/'policy' share features."""
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            stem = word[:-len(suffix)] + replacement
+            if suffix in ("ing", "ed") and stem[-1] == stem[-2] and stem[-1] not in "aeiou":
+                stem = stem[:-1]  # shipping -> ship, cancelled -> cancel
+            return stem
+    return word
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: signed feature hashing of word unigrams and bigrams with sublinear term
+    frequency. Deterministic across processes, no network, good enough for lexical FAQ matching.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str):
+        words = [_stem(w) for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                index = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+                counts[index] = counts.get(index, 0) + 1
+            for (column, sign), count in counts.items():
+                matrix[row, column] += sign * (1.0 + np.log(count))
+        return matrix
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API through the shared client, in batches."""
+
+    def __init__(self, model: str = "text-embedding-3-small", batch_size: int = 256):
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"openai-{model}"
+
+    def embed(self, texts) -> np.ndarray:
+        from llm_client import get_client
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            response = get_client().embeddings.create(model=self.model, input=list(texts[i:i + self.batch_size]))
+            vectors.extend(item.embedding for item in response.data)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+def get_embedder(spec: str = None):
+    """FAQ_EMBEDDER: 'hashing' (default), 'hashing:<dim>' or 'openai[:<model>]'."""
+    spec = spec or os.getenv("FAQ_EMBEDDER", "hashing")
+    kind, _, arg = spec.partition(":")
+    if kind == "openai":
+        return OpenAIEmbedder(arg or "text-embedding-3-small")
+    if kind == "hashing":
+        return HashingEmbedder(int(arg or 1024))
+    raise ValueError(f"Unknown FAQ_EMBEDDER {spec!r}")
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+# ---------------------------
+# Chunking
+# ---------------------------
+def chunk_document(text: str, max_words: int = CHUNK_WORDS) -> list:
+    """
+    Split on blank lines, then pack sentences into chunks of at most `max_words` words. A
+    document's title (its first line) is prefixed to every chunk so each chunk stands alone.
+    """
+    lines = text.strip().splitlines()
+    if not lines:
+        return []
+    title = lines[0].lstrip("# ").strip()
+    body = "\n".join(lines[1:]).strip() or title
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", body):
+        current, words = [], 0
+        for sentence in _SENTENCE.split(" ".join(paragraph.split())):
+            n = len(sentence.split())
+            if current and words + n > max_words:
+                chunks.append(" ".join(current))
+                current, words = [], 0
+            current.append(sentence)
+            words += n
+        if current:
+            chunks.append(" ".join(current))
+    return [f"{title}: {chunk}" for chunk in chunks if chunk]
+
+
+def _document_paths(docs_dir: str) -> list:
+    paths = []
+    for root, _, files in os.walk(docs_dir):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith((".md", ".txt")))
+    return sorted(os.path.relpath(path, docs_dir) for path in paths)
+
+
+# ---------------------------
+# Index
+# ---------------------------
+class FAQIndex:
+    """Memory-mapped chunk embeddings with brute-force or IVF top-k search."""
+
+    def __init__(self, index_dir: str = INDEX_DIR, embedder=None):
+        self.index_dir = index_dir
+        self.embedder = embedder or get_embedder()
+        self.documents = []  # [{"path", "sha", "mtime", "size", "start", "count"}]
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._texts = b""
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._ivf = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def load(self) -> bool:
+        """Map the index files if they exist and match the embedder; returns whether an index was loaded."""
+        try:
+            with open(self._path("manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return False
+        if manifest.get("version") != INDEX_VERSION or manifest.get("embedder") != self.embedder.name:
+            return False
+        documents = manifest["documents"]
+        vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+        offsets = np.load(self._path("offsets.npy"), mmap_mode="r")
+        with open(self._path("texts.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        starts = np.array([doc["start"] for doc in documents], dtype=np.int64)
+        ivf_lists = None
+        if os.path.exists(self._path("ivf.npz")):
+            with np.load(self._path("ivf.npz")) as ivf:
+                ivf_lists = {name: ivf[name] for name in ivf.files}
+        with self._lock:  # Swap everything at once; search() reads it under the same lock.
+            self.documents, self.vectors, self._offsets, self._texts = documents, vectors, offsets, texts
+            self._starts, self._ivf = starts, ivf_lists
+        return True
+
+    def _snapshot(self):
+        """(vectors, offsets, texts, starts, documents, ivf) of one consistent generation of the index."""
+        with self._lock:
+            return self.vectors, self._offsets, self._texts, self._starts, self.documents, self._ivf
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def chunk_text(self, row: int) -> str:
+        return self._texts[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def chunk_document_path(self, row: int) -> str:
+        return self.documents[int(np.searchsorted(self._starts, row, side="right")) - 1]["path"]
+
+    # ----- indexing -----
+    def build(self, docs_dir: str = DOCS_DIR, full: bool = False) -> dict:
+        """
+        (Re)index `docs_dir`. Documents whose size/mtime and then content hash are unchanged keep
+        their existing embeddings; new or edited documents are chunked and embedded.
+        """
+        started = time.perf_counter()
+        previous = {} if full else {doc["path"]: doc for doc in self.documents}
+        documents, vector_parts, texts, stats = [], [], [], {"reused": 0, "embedded": 0, "removed": 0}
+        start = 0
+        for path in _document_paths(docs_dir):
+            full_path = os.path.join(docs_dir, path)
+            stat = os.stat(full_path)
+            old = previous.pop(path, None)
+            if old and old["mtime"] == stat.st_mtime and old["size"] == stat.st_size:
+                sha = old["sha"]
+            else:
+                with open(full_path, encoding="utf-8", errors="replace") as f:
+                    content = f.read()
+                sha = hashlib.sha256(content.encode()).hexdigest()
+            if old and old["sha"] == sha:
+                rows = range(old["start"], old["start"] + old["count"])
+                vector_parts.append(np.asarray(self.vectors[old["start"]:old["start"] + old["count"]]))
+                texts.extend(self.chunk_text(row) for row in rows)
+                count = old["count"]
+                stats["reused"] += 1
+            else:
+                chunks = chunk_document(content)
+                if chunks:
+                    vector_parts.append(_normalize_rows(self.embedder.embed(chunks)))
+                texts.extend(chunks)
+                count = len(chunks)
+                stats["embedded"] += 1
+            documents.append({"path": path, "sha": sha, "mtime": stat.st_mtime, "size": stat.st_size,
+                              "start": start, "count": count})
+            start += count
+        stats["removed"] = len(previous)
+        vectors = np.concatenate(vector_parts) if vector_parts else np.zeros((0, 1), dtype=np.float32)
+        self._write(documents, vectors.astype(np.float32), texts)
+        self.load()
+        stats.update(chunks=len(self), seconds=time.perf_counter() - started)
+        return stats
+
+    def _write(self, documents, vectors, texts):
+        """Write every file under a temporary name and swap them in; the manifest goes last."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        files = {"vectors.npy": lambda f: np.save(f, vectors),
+                 "offsets.npy": lambda f: np.save(f, offsets),
+                 "texts.bin": lambda f: f.write(b"".join(encoded))}
+        if len(vectors) >= IVF_MIN_CHUNKS:
+            centroids, order, bounds = build_ivf(vectors)
+            files["ivf.npz"] = lambda f: np.savez(f, centroids=centroids, order=order, bounds=bounds)
+        elif os.path.exists(self._path("ivf.npz")):
+            os.remove(self._path("ivf.npz"))
+        for name, write in files.items():
+            with open(self._path(name + ".tmp"), "wb") as f:
+                write(f)
+            os.replace(self._path(name + ".tmp"), self._path(name))
+        manifest = {"version": INDEX_VERSION, "embedder": self.embedder.name, "documents": documents}
+        with open(self._path("manifest.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(self._path("manifest.json.tmp"), self._path("manifest.json"))
+
+    def is_stale(self, docs_dir: str = DOCS_DIR) -> bool:
+        """Cheap check (file list, sizes and mtimes only) for whether build() has work to do."""
+        known = {doc["path"]: (doc["mtime"], doc["size"]) for doc in self.documents}
+        paths = _document_paths(docs_dir) if os.path.isdir(docs_dir) else []
+        if set(paths) != set(known):
+            return True
+        for path in paths:
+            stat = os.stat(os.path.join(docs_dir, path))
+            if known[path] != (stat.st_mtime, stat.st_size):
+                return True
+        return False
+
+    # ----- search -----
+    def search(self, query: str, k: int = 3, min_score: float = 0.0, exact: bool = None, nprobe: int = 8) -> list:
+        """
+        Top-k chunks as [{"score", "text", "document", "row"}], best first. Uses the IVF index
+        when one was built (unless exact=True), otherwise scores every chunk.
+        """
+        vectors, offsets, texts, starts, documents, ivf = self._snapshot()
+        if not vectors.shape[0]:
+            return []
+        q = _normalize_rows(self.embedder.embed([query]))[0]
+        if ivf is not None and not exact:
+            nearest = np.argsort(ivf["centroids"] @ q)[::-1][:nprobe]
+            bounds = ivf["bounds"]
+            rows = np.concatenate([ivf["order"][bounds[c]:bounds[c + 1]] for c in nearest])
+            scores = vectors[rows] @ q
+        else:
+            rows, scores = None, vectors @ q
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            if scores[i] < min_score:
+                break
+            row = int(rows[i]) if rows is not None else int(i)
+            document = documents[int(np.searchsorted(starts, row, side="right")) - 1]["path"]
+            results.append({"score": float(scores[i]), "text": texts[offsets[row]:offsets[row + 1]].decode("utf-8"),
+                            "document": document, "row": row})
+        return results
+
+
+def build_ivf(vectors: np.ndarray, n_lists: int = None, iterations: int = 10, seed: int = 0):
+    """Spherical k-means over the rows; returns (centroids, row order grouped by list, list bounds)."""
+    n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), n_lists * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = sample[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize_rows(centroids)
+    assignment = np.concatenate([np.argmax(vectors[i:i + 65536] @ centroids.T, axis=1)
+                                 for i in range(0, len(vectors), 65536)])
+    order = np.argsort(assignment, kind="stable").astype(np.int32)
+    bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1)).astype(np.int64)
+    return centroids.astype(np.float32), order, bounds
+
+
+_default_index = None
+_default_lock = threading.Lock()
+_checked_at = None  # time.monotonic() of the last staleness check.
+
+
+def _check_due() -> bool:
+    if _checked_at is None:
+        return True
+    return STALE_CHECK_S >= 0 and time.monotonic() - _checked_at >= STALE_CHECK_S
+
+
+def get_index() -> FAQIndex:
+    """
+    Shared index at FAQ_INDEX_DIR, incrementally rebuilt from FAQ_DOCS_DIR when the docs changed.
+    The docs are scanned on first use and then at most every STALE_CHECK_S seconds.
+    """
+    global _default_index, _checked_at
+    if _default_index is not None and not _check_due():
+        return _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = FAQIndex(INDEX_DIR)
+        if _check_due():
+            if os.path.isdir(DOCS_DIR) and _default_index.is_stale(DOCS_DIR):
+                _default_index.build(DOCS_DIR)
+            _checked_at = time.monotonic()
+    return _default_index
+
+
+def reindex() -> dict:
+    """Rebuild the shared index from FAQ_DOCS_DIR now (incrementally) instead of waiting for the next check."""
+    global _checked_at
+    index = get_index()
+    with _default_lock:
+        stats = index.build(DOCS_DIR) if os.path.isdir(DOCS_DIR) else {}
+        _checked_at = time.monotonic()
+    return stats
+
+
+def retrieve_context(question: str, k: int = 3, min_score: float = 0.05) -> str:
+    """The most relevant FAQ chunks for a question, one per line, or '' when nothing matches."""
+    return "\n".join(f"- {hit['text']}" for hit in get_index().search(question, k=k, min_score=min_score))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the FAQ retrieval index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--docs", default=DOCS_DIR)
+    build.add_argument("--index", default=INDEX_DIR)
+    build.add_argument("--full", action="store_true", help="Re-embed every document.")
+    search = sub.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("--index", default=INDEX_DIR)
+    search.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    index = FAQIndex(args.index)
+    if args.command == "build":
+        print(index.build(args.docs, full=args.full))
+    else:
+        for hit in index.search(args.query, k=args.k):
+            print(f"{hit['score']:.3f}  {hit['document']}: {hit['text']}")
@@ -0,0 +1,155 @@
+import json
+import os
+import pickle
+import re
+import sys
+
+# ---------------------------
+# Local Fast-Path Router
+# ---------------------------
+# Cheap first tier in front of level2.router. Keyword/regex rules answer the obvious
+# cases, an optional TF-IDF + logistic regression model (scikit-learn) answers when it is
+# confident, and anything else returns None so the caller falls through to the LLM.
+# Routes match level2.Routing: 1 = database (user specific), 2 = FAQ.
+#
+# A number only counts as a customer number after a context word ("customer 2025",
+# "my number is 12345") or when it can't be a year: "Tech Expo 2025" stays a FAQ question.
+
+DB_ROUTE, FAQ_ROUTE = 1, 2
+
+CUSTOMER_NUMBER_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"\b(?:customer|account|member|client|order|booking|invoice|number|no|id)\b[\s.:#]*(?:is\s+)?(\d{4,})\b",
+    r"\b(?!(?:19|20)\d\d\b)(\d{4,})\b",
+)]
+DB_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"\b(customer|account|member|client|order|booking|invoice)\s*(number|no\.?|id|#)",
+    r"\bmy\s+(number|phone\s*number|customer|account|order|booking|invoice|bill|subscription|address|balance|plan|payment)",
+)] + CUSTOMER_NUMBER_PATTERNS
+FAQ_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"\b(policy|policies|opening hours|shipping|delivery times?|warranty|faq|terms|pricing)\b",
+    r"\b(how (do|can|does)|do you (offer|ship)|is there a|what are the)\b",
+)]
+
+# The trained model is a pickle, and unpickling runs code: it is only loaded from an explicit
+# FAST_ROUTER_MODEL path, which must point at a file you trained yourself.
+DEFAULT_MODEL_PATH = os.getenv("FAST_ROUTER_MODEL", "")
+
+
+def customer_number(question: str):
+    """The customer number in the question (int), or None."""
+    for pattern in CUSTOMER_NUMBER_PATTERNS:
+        match = pattern.search(question)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def rule_route(question: str):
+    """Return 1 or 2 when exactly one side's rules match, otherwise None."""
+    db_hit = any(p.search(question) for p in DB_PATTERNS)
+    faq_hit = any(p.search(question) for p in FAQ_PATTERNS)
+    if db_hit and not faq_hit:
+        return DB_ROUTE
+    if faq_hit and not db_hit:
+        return FAQ_ROUTE
+    return None
+
+
+class LocalRouteModel:
+    """TF-IDF + logistic regression classifier, persisted with pickle."""
+
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline
+
+    @classmethod
+    def train(cls, questions, routes):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        pipeline = make_pipeline(
+            TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+            LogisticRegression(max_iter=1000),
+        )
+        pipeline.fit(questions, routes)
+        return cls(pipeline)
+
+    def predict(self, question: str):
+        """Return (route, probability) for the most likely route."""
+        probabilities = self.pipeline.predict_proba([question])[0]
+        best = probabilities.argmax()
+        return int(self.pipeline.classes_[best]), float(probabilities[best])
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            pickle.dump(self.pipeline, f)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH):
+        """
+        Load a saved model, or return None when no path is given, the file is missing or
+        scikit-learn is. Only load files you trust: this unpickles them.
+        """
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return cls(pickle.load(f))
+        except ImportError:
+            return None
+
+
+class FastRouter:
+    """Tiered local router: rules first, then the trained model if it is confident enough."""
+
+    def __init__(self, model: LocalRouteModel = None, threshold: float = 0.85):
+        self.model = model
+        self.threshold = threshold
+        self.counts = {"rules": 0, "model": 0, "fallthrough": 0}
+
+    def route(self, question: str):
+        """Return (route, tier) where tier is 'rules' or 'model', or (None, 'fallthrough')."""
+        route = rule_route(question)
+        if route is not None:
+            self.counts["rules"] += 1
+            return route, "rules"
+        if self.model is not None:
+            route, probability = self.model.predict(question)
+            if probability >= self.threshold:
+                self.counts["model"] += 1
+                return route, "model"
+        self.counts["fallthrough"] += 1
+        return None, "fallthrough"
+
+
+_default_router = None
+
+
+def get_fast_router() -> FastRouter:
+    """Shared router; uses the trained model only when FAST_ROUTER_MODEL names one."""
+    global _default_router
+    if _default_router is None:
+        threshold = float(os.getenv("FAST_ROUTER_THRESHOLD", "0.85"))
+        _default_router = FastRouter(LocalRouteModel.load(DEFAULT_MODEL_PATH), threshold)
+    return _default_router
+
+
+def load_labelled(path):
+    """Read a JSONL file of {"question": ..., "route": 1|2} records ("llm_route" is accepted too)."""
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r["question"] for r in records], [int(r.get("route", r.get("llm_route"))) for r in records]
+
+
+# ---------------------------
+# Training the Local Model
+# ---------------------------
+if __name__ == "__main__":
+    # python fast_router.py labelled_questions.jsonl [model_path]
+    if len(sys.argv) < 2:
+        sys.exit("usage: python fast_router.py labelled_questions.jsonl [model_path]")
+    questions, routes = load_labelled(sys.argv[1])
+    model_path = sys.argv[2] if len(sys.argv) > 2 else (DEFAULT_MODEL_PATH or "router_model.pkl")
+    LocalRouteModel.train(questions, routes).save(model_path)
+    print(f"Trained on {len(questions)} questions, saved to {model_path}; "
+          f"set FAST_ROUTER_MODEL={model_path} to use it")
@@ -0,0 +1,162 @@
+import contextvars
+import dataclasses
+import json
+import os
+from contextlib import contextmanager
+import tracing
+
+# ---------------------------
+# Conversation History Compaction
+# ---------------------------
+# An agent run re-sends its whole message history on every model turn. Tool outputs such as
+# analysis tables, generated emails and generated code dominate that history, so prompt size
+# grows with every step. Inside `with compaction():` every model request of the run is sent
+# a compacted copy of the history. Tool outputs and tool-call arguments larger than
+# HISTORY_MAX_TOOL_CHARS are replaced by a short preview plus a handle (tool name and call
+# id) once the model has already seen them. The agent's own message list is never modified,
+# so the transcript log (transcripts.py) still records the full, uncompacted steps.
+#
+# HISTORY_RUN_TOKEN_BUDGET (0 = off) caps the estimated prompt tokens one run may send.
+# When the next request would go over it, older outputs are cut down to their preview. If
+# the request still doesn't fit, the run stops with TokenBudgetExceeded.
+
+MAX_TOOL_CHARS = int(os.getenv("HISTORY_MAX_TOOL_CHARS", "600"))
+RUN_TOKEN_BUDGET = int(os.getenv("HISTORY_RUN_TOKEN_BUDGET", "0"))
+PREVIEW_CHARS = 160
+
+_current_run = contextvars.ContextVar("run_history", default=None)
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """A model request would take the run past its prompt-token budget."""
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+def estimate_tokens(messages) -> int:
+    """Prompt tokens of a pydantic_ai message history (~4 characters each)."""
+    chars = 0
+    for message in messages:
+        for part in message.parts:
+            if part.part_kind == "tool-call":
+                chars += len(part.tool_name) + len(_text(part.args))
+            else:
+                chars += len(_text(getattr(part, "content", "")))
+    return chars // 4
+
+
+def _preview(text: str, handle: str) -> str:
+    return f"[{handle}, {len(text)} chars, compacted after use] {text[:PREVIEW_CHARS].rstrip()}..."
+
+
+def _shorter(text: str, limit: int, handle: str):
+    """The preview of `text` if it is over `limit` and the preview is actually shorter, else None."""
+    if len(text) <= limit:
+        return None
+    preview = _preview(text, handle)
+    return preview if len(preview) < len(text) else None
+
+
+def _compact_args(args, limit: int, handle: str):
+    """Tool-call arguments with long string values replaced by previews (same type as given)."""
+    parsed = args
+    if isinstance(args, str):
+        try:
+            parsed = json.loads(args)
+        except ValueError:
+            return _shorter(args, limit, handle) or args
+    if not isinstance(parsed, dict):
+        return args
+    compacted = {key: (_shorter(value, limit, f"{handle} {key}") or value) if isinstance(value, str) else value
+                 for key, value in parsed.items()}
+    if compacted == parsed:
+        return args
+    return json.dumps(compacted) if isinstance(args, str) else compacted
+
+
+def compact_messages(messages, limit: int = MAX_TOOL_CHARS):
+    """
+    (compacted copy, number of parts compacted). Only outputs the model has already answered
+    to are touched: tool returns followed by a later model response, and the arguments of
+    tool calls made before the latest response.
+    """
+    last_response = max((i for i, m in enumerate(messages) if m.kind == "response"), default=-1)
+    compacted, count = [], 0
+    for index, message in enumerate(messages):
+        if index >= last_response:
+            compacted.append(message)
+            continue
+        parts = []
+        for part in message.parts:
+            handle = f"{getattr(part, 'tool_name', '')}#{getattr(part, 'tool_call_id', None) or index}"
+            preview = _shorter(_text(part.content), limit, handle) if part.part_kind == "tool-return" else None
+            if preview is not None:
+                part = dataclasses.replace(part, content=preview)
+                count += 1
+            elif part.part_kind == "tool-call":
+                args = _compact_args(part.args, limit, handle)
+                if args is not part.args:
+                    part = dataclasses.replace(part, args=args)
+                    count += 1
+            parts.append(part)
+        compacted.append(dataclasses.replace(message, parts=parts))
+    return compacted, count
+
+
+class RunHistory:
+    """Compaction settings and prompt-token counts of one agent run."""
+
+    def __init__(self, max_tool_chars: int = None, token_budget: int = None):
+        self.max_tool_chars = MAX_TOOL_CHARS if max_tool_chars is None else max_tool_chars
+        self.token_budget = RUN_TOKEN_BUDGET if token_budget is None else token_budget
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.compacted_parts = 0
+
+    def compact(self, messages):
+        """The history to send for the next model request of this run."""
+        before = estimate_tokens(messages)
+        compacted, count = compact_messages(messages, self.max_tool_chars)
+        after = estimate_tokens(compacted)
+        if self.token_budget and self.tokens_after + after > self.token_budget:
+            compacted, count = compact_messages(messages, PREVIEW_CHARS)
+            after = estimate_tokens(compacted)
+            if self.tokens_after + after > self.token_budget:
+                raise TokenBudgetExceeded(
+                    f"Next request needs ~{after} prompt tokens; run has used {self.tokens_after} "
+                    f"of its {self.token_budget}-token budget.")
+        self.requests += 1
+        self.tokens_before += before
+        self.tokens_after += after
+        self.compacted_parts += count
+        tracing.annotate(history_tokens_before=before, history_tokens_after=after)
+        return compacted
+
+    def report(self) -> dict:
+        return {"requests": self.requests, "tokens_before": self.tokens_before, "tokens_after": self.tokens_after,
+                "saved": 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0,
+                "compacted_parts": self.compacted_parts}
+
+    def summary(self) -> str:
+        report = self.report()
+        return (f"Prompt tokens over {report['requests']} model requests: ~{report['tokens_before']} before "
+                f"compaction, ~{report['tokens_after']} after ({report['saved']:.0%} saved)")
+
+
+@contextmanager
+def compaction(max_tool_chars: int = None, token_budget: int = None):
+    """Compact the history of the agent runs inside this block; yields the RunHistory with their token counts."""
+    run = RunHistory(max_tool_chars, token_budget)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def current_run():
+    """The RunHistory of the enclosing compaction() block, or None."""
+    return _current_run.get()
@@ -0,0 +1,404 @@
+import argparse
+import asyncio
+import hashlib
+import importlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+import tracing
+
+# ---------------------------
+# Durable Job Queue for Report Generation
+# ---------------------------
+# Report requests (level4 analyses, level5+ code goals) are rows in a SQLite table
+# (JOB_QUEUE_DB, default jobs.db; WAL mode, no broker). Any number of worker processes,
+# on one machine, claim jobs from it:
+#   - Claims take the highest priority first, then the oldest. A claim holds a lease of
+#     JOB_LEASE_SECONDS, which the worker renews while the job runs.
+#   - A job whose lease runs out (its worker crashed or hung) goes back to pending and is
+#     picked up again. Delivery is at least once, so a job may run more than once.
+#   - A failed job is retried after JOB_RETRY_BACKOFF * 2^(attempt-1) seconds, up to
+#     JOB_MAX_ATTEMPTS attempts, then marked failed with its last error.
+#   - Enqueueing a job identical (same kind and payload) to one that is still pending or
+#     running returns the existing job instead of adding a second one.
+#
+#   python job_queue.py enqueue analysis "Comprehensive sales performance report" --priority 5
+#   python job_queue.py enqueue code "Write Python code that counts the users in example.db"
+#   python job_queue.py work --processes 4 --concurrency 2
+#   python job_queue.py stats
+
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "jobs.db")
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+WORKER_PROCESSES = int(os.getenv("JOB_WORKERS", "0")) or os.cpu_count() or 1
+THROUGHPUT_WINDOW = 300.0  # Seconds of finished jobs that stats() averages throughput over.
+
+# Job kind -> "module:function" (or "file.py:function"), called with the payload as keyword
+# arguments in the worker process. Coroutine functions are awaited.
+JOB_KINDS = {
+    "analysis": "level4:run_data_analysis_agent",  # payload: {"query": ...}
+    "code": "level5+.py:run_fully_autonomous_code_agent",  # payload: {"goal": ...}
+}
+# The payload key the CLI puts its text argument under, per kind.
+_TEXT_ARGUMENT = {"analysis": "query", "code": "goal"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(priority DESC, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(lease_until) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at) WHERE status IN ('done', 'failed');
+"""
+
+_CLAIM = (
+    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ?, started_at = ? "
+    "WHERE id = (SELECT id FROM jobs WHERE status = 'pending' AND available_at <= ? ORDER BY priority DESC, id LIMIT 1) "
+    "RETURNING id, kind, payload, priority, attempts, max_attempts"
+)
+
+
+def dedupe_key(kind: str, payload: dict) -> str:
+    return hashlib.sha256(f"{kind}\x00{json.dumps(payload, sort_keys=True)}".encode()).hexdigest()
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    payload: dict
+    priority: int
+    attempts: int
+    max_attempts: int
+
+
+class JobQueue:
+    """A SQLite-backed job queue; each process opens its own JobQueue on the same file."""
+
+    def __init__(self, path: str = None, lease_seconds: float = None, max_attempts: int = None,
+                 retry_backoff: float = None):
+        self.path = path or JOB_QUEUE_DB
+        self.lease_seconds = LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.max_attempts = max_attempts or MAX_ATTEMPTS
+        self.retry_backoff = RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self._lock = threading.Lock()
+        # Autocommit mode; writes that must be atomic take BEGIN IMMEDIATE (see _transaction).
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction that holds the database write lock from its start, across processes."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # ----- producers -----
+    def enqueue(self, kind: str, payload: dict, priority: int = 0, max_attempts: int = None) -> tuple:
+        """
+        Add a job; returns (job id, True if it was added). An identical job that is still pending
+        or running is returned instead (False), with its priority raised to `priority` if lower.
+        """
+        key = dedupe_key(kind, payload)
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO jobs (kind, payload, dedupe_key, priority, max_attempts, created_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), key, priority, max_attempts or self.max_attempts, now, now))
+            if cursor.rowcount:
+                return cursor.lastrowid, True
+            db.execute("UPDATE jobs SET priority = MAX(priority, ?) WHERE dedupe_key = ? AND status = 'pending'",
+                       (priority, key))
+            row = db.execute("SELECT id FROM jobs WHERE dedupe_key = ? AND status IN ('pending', 'running')",
+                             (key,)).fetchone()
+            return row[0], False
+
+    # ----- workers -----
+    def claim(self, worker: str, kinds=None):
+        """Lease the next ready job to `worker`, or None. Expired leases are released first."""
+        now = time.time()
+        with self._transaction() as db:
+            self._expire_leases(db, now)
+            if kinds is None:
+                row = db.execute(_CLAIM, (now + self.lease_seconds, worker, now, now)).fetchone()
+            else:
+                placeholders = ", ".join("?" * len(kinds))
+                row = db.execute(_CLAIM.replace("available_at <= ?", f"available_at <= ? AND kind IN ({placeholders})"),
+                                 (now + self.lease_seconds, worker, now, now, *kinds)).fetchone()
+        if row is None:
+            return None
+        job_id, kind, payload, priority, attempts, max_attempts = row
+        return Job(job_id, kind, json.loads(payload), priority, attempts, max_attempts)
+
+    @staticmethod
+    def _expire_leases(db, now):
+        db.execute("UPDATE jobs SET status = 'failed', finished_at = ?, lease_until = NULL, "
+                   "error = COALESCE(error || '; ', '') || 'lease expired on the last attempt' "
+                   "WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts", (now, now))
+        db.execute("UPDATE jobs SET status = 'pending', available_at = ?, lease_until = NULL, worker = NULL "
+                   "WHERE status = 'running' AND lease_until < ?", (now, now))
+
+    def heartbeat(self, job: Job, worker: str) -> bool:
+        """Renew the lease; False if the job is no longer this worker's (its lease expired and it was reclaimed)."""
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                (time.time() + self.lease_seconds, job.id, worker))
+            return cursor.rowcount == 1
+
+    def complete(self, job: Job, worker: str, result) -> bool:
+        """Mark the job done; False if this worker had lost its lease (the job is then left to its new owner)."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (None if result is None else str(result), time.time(), job.id, worker))
+            return cursor.rowcount == 1
+
+    def fail(self, job: Job, worker: str, error: str) -> str:
+        """Record a failed attempt; returns the job's new status ('pending' for a retry, 'failed', or 'lost')."""
+        now = time.time()
+        with self._transaction() as db:
+            if job.attempts >= job.max_attempts:
+                cursor = db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL "
+                    "WHERE id = ? AND worker = ? AND status = 'running'", (error, now, job.id, worker))
+                status = "failed"
+            else:
+                retry_at = now + self.retry_backoff * 2 ** (job.attempts - 1)
+                cursor = db.execute(
+                    "UPDATE jobs SET status = 'pending', error = ?, available_at = ?, lease_until = NULL, worker = NULL "
+                    "WHERE id = ? AND worker = ? AND status = 'running'", (error, retry_at, job.id, worker))
+                status = "pending"
+            return status if cursor.rowcount == 1 else "lost"
+
+    # ----- inspection -----
+    def get(self, job_id: int) -> dict:
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([c[0] for c in cursor.description], row))
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def stats(self, window: float = THROUGHPUT_WINDOW) -> dict:
+        """Queue depth per status, ready and delayed jobs, oldest pending age and recent throughput."""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            ready, oldest = self._db.execute(
+                "SELECT COUNT(*) FILTER (WHERE available_at <= ?), MIN(created_at) FROM jobs WHERE status = 'pending'",
+                (now,)).fetchone()
+            done, failed, run_seconds = self._db.execute(
+                "SELECT COUNT(*) FILTER (WHERE status = 'done'), COUNT(*) FILTER (WHERE status = 'failed'), "
+                "AVG(finished_at - started_at) FILTER (WHERE status = 'done') "
+                "FROM jobs WHERE status IN ('done', 'failed') AND finished_at >= ?", (now - window,)).fetchone()
+        pending = counts.get("pending", 0)
+        return {
+            "depth": pending + counts.get("running", 0),
+            "pending": pending, "ready": ready, "delayed": pending - ready,
+            "running": counts.get("running", 0), "done": counts.get("done", 0), "failed": counts.get("failed", 0),
+            "oldest_pending_age_s": round(now - oldest, 3) if oldest is not None else 0.0,
+            "throughput_per_min": round(done / window * 60, 2),
+            "failed_per_min": round(failed / window * 60, 2),
+            "avg_run_s": round(run_seconds, 3) if run_seconds is not None else None,
+            "window_s": window,
+        }
+
+    def purge(self, older_than: float) -> int:
+        """Delete done and failed jobs that finished more than `older_than` seconds ago."""
+        with self._transaction() as db:
+            return db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                              (time.time() - older_than,)).rowcount
+
+
+# ---------------------------
+# Worker Processes
+# ---------------------------
+def resolve_handler(target: str):
+    """The callable behind a "module:function" or "file.py:function" target."""
+    module_name, _, function = target.partition(":")
+    if module_name.endswith(".py"):
+        # level5+.py is not importable by name because of the '+'.
+        spec = importlib.util.spec_from_file_location(os.path.basename(module_name)[:-3].replace("+", "_plus"),
+                                                      module_name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, function)
+
+
+class Worker:
+    """Runs jobs from a JobQueue, `concurrency` at a time, in one process's event loop."""
+
+    def __init__(self, queue: JobQueue, name: str = None, concurrency: int = 1, kinds: dict = None,
+                 poll_interval: float = 0.5, drain: bool = False):
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.kinds = kinds or JOB_KINDS
+        self.poll_interval = poll_interval
+        self.drain = drain  # Exit once no job is pending, instead of waiting for more.
+        self.counters = {"done": 0, "failed": 0, "retried": 0, "lost": 0}
+        self._handlers = {}
+        self._stopping = False
+
+    def stop(self):
+        """Finish the jobs in progress, then return from run()."""
+        self._stopping = True
+
+    def _handler(self, kind):
+        if kind not in self._handlers:
+            self._handlers[kind] = resolve_handler(self.kinds[kind])
+        return self._handlers[kind]
+
+    async def run(self) -> dict:
+        await asyncio.gather(*(self._loop(f"{self.name}/{slot}") for slot in range(self.concurrency)))
+        return self.counters
+
+    # Queue calls run in threads: BEGIN IMMEDIATE may wait up to 30 s for another process's write
+    # lock, and that must not stall the jobs and heartbeats on this event loop.
+    async def _loop(self, worker: str):
+        while not self._stopping:
+            job = await asyncio.to_thread(self.queue.claim, worker, list(self.kinds))
+            if job is None:
+                if self.drain and (await asyncio.to_thread(self.queue.stats))["pending"] == 0:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._process(job, worker)
+
+    async def _run_job(self, job: Job):
+        with tracing.span(f"job:{job.kind}", kind="job", job_id=job.id, attempt=job.attempts):
+            result = self._handler(job.kind)(**job.payload)
+            if asyncio.iscoroutine(result):
+                result = await result
+        return result
+
+    async def _process(self, job: Job, worker: str):
+        run = asyncio.create_task(self._run_job(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, worker, run))
+        try:
+            result = await run
+        except asyncio.CancelledError:
+            if not heartbeat.done() or heartbeat.cancelled():
+                raise  # This worker is being cancelled, not the job.
+            self.counters["lost"] += 1  # The lease went to another worker, which runs the job now.
+        except Exception as e:
+            status = await asyncio.to_thread(self.queue.fail, job, worker, f"{type(e).__name__}: {e}")
+            self.counters[{"pending": "retried", "failed": "failed", "lost": "lost"}[status]] += 1
+        else:
+            completed = await asyncio.to_thread(self.queue.complete, job, worker, result)
+            self.counters["done" if completed else "lost"] += 1
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job: Job, worker: str, run: asyncio.Task):
+        """Renew the lease every third of it; once it is lost, cancel the job and return."""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self.queue.heartbeat, job, worker)
+            except sqlite3.OperationalError:
+                continue  # Database locked for longer than the timeout; the lease may still hold.
+            if not renewed:
+                run.cancel()
+                return
+
+
+def _worker_process(path: str, concurrency: int, kinds: dict, drain: bool):
+    worker = Worker(JobQueue(path), concurrency=concurrency, kinds=kinds, drain=drain)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    counters = asyncio.run(worker.run())
+    print(f"worker {worker.name}: {counters}")
+
+
+def run_workers(processes: int = None, concurrency: int = 1, path: str = None, kinds: dict = None,
+                drain: bool = False):
+    """Start `processes` worker processes (default JOB_WORKERS, else one per core) and wait for them."""
+    context = multiprocessing.get_context("spawn")  # Children open their own database connection.
+    children = [context.Process(target=_worker_process, args=(path or JOB_QUEUE_DB, concurrency, kinds, drain),
+                                name=f"job-worker-{i}")
+                for i in range(processes or WORKER_PROCESSES)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        # Ctrl-C reaches the children too; they finish their current jobs and exit.
+        for child in children:
+            child.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Durable SQLite job queue for the report agents.")
+    parser.add_argument("--db", default=JOB_QUEUE_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="Queue a report job.")
+    enqueue.add_argument("kind", choices=sorted(JOB_KINDS))
+    enqueue.add_argument("text", help="The analysis query or the code goal.")
+    enqueue.add_argument("--priority", type=int, default=0, help="Higher runs first.")
+    work = commands.add_parser("work", help="Run worker processes.")
+    work.add_argument("-p", "--processes", type=int, default=WORKER_PROCESSES)
+    work.add_argument("-c", "--concurrency", type=int, default=1, help="Jobs in flight per process.")
+    work.add_argument("--drain", action="store_true", help="Exit once the queue is empty.")
+    commands.add_parser("stats", help="Queue depth, throughput and oldest job age.")
+    show = commands.add_parser("show", help="Show one job.")
+    show.add_argument("job_id", type=int)
+    purge = commands.add_parser("purge", help="Delete finished jobs.")
+    purge.add_argument("--older-than", type=float, default=7 * 24 * 3600, help="Seconds.")
+    args = parser.parse_args()
+
+    if args.command == "work":
+        run_workers(args.processes, args.concurrency, args.db, drain=args.drain)
+    else:
+        queue = JobQueue(args.db)
+        if args.command == "enqueue":
+            job_id, created = queue.enqueue(args.kind, {_TEXT_ARGUMENT[args.kind]: args.text}, args.priority)
+            print(f"Job {job_id} {'queued' if created else 'already pending (deduplicated)'}")
+        elif args.command == "stats":
+            print(json.dumps(queue.stats(), indent=2))
+        elif args.command == "show":
+            print(json.dumps(queue.get(args.job_id), indent=2, default=str))
+        else:
+            print(f"Deleted {queue.purge(args.older_than)} finished jobs")
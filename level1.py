@@ -1,21 +1,26 @@
-import openai
-import os
-from dotenv import load_dotenv
-
-# Load API key from .env file
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from llm_client import get_client, stream_completion  # Loads .env; the OpenAI SDK itself is imported on first call.
+from response_cache import get_cache
 
 # ---------------------------
 # 1️⃣ Simple Processor - Direct Q&A
 # ---------------------------
 def simple_processor(question):
-    """Takes a user question and returns a direct answer from the LLM."""
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": question}]
-    )
-    return response.choices[0].message.content
+    """Takes a user question and returns a direct answer from the LLM (repeated questions come from the cache)."""
+    def ask_llm():
+        response = get_client().chat.completions.create(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": question}]
+        )
+        return response.choices[0].message.content
+    return get_cache().get_or_call(question, ask_llm, model="gpt-4o", namespace="simple_processor")
+
+
+async def stream_simple_processor(question):
+    """Streaming variant of simple_processor: yields the answer in pieces as the tokens arrive."""
+    def ask_llm():
+        return stream_completion([{"role": "user", "content": question}], model="gpt-4o")
+    async for piece in get_cache().astream_or_call(question, ask_llm, model="gpt-4o", namespace="simple_processor"):
+        yield piece
 
 # ---------------------------
 # Running the Demo Step by Step
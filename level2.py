@@ -1,33 +1,133 @@
-from pydantic import BaseModel
-import openai
+import json
 import os
-from dotenv import load_dotenv
-
-# Load API key from .env file
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from contextlib import aclosing
+from pydantic import BaseModel
+from llm_client import get_client, priority, stream_fields
+from fast_router import customer_number, get_fast_router
 
 class Routing(BaseModel):
     route: int
 
+class RoutingBatch(BaseModel):
+    routes: list[int]
+
+ROUTER_PROMPT = "You are an Intelligent Routing Agent. Choose 1 if we need to extract data for this query from the DB (only when user_specific question), if it's something we can find in the FAQ, return 2"
+
 # ---------------------------
 # 2️⃣ Router - Directing Questions
 # ---------------------------
-def router(question):
-    """Routes the question based on its content (e.g., programming or general knowledge)."""
-    response = openai.beta.chat.completions.parse(
-        model="gpt-4o",
-        messages=[{"role": "system", "content": "You are an Intelligent Routing Agent. Choose 1 if we need to extract data for this query from the DB (only when user_specific question), if it's something we can find in the FAQ, return 2"},
-                  {"role": "user", "content": question}],
-        response_format=Routing
-    )
-    response = response.choices[0].message.parsed.route
+def llm_router(question):
+    """Asks the LLM for the route (1 = database, 2 = FAQ)."""
+    with priority("interactive"):  # A user is waiting; go ahead of batch work in the rate limiter.
+        response = get_client().beta.chat.completions.parse(
+            model="gpt-4o",
+            messages=[{"role": "system", "content": ROUTER_PROMPT},
+                      {"role": "user", "content": question}],
+            response_format=Routing
+        )
+    return response.choices[0].message.parsed.route
+
+
+async def llm_router_stream(question):
+    """Streaming llm_router: returns as soon as the `route` field of the answer is complete."""
+    messages = [{"role": "system", "content": ROUTER_PROMPT}, {"role": "user", "content": question}]
+    with priority("interactive"):
+        async with aclosing(stream_fields(messages, Routing, model="gpt-4o")) as fields:
+            async for name, value in fields:
+                if name == "route":
+                    return Routing(route=value).route
+    raise ValueError("The routing answer had no 'route' field")
+
+
+def llm_router_batch(questions):
+    """Routes several questions with one LLM call; returns one route per question, in order."""
+    if len(questions) == 1:
+        return [llm_router(questions[0])]
+    with priority("interactive"):
+        response = get_client().beta.chat.completions.parse(
+            model="gpt-4o",
+            messages=[{"role": "system", "content": ROUTER_PROMPT + ". You get a JSON list of questions; "
+                                                    "answer with one route per question, in the same order."},
+                      {"role": "user", "content": json.dumps(questions)}],
+            response_format=RoutingBatch
+        )
+    routes = response.choices[0].message.parsed.routes
+    if len(routes) != len(questions):  # Miscounted answer: route each question on its own.
+        return [llm_router(question) for question in questions]
+    return routes
+
+
+def route_many(questions, use_fast_path=True):
+    """Like router() for a list of questions (without printing); the LLM sees only the undecided ones, in one call."""
+    routes = [None] * len(questions)
+    if use_fast_path:
+        fast_router = get_fast_router()
+        routes = [fast_router.route(question)[0] for question in questions]
+    pending = [i for i, route in enumerate(routes) if route is None]
+    if pending:
+        for i, route in zip(pending, llm_router_batch([questions[i] for i in pending])):
+            routes[i] = route
+    return routes
+
+
+def router(question, use_fast_path=True):
+    """Routes the question based on its content; obvious cases are decided locally without calling the LLM."""
+    response = None
+    if use_fast_path:
+        response, _ = get_fast_router().route(question)
+    if response is None:
+        response = llm_router(question)
     if response == 1:
         print("This data is retrieved from the database")
     else:
         print("This data is retrieved from the FAQ")
     return response
 
+# ---------------------------
+# Speculative Routing
+# ---------------------------
+# The branches a route leads to are cheap next to the routing call: the customer record
+# prefetch (route 1) and FAQ retrieval (route 2). With speculation on (LEVEL2_SPECULATIVE=1 or
+# speculative=True), both start while the LLM decides. The losing branch is cancelled, and
+# speculation switches itself off while it wastes more than its budget (see speculation.py).
+SPECULATIVE_ROUTING = os.getenv("LEVEL2_SPECULATIVE", "0") == "1"
+
+
+def prefetch_customer(question):
+    """Every record of the customer whose number appears in the question, or None without a number."""
+    number = customer_number(question)
+    if number is None:
+        return None
+    from customer_store import get_store
+    return get_store().lookup_all(number)
+
+
+def retrieve_faq(question):
+    from faq_index import retrieve_context  # Deferred: pulls in NumPy and maps the index.
+    return retrieve_context(question)
+
+
+_speculator = None
+
+
+def get_speculator():
+    global _speculator
+    if _speculator is None:
+        from speculation import Speculator
+        _speculator = Speculator({1: prefetch_customer, 2: retrieve_faq})
+    return _speculator
+
+
+def route_with_context(question, use_fast_path=True, speculative=None):
+    """(route, context): the route and its branch's result (customer records or FAQ context)."""
+    speculative = SPECULATIVE_ROUTING if speculative is None else speculative
+    if use_fast_path:
+        route, _ = get_fast_router().route(question)
+        if route is not None:  # Decided locally in microseconds; nothing to overlap.
+            branch = get_speculator().branches.get(route)
+            return route, branch(question) if branch else None
+    return get_speculator().run(question, llm_router, speculate=speculative)
+
 # ---------------------------
 # Running the Demo Step by Step
 # ---------------------------
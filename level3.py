@@ -1,12 +1,12 @@
-from pydantic import BaseModel, Field
-import openai
+from pydantic import BaseModel, Field, ValidationError
 import os
-from dotenv import load_dotenv
 import json
-
-# Load API key from .env file
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from llm_client import get_client
+import tracing
+from customer_store import QUERY_TYPES, get_store, normalize_query_type
+from tool_registry import Tool, ToolRegistry
    
 # ---------------------------
 # Step 3: Tool Calling
@@ -29,78 +29,158 @@ class FAQQuery(BaseModel):
                           description="The full question asked by the customer.")
 
 
-# Define available tools (function calling setup)
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "query_database",
-            "description": "Fetch customer-specific information from the database.",
-            "parameters": {
-                **DatabaseQuery.model_json_schema(),
-                "additionalProperties": False
-            },
-            "strict": True
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "query_faq",
-            "description": "Retrieve predefined answers from the FAQ system.",
-            "parameters": {
-                **FAQQuery.model_json_schema(),
-                "additionalProperties": False
-            },
-            "strict": True
-        }
-    }
-]
+# Available tools (function calling setup): schemas and validators are built once in the
+# registry; each request is sent only the tools the keyword prefilter picks for the question.
+# LEVEL3_TOOL_PREFILTER=0 sends every tool; LEVEL3_MAX_TOOLS caps how many are sent (0 = no cap).
+TOOL_PREFILTER = os.getenv("LEVEL3_TOOL_PREFILTER", "1") != "0"
+MAX_TOOLS = int(os.getenv("LEVEL3_MAX_TOOLS", "0"))
+registry = ToolRegistry()
 
 
-def tool_calling(question: str) -> str:
-    """Makes a single API call that selects the correct function and extracts arguments in one go."""
+def tools_for(question: str) -> list:
+    """The `tools` list to send with `question`."""
+    return registry.schemas(registry.select(question, MAX_TOOLS) if TOOL_PREFILTER else None)
 
-    response = openai.chat.completions.create(
+
+def tool_calling(question: str) -> str:
+    """Lets the model pick tools, runs every requested call concurrently and feeds the results back for the answer."""
+    messages = [{"role": "user", "content": question}]
+    tools = tools_for(question)
+    response = get_client().chat.completions.create(
         model="gpt-4o",
-        messages=[{"role": "user", "content": question}],
+        messages=messages,
         tools=tools,  # LLM decides which tool to use
         tool_choice="auto"  # Let the model decide which function to call
     )
-    tool_calls = response.choices[0].message.tool_calls
-    for call in tool_calls:
-        function_name = call.function.name
-        arguments = json.loads(call.function.arguments)
+    message = response.choices[0].message
+    tool_calls = message.tool_calls or []
+    if not tool_calls:
+        return message.content or "No appropriate function was called."
+
+    prefetch_customer_records(tool_calls)
+    results = run_tool_calls(tool_calls)
+
+    # Second turn: the model answers the question from all tool results at once.
+    messages.append({
+        "role": "assistant",
+        "content": message.content,
+        "tool_calls": [{"id": call.id, "type": "function",
+                        "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                       for call in tool_calls],
+    })
+    messages.extend({"role": "tool", "tool_call_id": call.id, "content": result}
+                    for call, result in zip(tool_calls, results))
+    response = get_client().chat.completions.create(
+        model="gpt-4o",
+        messages=messages,
+        tools=tools,
+        tool_choice="none"  # Answer now; no further tool rounds
+    )
+    return response.choices[0].message.content
 
-        if function_name == "query_database":
-            print(f"Using {function_name}")
-            return handle_database_query(DatabaseQuery(**arguments))
-        elif function_name == "query_faq":
-            print(f"Using {function_name}")
-            return handle_faq_query(FAQQuery(**arguments))
 
-    return "No appropriate function was called."
+# ---------------------------
+# Concurrent Tool Dispatch
+# ---------------------------
+# Handlers block on I/O (database, FAQ), so all calls of one model response run on a shared
+# thread pool (in the caller's tracing context) and the turn takes as long as the slowest call rather than the sum of them.
+# Calls still running at TOOL_TIMEOUT, or calls that raise, produce an error result for the model.
+TOOL_TIMEOUT = float(os.getenv("LEVEL3_TOOL_TIMEOUT", "10"))
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LEVEL3_TOOL_WORKERS", "8")), thread_name_prefix="level3-tool")
+
+
+def dispatch_tool_call(function_name: str, arguments: str) -> str:
+    """registry.dispatch() (validation and the handler) inside a tool_call span."""
+    with tracing.span(function_name, kind="tool_call"):
+        print(f"Using {function_name}")
+        return registry.dispatch(function_name, arguments)
+
+
+def run_tool_calls(tool_calls, timeout: float = None) -> list:
+    """Run all tool calls concurrently; results come back in call order, one string per call."""
+    timeout = TOOL_TIMEOUT if timeout is None else timeout
+    futures = [_executor.submit(contextvars.copy_context().run, dispatch_tool_call,
+                                call.function.name, call.function.arguments)
+               for call in tool_calls]
+    wait(futures, timeout=timeout)  # One deadline for the whole batch.
+    results = []
+    for call, future in zip(tool_calls, futures):
+        if not future.done():
+            future.cancel()  # Only helps if it never started; a running handler is left to finish.
+            results.append(f"Error: {call.function.name} timed out after {timeout:g}s.")
+        elif future.exception() is not None:
+            results.append(f"Error: {call.function.name} failed: {future.exception()}")
+        else:
+            results.append(str(future.result()))
+    return results
+
+
+def prefetch_customer_records(tool_calls):
+    """
+    Fetch the records of every query_database call in one batched lookup, so the handlers hit the
+    cache. Best effort: calls whose arguments don't validate are skipped here and reported by
+    dispatch_tool_call like any other bad call.
+    """
+    keys = []
+    tool = registry.get("query_database")
+    for call in tool_calls:
+        if call.function.name != "query_database":
+            continue
+        try:
+            query = tool.validate(call.function.arguments)
+        except ValidationError:
+            continue
+        query_type = normalize_query_type(query.query_type)
+        types = [query_type] if query_type else QUERY_TYPES
+        keys.extend((query.customer_id, t) for t in types)
+    if len(keys) > 1:
+        get_store().lookup_many(keys)
 
 
 def handle_database_query(*args):
-    if args:
-        query = args[0]  # Extract first argument
-        print(f"Customer ID: {query.customer_id}")
-        print(f"Query Type: {query.query_type}")
-        print(f"Details: {query.details}")
-    else:
+    if not args:
         print("No arguments received.")
-    return "This answer came from the database."
+        return "No customer query received."
+    query = args[0]  # Extract first argument
+    print(f"Customer ID: {query.customer_id}")
+    print(f"Query Type: {query.query_type}")
+    print(f"Details: {query.details}")
+    query_type = normalize_query_type(query.query_type)
+    if query_type:
+        records = {query_type: get_store().lookup(query.customer_id, query_type)}
+    else:
+        records = get_store().lookup_all(query.customer_id)  # Unknown type: return everything we have.
+    records = {t: data for t, data in records.items() if data is not None}
+    if not records:
+        return f"No {query_type or 'customer'} data found for customer {query.customer_id}."
+    return f"Customer {query.customer_id} data: {json.dumps(records)}"
 
 
 def handle_faq_query(*args):
-    if args:
-        query = args[0]  # Extract first argument
-        print(f"Topic: {query.topic}")
-        print(f"Question: {query.question}")
-    else:
+    if not args:
         print("No arguments received.")
-    return "This answer came from the FAQ."
+        return "No FAQ question received."
+    query = args[0]  # Extract first argument
+    print(f"Topic: {query.topic}")
+    print(f"Question: {query.question}")
+    from faq_index import retrieve_context  # Deferred: pulls in NumPy and maps the index.
+    context = retrieve_context(f"{query.topic} {query.question}")
+    if not context:
+        return "No FAQ entry covers this question."
+    return f"Relevant FAQ entries:\n{context}"
+
+
+registry.register(Tool(
+    "query_database", "Fetch customer-specific information from the database.", DatabaseQuery, handle_database_query,
+    keywords=frozenset({"customer", "account", "booking", "order", "status", "invoice", "payment", "plan",
+                        "renewal", "number", "id", *QUERY_TYPES}),
+))
+registry.register(Tool(
+    "query_faq", "Retrieve predefined answers from the FAQ system.", FAQQuery, handle_faq_query,
+    keywords=frozenset({"faq", "policy", "policies", "return", "returns", "refund", "exchange", "shipping",
+                        "delivery", "warranty", "hours", "store", "event", "expo", "ticket", "how"}),
+))
+tools = registry.schemas()  # The full catalog, as a plain `tools` list.
 
 # ---------------------------
 # Running the Demo Step by Step
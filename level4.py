@@ -1,134 +1,85 @@
-import openai
 import os
-from dotenv import load_dotenv
-from pydantic_ai import Agent, capture_run_messages
 import asyncio
-import nest_asyncio
-import csv
-import io
-nest_asyncio.apply()  # Allow nested event loops
-# Load API key from .env file
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+import llm_client
+import tracing
+from history import compaction
+from transcripts import transcript
+
+SALES_CSV = os.getenv("SALES_CSV", "sales.csv")
+
+DEMO_MONTHLY_DATA = (
+    "month,sales\n"
+    "January,5000\n"
+    "February,5200\n"
+    "March,4800\n"
+    "April,5100\n"
+    "May,5300\n"
+    "June,5000\n"
+    "July,5500\n"
+    "August,5400\n"
+    "September,5200\n"
+    "October,5300\n"
+    "November,5600\n"
+    "December,5800"
+)
+DEMO_QUARTERLY_DATA = (
+    "quarter,sales\n"
+    "Q1,12000\n"
+    "Q2,15000\n"
+    "Q3,17000\n"
+    "Q4,20000"
+)
 
 # ---------------------------
 # 4️⃣ Multi-Step AI Agent - Following a Workflow
 # ---------------------------
-agent = Agent(
-    'openai:gpt-4o',
-    deps_type=str,
-    result_type=str,
-    system_prompt=(
-        "You are a data analysis AI agent. Your task is to produce a comprehensive report "
-        "on quarterly sales performance. The available tools are:\n"
-        "  - load_data: Loads the raw sales data (provided as a CSV string).\n"
-        "  - clean_data: Cleans and formats the data for analysis.\n"
-        "  - analyze_data: Computes key metrics (e.g., total and average sales).\n"
-        "  - finalize_report: Generates a final report with insights.\n\n"
-        "Based on the customer's query, decide dynamically which steps to perform and in what order. "
-        "You might not need every tool for every query. Your final output should be a detailed, actionable report."
-    ),
-)
+# The agent, pydantic_ai and the NumPy analytics engine are only loaded when first used,
+# so importing this module (CLI start-up, worker processes) stays cheap.
 
-
-@agent.tool
+@tracing.traced_tool
 async def load_data(ctx, query: str) -> str:
     """
-    Load raw sales data based on the query.
-    If the query mentions 'monthly', return monthly sales data.
-    If the query mentions 'quarterly', return quarterly sales data.
-    Otherwise, default to quarterly data.
+    Register the sales dataset for the query and return its handle and columns.
+    Uses the transactional sales file (date, product, quantity, price) when it exists.
+    Otherwise falls back to demo figures: monthly data if the query mentions 'monthly', else quarterly data.
     """
-    query_lower = query.lower()
-    if "monthly" in query_lower:
-        raw_data = (
-            "month,sales\n"
-            "January,5000\n"
-            "February,5200\n"
-            "March,4800\n"
-            "April,5100\n"
-            "May,5300\n"
-            "June,5000\n"
-            "July,5500\n"
-            "August,5400\n"
-            "September,5200\n"
-            "October,5300\n"
-            "November,5600\n"
-            "December,5800"
-        )
-    elif "quarterly" in query_lower:
-        raw_data = (
-            "quarter,sales\n"
-            "Q1,12000\n"
-            "Q2,15000\n"
-            "Q3,17000\n"
-            "Q4,20000"
-        )
+    import analytics
+    if os.path.exists(SALES_CSV):
+        dataset = analytics.register_csv(SALES_CSV)
+    elif "monthly" in query.lower():
+        dataset = analytics.register_text("demo monthly sales", DEMO_MONTHLY_DATA)
     else:
-        raw_data = (
-            "quarter,sales\n"
-            "Q1,12000\n"
-            "Q2,15000\n"
-            "Q3,17000\n"
-            "Q4,20000"
-        )
-    return f"Loaded Data:\n{raw_data}"
+        dataset = analytics.register_text("demo quarterly sales", DEMO_QUARTERLY_DATA)
+    return f"Loaded Data:\n{dataset.summary()}"
 
 
-@agent.tool
-async def clean_data(ctx, data: str) -> str:
+@tracing.traced_tool
+async def clean_data(ctx, dataset_handle: str) -> str:
     """
-    Clean the CSV data by parsing it and reformatting into a concise string.
-    This works for both monthly and quarterly data.
+    Clean the dataset with the given handle: malformed rows (missing or non-numeric values) are dropped.
+    Returns the handle with the row counts; the data itself stays in the analytics engine.
     """
-    # Remove the "Loaded Data:" header if present.
-    if data.startswith("Loaded Data:\n"):
-        csv_data = data.split("Loaded Data:\n", 1)[1]
-    else:
-        csv_data = data
-
-    f = io.StringIO(csv_data)
-    reader = csv.DictReader(f)
-    headers = reader.fieldnames
-    cleaned_lines = []
-    if headers and len(headers) >= 2:
-        key_field, value_field = headers[0], headers[1]
-        for row in reader:
-            cleaned_lines.append(f"{row[key_field]}: {row[value_field]}")
-    else:
-        cleaned_lines.append("No data found")
-    cleaned = ", ".join(cleaned_lines)
-    return f"Cleaned Data:\n{cleaned}"
+    import analytics
+    dataset = analytics.clean(analytics.get_dataset(dataset_handle))
+    return f"Cleaned Data:\n{dataset.summary()}"
 
 
-@agent.tool
-async def analyze_data(ctx, data: str) -> str:
+@tracing.traced_tool
+async def analyze_data(ctx, dataset_handle: str, group_by: str = "") -> str:
     """
-    Analyze the cleaned data by computing total and average sales.
+    Analyze the dataset with the given handle: total and average sales (revenue = quantity * price).
+    Optionally break the totals down with group_by = 'product', 'month' or 'quarter'
+    (or any column name of the dataset).
     """
-    # Remove the "Cleaned Data:" prefix if present.
-    if data.startswith("Cleaned Data:\n"):
-        cleaned = data.split("Cleaned Data:\n", 1)[1]
-    else:
-        cleaned = data
-
-    parts = cleaned.split(", ")
-    total_sales = 0
-    count = 0
-    for part in parts:
-        try:
-            # Expecting each part to be in the format "Key: Value"
-            _, sales_str = part.split(": ")
-            total_sales += int(sales_str)
-            count += 1
-        except Exception:
-            continue
-    average_sales = total_sales / count if count > 0 else 0
-    analysis = f"Total Sales = ${total_sales}, Average Sales = ${average_sales}"
-    return f"Analysis Results:\n{analysis}"
-
-
-@agent.tool
+    import analytics
+    try:
+        result = analytics.aggregate(analytics.get_dataset(dataset_handle), group_by or None)
+    except (KeyError, ValueError) as e:
+        return f"Analysis failed: {e}"
+    return f"Analysis Results:\n{analytics.format_aggregate(result, group_by or None)}"
+
+
+@tracing.traced_tool
 async def finalize_report(ctx, analysis: str) -> str:
     """
     Generate the final report from the analysis.
@@ -142,29 +93,69 @@ async def finalize_report(ctx, analysis: str) -> str:
     return report
 
 
+_agent = None
+
+
+def get_agent():
+    """Build the agent (and import pydantic_ai) on first use instead of at import time."""
+    global _agent
+    if _agent is None:
+        from pydantic_ai import Agent
+        agent = Agent(
+            llm_client.agent_model('gpt-4o'),  # Shared pool + tracing for the agent's own model requests.
+            deps_type=str,
+            result_type=str,
+            system_prompt=(
+                "You are a data analysis AI agent. Your task is to produce a comprehensive report "
+                "on quarterly sales performance. The available tools are:\n"
+                "  - load_data: Loads the raw sales data and returns a dataset handle (e.g. 'ds-1') with its columns.\n"
+                "  - clean_data: Cleans the dataset behind a handle and reports how many rows are usable.\n"
+                "  - analyze_data: Computes key metrics (e.g., total and average sales) for a handle, "
+                "optionally grouped by 'product', 'month' or 'quarter'.\n"
+                "  - finalize_report: Generates a final report with insights.\n\n"
+                "Based on the customer's query, decide dynamically which steps to perform and in what order. "
+                "You might not need every tool for every query. Your final output should be a detailed, actionable report."
+            ),
+        )
+        for tool in (load_data, clean_data, analyze_data, finalize_report):
+            agent.tool(tool)
+        _agent = agent
+    return _agent
+
+
+def __getattr__(name):
+    # Keeps `level.agent` / `from level import agent` working without building it at import.
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 async def run_data_analysis_agent(query):
-    # Capture all internal messages (chain-of-thought) during the run.
-    with capture_run_messages() as messages:
-        final_response = await agent.run(query, deps="Customer Query")
+    # Each step is streamed to the transcript log as it happens (transcripts.py) instead of
+    # being kept in memory and printed; replay it with `python transcripts.py show <run id>`.
+    with transcript("run_data_analysis_agent", query=query) as run, \
+            tracing.span("run_data_analysis_agent", kind="agent_run"):
+        with llm_client.priority("batch"), compaction() as history:  # Reports yield to interactive calls.
+            final_response = await get_agent().run(query, deps="Customer Query")
 
     # Print the final report.
     print("Final Report Output:")
     print(final_response.data)
-    print("\n--- Steps Taken ---\n")
-
-    # Nicely print out each captured step.
-    for idx, msg in enumerate(messages, start=1):
-        print(f"Step {idx} [{msg.kind}]:")
-        for part in msg.parts:
-            if part.part_kind in ("system-prompt", "user-prompt", "text"):
-                print(f"  {part.part_kind.capitalize()}: {part.content}")
-            elif part.part_kind == "tool-call":
-                print(f"  Tool Call: {part.tool_name} with args: {part.args}")
-            elif part.part_kind == "tool-return":
-                print(f"  Tool Return ({part.tool_name}): {part.content}")
-        print("-" * 50)
-
-    print("\n--- End of Steps ---")
+    print(history.summary())
+    print(run.summary())
+    return final_response.data
+
+
+async def stream_data_analysis_agent(query):
+    """
+    Streaming variant of run_data_analysis_agent: tool steps run as usual, then the final
+    report is yielded in pieces as the model generates it.
+    """
+    with transcript("stream_data_analysis_agent", query=query), \
+            tracing.span("stream_data_analysis_agent", kind="agent_run"), llm_client.priority("batch"), compaction():
+        async with get_agent().run_stream(query, deps="Customer Query") as result:
+            async for piece in result.stream_text(delta=True):
+                yield piece
 
 
 # ---------------------------
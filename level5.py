@@ -1,39 +1,31 @@
 import asyncio
-import openai
-from pydantic_ai import Agent, capture_run_messages
 import os
-from dotenv import load_dotenv
-
-# Load API key from .env file
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-agent = Agent(
-    'openai:gpt-4o',
-    deps_type=dict,  # For structured data when needed.
-    result_type=str,
-    system_prompt=(
-        "You are a fully autonomous event processing agent. When given an incoming email message related to an event, "
-        "you must decide whether the message is a signup request or a generic FAQ query. If it's a signup, "
-        "extract the applicant’s details (such as name, email, company, company description, and event name if provided), "
-        "then use your own reasoning to classify the signup as 'VIP Attendee', 'Standard Attendee', or 'Rejected', "
-        "and generate a personalized email that explains your decision (with specific reasons). Finally, simulate sending that email. "
-        "If the email is a FAQ query, answer the question concisely. "
-        "Do not rely on any hardcoded sequence in your code; instead, plan and execute the necessary steps autonomously. "
-        "Your final output should be either a confirmation that the signup email has been sent or the FAQ answer."
-    ),
-)
+import llm_client
+import tracing
+import hashlib
+import json
+import re
+from string import Template
+from typing import Literal, Optional
+from pydantic import BaseModel
+from response_cache import get_cache
+from history import compaction
+from transcripts import transcript
+from mailer import build_message, get_outbox
+
+# Fused mode classifies the email and decides attendance in one structured-output call.
+FUSED_CLASSIFICATION = os.getenv("LEVEL5_FUSED_CLASSIFICATION", "1") != "0"
+# Templated mode renders and sends the decision email inside classify_and_decide, so a signup
+# needs no generate_email/send_email model turns.
+TEMPLATED_EMAIL = os.getenv("LEVEL5_TEMPLATED_EMAIL", "1") != "0"
+
 
 # Helper function for a lightweight LLM call that bypasses agent.run's full chain-of-thought.
 async def simple_llm_call(prompt: str, model: str = "gpt-4o", temperature: float = 0.7) -> str:
-    response = openai.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-    )
-    return response.choices[0].message.content.strip()
+    # Awaits the shared async client so concurrent agent runs don't block the event loop.
+    return await llm_client.simple_llm_call(prompt, model=model, temperature=temperature)
 
-@agent.tool
+@tracing.traced_tool
 async def classify_message(ctx, message: str) -> str:
     """
     Analyze the incoming email message and determine whether it is a signup request or a FAQ query.
@@ -53,7 +45,7 @@ async def classify_message(ctx, message: str) -> str:
     classification_response = await simple_llm_call(prompt)
     return classification_response
 
-@agent.tool
+@tracing.traced_tool
 async def decide_attendance(ctx, signup_details: str) -> str:
     """
     Analyze the signup details and, using your own reasoning, classify the signup as
@@ -68,63 +60,238 @@ async def decide_attendance(ctx, signup_details: str) -> str:
     decision_response = await simple_llm_call(prompt)
     return decision_response
 
-@agent.tool
-async def generate_email(ctx, decision: str) -> str:
+class SignupDetails(BaseModel):
+    customer_name: str
+    customer_email: str
+    company: str
+    company_description: str
+    event: str
+
+
+class MessageAssessment(BaseModel):
+    """Classification of an incoming email plus, for signups, the attendance decision."""
+    type: Literal["signup", "faq"]
+    details: Optional[SignupDetails]
+    question: Optional[str]
+    decision: Optional[Literal["VIP Attendee", "Standard Attendee", "Rejected"]]
+    explanation: Optional[str]
+
+
+async def fused_classify_and_decide(message: str) -> MessageAssessment:
+    """One structured-output call that replaces classify_message + decide_attendance."""
+    prompt = (
+        "You are an event message classifier. Analyze the following email and determine whether it is a signup request "
+        "or a FAQ query. If it is a signup, extract the applicant's name, email, company, company description, and event name "
+        "(use an empty string when missing), then, using your own reasoning, classify the signup as 'VIP Attendee', "
+        "'Standard Attendee', or 'Rejected' with a brief explanation. If it is a FAQ query, extract the question and leave "
+        "details, decision and explanation null.\n\n"
+        "Email Message:\n" + message
+    )
+    response = await llm_client.parse_completion(
+        [{"role": "user", "content": prompt}], MessageAssessment, model="gpt-4o", temperature=0.7
+    )
+    assessment = response.choices[0].message.parsed
+    if assessment is None:
+        raise ValueError("Model refused or returned no structured output.")
+    return assessment
+
+
+@tracing.traced_tool
+async def classify_and_decide(ctx, message: str) -> str:
     """
-    Generate a personalized email based on the signup decision.
+    Classify the incoming email as a signup or a FAQ query and, for signups, decide
+    'VIP Attendee', 'Standard Attendee' or 'Rejected' in the same step.
+    Return the result as a JSON string; signups include a 'decision' line in the format <Classification>: <Explanation>
+    and, once the decision email has been sent, an 'Email sent to ...' line.
     """
-    if "VIP Attendee" in decision:
-        email_content = (
-            "Dear valued attendee,\n\n"
-            "Congratulations! Based on your impressive company profile and innovative business, "
-            "you have been selected as a VIP attendee for our upcoming event. We look forward to welcoming you.\n\n"
+    result = None
+    if FUSED_CLASSIFICATION:
+        try:
+            assessment = await fused_classify_and_decide(message)
+            if assessment.type == "signup" and assessment.decision is None:
+                raise ValueError("signup assessed without a decision")
+        except Exception as e:
+            print(f"Fused classification failed ({type(e).__name__}: {e}); falling back to separate calls.")
+        else:
+            result = assessment.model_dump_json()
+            if assessment.type != "signup":
+                return result
+            result += f"\nDecision: {assessment.decision}: {assessment.explanation}"
+            details = assessment.details.model_dump() if assessment.details else {}
+            decision, explanation = assessment.decision, assessment.explanation
+    if result is None:
+        # Fallback: the original two-call path.
+        classification = await classify_message(ctx, message)
+        try:
+            is_signup = json.loads(classification).get("type") == "signup"
+        except (json.JSONDecodeError, AttributeError):
+            is_signup = "signup" in classification.lower()
+        if not is_signup:
+            return classification
+        decision, explanation = await decide_attendance(ctx, classification), ""
+        result = f"{classification}\nDecision: {decision}"
+        try:
+            details = json.loads(classification).get("details") or {}
+        except (json.JSONDecodeError, AttributeError):
+            details = {}
+    # Sent once, for the chosen assessment only: a failure here never re-runs the classification.
+    if TEMPLATED_EMAIL:
+        try:
+            result += "\n" + await send_decision_email(details, decision, explanation)
+        except ValueError as e:
+            result += f"\nNo email sent: {e}"
+    return result
+
+# ---------------------------
+# Decision Emails (templates, no LLM)
+# ---------------------------
+# (subject, body) per decision, compiled once. Placeholders: $name, $company, $event and
+# $reason, which carries its own leading space and is empty when there is no explanation.
+EMAIL_TEMPLATES = {
+    "VIP Attendee": (
+        Template("You're a VIP attendee at $event"),
+        Template(
+            "Dear $name,\n\n"
+            "Congratulations! Based on the impressive profile of $company and its innovative business, "
+            "you have been selected as a VIP attendee for $event.${reason}\n\n"
+            "We look forward to welcoming you.\n\n"
             "Best regards,\nEvent Team"
-        )
-    elif "Rejected" in decision:
-        email_content = (
-            "Dear applicant,\n\n"
-            "Thank you for your interest in our event. Unfortunately, after reviewing your signup details, "
-            "we are unable to offer you a spot at this time. Please consider providing additional business details in the future.\n\n"
+        ),
+    ),
+    "Standard Attendee": (
+        Template("Your signup for $event is confirmed"),
+        Template(
+            "Dear $name,\n\n"
+            "Thank you for signing up for $event. We are pleased to confirm your attendance and look forward "
+            "to seeing you there.\n\n"
             "Best regards,\nEvent Team"
-        )
-    else:
-        email_content = (
-            "Dear attendee,\n\n"
-            "Thank you for signing up for our event. We are pleased to confirm your attendance and look forward to seeing you there.\n\n"
+        ),
+    ),
+    "Rejected": (
+        Template("Your signup for $event"),
+        Template(
+            "Dear $name,\n\n"
+            "Thank you for your interest in $event. Unfortunately, after reviewing your signup details, "
+            "we are unable to offer you a spot at this time.${reason} "
+            "Please consider providing additional business details in the future.\n\n"
             "Best regards,\nEvent Team"
-        )
-    return f"Generated Email:\n{email_content}"
+        ),
+    ),
+}
+_DECISION = re.compile(r"VIP Attendee|Standard Attendee|Rejected")
 
-@agent.tool
+
+def render_email(decision: str, details: dict = None, explanation: str = "") -> tuple:
+    """
+    (subject, body) for a decision ('VIP Attendee: <reason>' works too), personalized from the
+    signup details. Raises ValueError when the decision names no known outcome.
+    """
+    match = _DECISION.search(decision or "")
+    if match is None:
+        raise ValueError(f"no attendance decision in {decision!r}")
+    details = details or {}
+    reason = (explanation or decision[match.end():].lstrip(" :")).strip()
+    values = {
+        "name": details.get("customer_name") or "attendee",
+        "company": details.get("company") or "your company",
+        "event": details.get("event") or "our upcoming event",
+        "reason": f" {reason}" if reason else "",
+    }
+    subject, body = EMAIL_TEMPLATES[match.group(0)]
+    return subject.safe_substitute(values), body.safe_substitute(values)
+
+
+async def send_decision_email(details: dict, decision: str, explanation: str = "") -> str:
+    """Render the decision email for one signup and send it through the shared outbox; returns a status line."""
+    to = (details or {}).get("customer_email")
+    if not to:
+        return "No email sent: the signup has no email address."
+    subject, body = render_email(decision, details, explanation)
+    with tracing.span("send_decision_email", kind="tool_call"):
+        status = await get_outbox().send(build_message(to, subject, body))
+    return f"Email sent to {to} ({status})" if not status.startswith("failed") else f"Email to {to} {status}"
+
+
+@tracing.traced_tool
+async def generate_email(ctx, decision: str) -> str:
+    """
+    Generate a personalized email based on the signup decision.
+    """
+    try:
+        subject, body = render_email(decision)
+    except ValueError as e:
+        return f"No email generated: {e}"
+    return f"Generated Email:\nSubject: {subject}\n\n{body}"
+
+@tracing.traced_tool
 async def send_email(ctx, email_content: str) -> str:
     """
-    Simulate sending the email.
+    Send the email. Content with 'To:' and 'Subject:' lines goes out through the outbox; anything else is only simulated.
     """
-    return f"Email sent with content:\n{email_content}"
+    to = re.search(r"^To:\s*(\S+@\S+)\s*$", email_content, re.MULTILINE)
+    if to is None:
+        return f"Email sent with content:\n{email_content}"
+    subject = re.search(r"^Subject:\s*(.*)$", email_content, re.MULTILINE)
+    body = email_content.split("\n\n", 1)[-1]
+    status = await get_outbox().send(build_message(to.group(1), subject.group(1) if subject else "", body))
+    return f"Email to {to.group(1)}: {status}"
 
-@agent.tool
+@tracing.traced_tool
 async def faq_lookup(ctx, question: str) -> str:
     """
-    Answer the FAQ question about the event using the provided event documentation.
+    Answer the FAQ question about the event using the relevant parts of the event documentation.
     Return a clear and concise answer.
     """
-    documentation = (
-        "Event Documentation:\n"
-        "Tech Expo 2025 is an annual technology event that showcases the latest innovations in technology and enterprise automation. "
-        "It will be held at the San Francisco Convention Center from June 5 to June 7, 2025. "
-        "The event features keynote speakers from leading tech companies, interactive workshops, and an exhibition hall with hundreds of vendors. "
-        "Registration is required, and early bird discounts are available until March 31, 2025. "
-        "The schedule includes keynote sessions, breakout sessions, and networking events. "
-        "Additional amenities include free Wi-Fi, food trucks, and VIP lounges for registered VIP attendees."
-    )
+    # Only the FAQ chunks relevant to this question go into the prompt (see faq_index.py).
+    from faq_index import retrieve_context  # NumPy index, loaded on the first FAQ question.
+    context = await asyncio.to_thread(retrieve_context, question)  # May (re)build the index on first use.
+    documentation = "Event Documentation:\n" + (context or "No matching documentation found.")
     prompt = (
         "You are an event FAQ assistant. Use the following event documentation to answer the FAQ question clearly and concisely:\n\n"
         f"{documentation}\n\n"
         "Question: " + question + "\n\nAnswer:"
     )
-    faq_response = await simple_llm_call(prompt)
+    # Cache on the question itself, scoped to the documentation chunks it was answered from.
+    namespace = "faq:" + hashlib.sha256(documentation.encode()).hexdigest()[:12]
+    faq_response = await get_cache().aget_or_call(
+        question, lambda: simple_llm_call(prompt), model="gpt-4o", temperature=0.7, namespace=namespace
+    )
     return faq_response
 
+_agent = None
+
+def get_agent():
+    """Build the agent (and import pydantic_ai) on first use instead of at import time."""
+    global _agent
+    if _agent is None:
+        from pydantic_ai import Agent
+        agent = Agent(
+            llm_client.agent_model('gpt-4o'),  # Shared pool + tracing for the agent's own model requests.
+            deps_type=dict,  # For structured data when needed.
+            result_type=str,
+            system_prompt=(
+                "You are a fully autonomous event processing agent. When given an incoming email message related to an event, "
+                "you must decide whether the message is a signup request or a generic FAQ query. If it's a signup, "
+                "extract the applicant’s details (such as name, email, company, company description, and event name if provided), "
+                "then use your own reasoning to classify the signup as 'VIP Attendee', 'Standard Attendee', or 'Rejected', "
+                "and generate a personalized email that explains your decision (with specific reasons). Finally, simulate sending that email. "
+                "If the email is a FAQ query, answer the question concisely. "
+                "Prefer the 'classify_and_decide' tool: it classifies the email and, for signups, makes the attendance decision in one step. "
+                "When its result says the email was sent, the signup is done: do not call 'generate_email' or 'send_email'. "
+                "Do not rely on any hardcoded sequence in your code; instead, plan and execute the necessary steps autonomously. "
+                "Your final output should be either a confirmation that the signup email has been sent or the FAQ answer."
+            ),
+        )
+        for tool in (classify_message, decide_attendance, classify_and_decide, generate_email, send_email, faq_lookup):
+            agent.tool(tool)
+        _agent = agent
+    return _agent
+
+def __getattr__(name):
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 async def run_fully_autonomous_agent():
     # Simulate receiving a free-form email message.
     # incoming_email = (
@@ -143,26 +310,15 @@ async def run_fully_autonomous_agent():
         "Thanks,\nBob"
     )
     
-    with capture_run_messages() as messages:
-        final_response = await agent.run(incoming_email, deps={})
+    # Steps go to the transcript log as they happen (transcripts.py), not to stdout.
+    with transcript("run_fully_autonomous_agent", email=incoming_email[:200]) as run, \
+            tracing.span("run_fully_autonomous_agent", kind="agent_run"), compaction() as history:
+        final_response = await get_agent().run(incoming_email, deps={})
     
     print("Final Output:")
     print(final_response.data)
-    print("\n--- Steps Taken ---\n")
-    for idx, msg in enumerate(messages, start=1):
-        print(f"Step {idx} [{msg.kind}]:")
-        for part in msg.parts:
-            if part.part_kind == "tool-call":
-                # For tool-call parts, print tool name and args.
-                print(f"  Tool Call: {part.tool_name} with args: {getattr(part, 'args', 'N/A')}")
-            elif part.part_kind == "tool-return":
-                # For tool-return parts, print content if available.
-                print(f"  Tool Return: {getattr(part, 'content', 'No content')}")
-            else:
-                # For system-prompt, user-prompt, text, etc.
-                print(f"  {part.part_kind.capitalize()}: {getattr(part, 'content', 'No content')}")
-        print("-" * 50)
-    print("\n--- End of Steps ---")
+    print(history.summary())
+    print(run.summary())
 
 if __name__ == "__main__":
     asyncio.run(run_fully_autonomous_agent())
\ No newline at end of file
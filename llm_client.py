@@ -0,0 +1,292 @@
+import asyncio
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+import tracing
+
+# Load API key from .env file
+load_dotenv()
+
+# ---------------------------
+# Shared LLM Client Pool
+# ---------------------------
+# Every level module talks to the model through these clients, so all calls share
+# one bounded, keep-alive HTTP connection pool instead of opening a new one per call,
+# and one rate limiter / retry scheduler underneath it. The OpenAI SDK, httpx and the
+# limiter are imported when the first client is built, not when a level module is imported.
+settings = {
+    "max_connections": int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+    "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "10")),
+    "timeout": float(os.getenv("LLM_TIMEOUT", "60")),
+    "base_url": os.getenv("OPENAI_BASE_URL"),
+    # Shared rate limiter / retry scheduler (rate_limiter.py); 0 disables a limit.
+    "rpm": float(os.getenv("LLM_RPM", "0")),
+    "tpm": float(os.getenv("LLM_TPM", "0")),
+    "max_retries": int(os.getenv("LLM_MAX_RETRIES", "4")),
+    "backoff_base": float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+    "failure_threshold": int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+    "recovery_time": float(os.getenv("LLM_BREAKER_RECOVERY", "30")),
+}
+
+_sync_client = None
+_limiter = None
+# Async clients are bound to the event loop they were created on, so keep one per
+# running loop (scripts call asyncio.run more than once).
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def configure(**overrides):
+    """Change pool or limiter settings (see `settings`) and drop existing clients and limiter state."""
+    global _sync_client, _limiter
+    unknown = set(overrides) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown LLM client settings: {sorted(unknown)}")
+    settings.update(overrides)
+    if _sync_client is not None:
+        _sync_client.close()
+    _sync_client = None
+    _limiter = None
+    _async_clients.clear()
+
+
+def get_limiter():
+    """The rate limiter / retry scheduler (rate_limiter.RateLimiter) shared by every client."""
+    global _limiter
+    if _limiter is None:
+        from rate_limiter import RateLimiter
+        _limiter = RateLimiter(
+            rpm=settings["rpm"], tpm=settings["tpm"], max_concurrency=settings["max_concurrency"],
+            max_retries=settings["max_retries"],
+            backoff_base=settings["backoff_base"], failure_threshold=settings["failure_threshold"],
+            recovery_time=settings["recovery_time"],
+        )
+    return _limiter
+
+
+def priority(name: str):
+    """Context manager putting the enclosed model calls in a lane: 'interactive', 'default' or 'batch'."""
+    from rate_limiter import lane
+    return lane(name)
+
+
+def _limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_connections"],
+    )
+
+
+def get_client() -> "openai.OpenAI":
+    """Return the shared synchronous client (used by the blocking level1-3 helpers)."""
+    global _sync_client
+    if _sync_client is None:
+        import httpx
+        import openai
+        from rate_limiter import ScheduledTransport
+        _sync_client = openai.OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=settings["base_url"],
+            timeout=settings["timeout"],
+            max_retries=0,  # Retries happen in the shared scheduler.
+            http_client=httpx.Client(
+                transport=ScheduledTransport(httpx.HTTPTransport(limits=_limits()), get_limiter()),
+                timeout=settings["timeout"],
+            ),
+        )
+    return _sync_client
+
+
+def get_async_client() -> "openai.AsyncOpenAI":
+    """Return the async client bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+        import openai
+        from rate_limiter import AsyncScheduledTransport
+        client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=settings["base_url"],
+            timeout=settings["timeout"],
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                transport=AsyncScheduledTransport(httpx.AsyncHTTPTransport(limits=_limits()), get_limiter()),
+                timeout=settings["timeout"],
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def chat_completion(messages, model: str = "gpt-4o", timeout: float = None, **kwargs):
+    """
+    Non-blocking chat completion through the shared pool.
+    At most `max_concurrency` calls are in flight at once; `timeout` overrides the per-call deadline.
+    """
+    with tracing.span("chat_completion", kind="llm_call", model=model) as span:
+        response = await get_async_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            timeout=timeout if timeout is not None else settings["timeout"],
+            **kwargs,
+        )
+        span.set_usage(response.usage)
+        return response
+
+
+async def parse_completion(messages, response_format, model: str = "gpt-4o", timeout: float = None, **kwargs):
+    """Structured-output completion validated into the `response_format` pydantic model."""
+    with tracing.span("parse_completion", kind="llm_call", model=model) as span:
+        response = await get_async_client().beta.chat.completions.parse(
+            model=model,
+            messages=messages,
+            response_format=response_format,
+            timeout=timeout if timeout is not None else settings["timeout"],
+            **kwargs,
+        )
+        span.set_usage(response.usage)
+        return response
+
+
+async def simple_llm_call(prompt: str, model: str = "gpt-4o", temperature: float = None, timeout: float = None) -> str:
+    """Single-prompt completion that returns only the stripped message text."""
+    kwargs = {}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    with tracing.span("simple_llm_call", kind="llm_call", model=model):
+        response = await chat_completion(
+            [{"role": "user", "content": prompt}], model=model, timeout=timeout, **kwargs
+        )
+        return response.choices[0].message.content.strip()
+
+
+async def stream_completion(messages, model: str = "gpt-4o", timeout: float = None, **kwargs):
+    """
+    Streaming chat completion: an async generator of text deltas as they arrive.
+    The span records time to first token (ttft_ms) next to the total wall time; close the
+    generator (contextlib.aclosing) when stopping early so the connection is released.
+    """
+    with tracing.span("stream_completion", kind="llm_call", model=model) as span:
+        started = time.perf_counter()
+        stream = await get_async_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout if timeout is not None else settings["timeout"],
+            **kwargs,
+        )
+        first = True
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    span.set_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        span.set(ttft_ms=round((time.perf_counter() - started) * 1000, 3))
+                        first = False
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+
+async def stream_fields(messages, response_format, model: str = "gpt-4o", timeout: float = None, **kwargs):
+    """
+    Structured-output completion streamed as (field, value) pairs: each top-level field of the
+    `response_format` pydantic model is yielded as soon as its value is complete.
+    """
+    from openai.lib._parsing._completions import type_to_response_format_param
+    from streaming import FieldParser
+    parser = FieldParser()
+    pieces = stream_completion(messages, model=model, timeout=timeout,
+                               response_format=type_to_response_format_param(response_format), **kwargs)
+    try:
+        async for piece in pieces:
+            for field in parser.feed(piece):
+                yield field
+    finally:
+        await pieces.aclose()
+
+
+_pooled_model_class = None
+
+
+def _compacted(messages):
+    # Inside history.compaction() the model is sent a compacted copy of the run's history.
+    from history import current_run
+    run = current_run()
+    return messages if run is None else run.compact(messages)
+
+
+def _transcript():
+    # Inside transcripts.transcript() every step of the run is streamed to the transcript log.
+    from transcripts import current_transcript
+    return current_transcript()
+
+
+def agent_model(model_name: str = "gpt-4o"):
+    """
+    pydantic_ai model for Agent(...) whose requests go through the shared per-loop client,
+    the same limiter and tracing as every other call, history compaction (history.py) and
+    transcript capture (transcripts.py).
+    """
+    global _pooled_model_class
+    if _pooled_model_class is None:
+        from pydantic_ai.models.openai import OpenAIModel
+
+        class PooledOpenAIModel(OpenAIModel):
+            def __init__(self, model_name, system_prompt_role=None):
+                self._model_name = model_name
+                self.system_prompt_role = system_prompt_role
+                self._system = "openai"
+
+            @property
+            def client(self):
+                return get_async_client()
+
+            @client.setter
+            def client(self, value):
+                pass  # Always use the shared client of the running loop.
+
+            async def request(self, messages, model_settings, model_request_parameters):
+                with tracing.span("model_request", kind="model_request", model=self.model_name) as span:
+                    transcript = _transcript()
+                    if transcript is not None:
+                        transcript.record_history(messages)
+                    messages = _compacted(messages)
+                    response, usage = await super().request(messages, model_settings, model_request_parameters)
+                    span.set_tokens(usage.request_tokens, usage.response_tokens)
+                    if transcript is not None:
+                        transcript.record_response(response)
+                    return response, usage
+
+            @asynccontextmanager
+            async def request_stream(self, messages, model_settings, model_request_parameters):
+                with tracing.span("model_request", kind="model_request", model=self.model_name, stream=True) as span:
+                    transcript = _transcript()
+                    if transcript is not None:
+                        transcript.record_history(messages)
+                    messages = _compacted(messages)
+                    started = time.perf_counter()
+                    async with super().request_stream(messages, model_settings, model_request_parameters) as response:
+                        # The response is handed over once its first chunk has arrived.
+                        span.set(ttft_ms=round((time.perf_counter() - started) * 1000, 3))
+                        yield response
+                    usage = response.usage()
+                    span.set_tokens(usage.request_tokens, usage.response_tokens)
+                    if transcript is not None:
+                        transcript.record_response(response.get())
+
+        _pooled_model_class = PooledOpenAIModel
+    return _pooled_model_class(model_name)
+
+
+async def aclose():
+    """Close the async client of the running loop (call before the loop shuts down)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+# ---------------------------
+# Bulk Email Sending
+# ---------------------------
+# Outgoing emails are sent over one pooled SMTP connection: it is opened on first use,
+# reused for every message and batch after that, and reopened when the server drops it.
+# Transient failures (4xx replies, dropped connections, network errors) are retried with
+# exponential backoff up to SMTP_RETRIES times. Permanent ones (5xx, refused recipients)
+# are reported at once. The Outbox gathers emails from concurrent agent runs for up to
+# SMTP_BATCH_WINDOW seconds (or SMTP_BATCH_SIZE emails) and sends each batch in one go.
+#
+# Without SMTP_HOST nothing leaves the machine: emails are only recorded (the old simulated
+# send). For a local test, start `python mock_smtp_server.py --port 1025` and set
+# SMTP_HOST=127.0.0.1 SMTP_PORT=1025.
+
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "0") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_RETRIES = int(os.getenv("SMTP_RETRIES", "3"))
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "50"))
+SMTP_BATCH_WINDOW = float(os.getenv("SMTP_BATCH_WINDOW", "0.05"))
+EMAIL_FROM = os.getenv("EMAIL_FROM", "Event Team <events@example.com>")
+
+
+def _connection_lost(error: Exception) -> bool:
+    """A dropped connection or network error (smtplib's own exceptions are OSErrors too, but not these)."""
+    return (isinstance(error, smtplib.SMTPServerDisconnected)
+            or (isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException))
+            or (isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421))
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return _connection_lost(error)
+
+
+class SMTPSender:
+    """Sends messages over one reusable SMTP connection, with retries; safe to share between threads."""
+
+    def __init__(self, host: str = None, port: int = None, user: str = None, password: str = None,
+                 starttls: bool = None, timeout: float = None, retries: int = None, backoff: float = 0.5):
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.user = SMTP_USER if user is None else user
+        self.password = SMTP_PASSWORD if password is None else password
+        self.starttls = SMTP_STARTTLS if starttls is None else starttls
+        self.timeout = timeout or SMTP_TIMEOUT
+        self.retries = SMTP_RETRIES if retries is None else retries
+        self.backoff = backoff
+        self.counters = {"connections": 0, "batches": 0, "sent": 0, "failed": 0, "retries": 0}
+        self._smtp = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            self._smtp = smtp
+            self.counters["connections"] += 1
+        return self._smtp
+
+    def _drop_connection(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            finally:
+                self._smtp = None
+
+    def send_batch(self, messages) -> list:
+        """Send every message; returns one result string per message ('sent' or 'failed: ...')."""
+        with self._lock:
+            self.counters["batches"] += 1
+            return [self._send(message) for message in messages]
+
+    def _send(self, message: EmailMessage) -> str:
+        for attempt in range(self.retries + 1):
+            try:
+                self._connection().send_message(message)
+                self.counters["sent"] += 1
+                return "sent"
+            except Exception as e:
+                if _connection_lost(e):
+                    self._drop_connection()
+                if not _is_transient(e) or attempt == self.retries:
+                    self.counters["failed"] += 1
+                    return f"failed: {type(e).__name__}: {e}"
+                self.counters["retries"] += 1
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def close(self):
+        with self._lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except smtplib.SMTPException:
+                    pass
+                self._drop_connection()
+
+
+class RecordingSender:
+    """Stand-in used without SMTP_HOST: keeps the messages instead of sending them."""
+
+    def __init__(self, keep: int = 1000):
+        self.keep = keep
+        self.messages = []
+        self.counters = {"connections": 0, "batches": 0, "sent": 0, "failed": 0, "retries": 0}
+
+    def send_batch(self, messages) -> list:
+        self.counters["batches"] += 1
+        self.counters["sent"] += len(messages)
+        self.messages = (self.messages + list(messages))[-self.keep:]
+        return ["simulated (SMTP_HOST is not set)"] * len(messages)
+
+    def close(self):
+        pass
+
+
+class Outbox:
+    """Batches emails from concurrent coroutines and sends each batch on the sender in a worker thread."""
+
+    def __init__(self, sender=None, batch_size: int = None, window: float = None):
+        self.sender = sender or (SMTPSender() if SMTP_HOST else RecordingSender())
+        self.batch_size = batch_size or SMTP_BATCH_SIZE
+        self.window = SMTP_BATCH_WINDOW if window is None else window
+        self._pending = {}  # event loop -> [(message, future)]
+        self._flushers = {}  # event loop -> flush task
+
+    async def send(self, message: EmailMessage) -> str:
+        """Queue one email and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(loop, [])
+        pending.append((message, future))
+        flusher = self._flushers.get(loop)
+        if flusher is None or flusher.done():
+            self._flushers[loop] = loop.create_task(self._flush(loop))
+        return await future
+
+    async def _flush(self, loop):
+        pending = self._pending[loop]
+        while pending:
+            if len(pending) < self.batch_size:
+                await asyncio.sleep(self.window)
+            batch, pending[:] = pending[:self.batch_size], pending[self.batch_size:]
+            try:
+                results = await asyncio.to_thread(self.sender.send_batch, [message for message, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        self._pending.pop(loop, None)
+        self._flushers.pop(loop, None)
+
+    def close(self):
+        self.sender.close()
+
+
+def build_message(to: str, subject: str, body: str, sender: str = None) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender or EMAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+_outbox = None
+
+
+def get_outbox() -> Outbox:
+    """The process-wide outbox (and its pooled connection), created on first use."""
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox()
+    return _outbox
+
+
+def configure(**kwargs) -> Outbox:
+    """Replace the process-wide outbox, e.g. configure(sender=SMTPSender(host, port))."""
+    global _outbox
+    if _outbox is not None:
+        _outbox.close()
+    _outbox = Outbox(**kwargs)
+    return _outbox
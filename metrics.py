@@ -0,0 +1,39 @@
+import math
+
+# ---------------------------
+# Latency Statistics Helpers
+# ---------------------------
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of a list of numbers; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies, elapsed: float = None) -> dict:
+    """Count, p50/p95/p99 and max latency in milliseconds, plus throughput if `elapsed` is given."""
+    summary = {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+    if elapsed is not None:
+        summary["elapsed_s"] = elapsed
+        summary["per_sec"] = len(latencies) / elapsed if elapsed > 0 else 0.0
+    return summary
+
+
+def format_summary(summary: dict, unit: str = "req") -> str:
+    line = (
+        f"{summary['count']} {unit} | p50 {summary['p50_ms']:.1f} ms | p95 {summary['p95_ms']:.1f} ms | "
+        f"p99 {summary['p99_ms']:.1f} ms | max {summary['max_ms']:.1f} ms"
+    )
+    if "per_sec" in summary:
+        line += f" | {summary['per_sec']:.2f} {unit}/sec"
+    return line
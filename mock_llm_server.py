@@ -0,0 +1,320 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------
+# Local Mock Completion Server
+# ---------------------------
+# A deterministic stand-in for the OpenAI chat-completions endpoint so every level can be
+# measured without an API key. It speaks the tool-calling protocol, can follow scripted
+# multi-turn agent flows (ScriptedResponder), and injects latency and errors from a seeded
+# RNG so runs are repeatable. Point llm_client at it with
+# llm_client.configure(base_url=server.base_url).
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes on a keep-alive socket.
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean.
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        server = self.server.mock
+        server.record_request(payload)
+        failure = server.injected_failure()
+        if failure is not None:
+            time.sleep(server.latency)
+            status, headers = failure
+            self._send(status, {"error": {"message": "Injected failure", "type": "mock_error", "code": status}}, headers)
+            return
+        body = server.completion(payload)
+        if payload.get("stream"):
+            self._stream(server, payload, body)
+            return
+        time.sleep(server.delay_for(body))
+        self._send(200, body)
+
+    def _stream(self, server, payload, body):
+        """Server-sent chat.completion.chunk events; the first arrives after `latency`, then one per token delay."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(server.delay_for(body, first_token=True))
+        try:
+            for chunk, delay in server.stream_chunks(payload, body):
+                data = f"data: {json.dumps(chunk) if isinstance(chunk, dict) else chunk}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                if delay:
+                    time.sleep(delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # The client stopped reading early (e.g. a decided router).
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# ---------------------------
+# Scripted Responses
+# ---------------------------
+def first_user_message(payload) -> str:
+    for message in payload.get("messages", []):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+def last_tool_output(payload) -> str:
+    for message in reversed(payload.get("messages", [])):
+        if message.get("role") == "tool":
+            return str(message.get("content") or "")
+    return ""
+
+
+def tool_turns(payload) -> int:
+    """Number of assistant turns that already called tools in this conversation."""
+    return sum(1 for m in payload.get("messages", []) if m.get("role") == "assistant" and m.get("tool_calls"))
+
+
+class ToolCall:
+    """A scripted tool call; `arguments` is a dict or a callable(payload) -> dict."""
+
+    def __init__(self, name, arguments=None):
+        self.name = name
+        self.arguments = arguments or {}
+
+    def render(self, payload) -> dict:
+        arguments = self.arguments(payload) if callable(self.arguments) else self.arguments
+        return {"name": self.name, "arguments": arguments}
+
+
+class Script:
+    """
+    Ordered turns of one scripted conversation. Step i answers the request made after i
+    tool-calling turns; a step is text, a ToolCall, a list of ToolCalls or a callable(payload)
+    returning any of these (to branch on earlier tool output).
+    `match` is a substring of the first user message or a callable(payload) -> bool.
+    """
+
+    def __init__(self, match, steps):
+        self.match = match
+        self.steps = steps
+
+    def matches(self, payload) -> bool:
+        if callable(self.match):
+            return self.match(payload)
+        return self.match in first_user_message(payload)
+
+    def respond(self, payload):
+        step = self.steps[min(tool_turns(payload), len(self.steps) - 1)]
+        if callable(step):
+            step = step(payload)
+        if isinstance(step, ToolCall):
+            step = [step]
+        if isinstance(step, list):
+            return {"tool_calls": [call.render(payload) for call in step]}
+        return step
+
+
+class ScriptedResponder:
+    """Responder that picks the first matching Script, else `default(payload)` or an echo."""
+
+    def __init__(self, scripts, default=None):
+        self.scripts = scripts
+        self.default = default
+
+    def __call__(self, payload):
+        for script in self.scripts:
+            if script.matches(payload):
+                return script.respond(payload)
+        if self.default is not None:
+            return self.default(payload)
+        return f"Mock answer to: {first_user_message(payload)}"
+
+
+class MockLLMServer:
+    """
+    Threaded HTTP server that answers chat completions.
+    `responder(payload)` returns the answer text, or a dict with "tool_calls"
+    ([{"name": ..., "arguments": {...}}]) and optional "content". Latency is
+    `latency + latency_per_token * completion_tokens + jitter * U(0, 1)`, and a
+    fraction `error_rate` of requests fails with `error_status` (429s carry Retry-After).
+    Requests with "stream": true get SSE chunks: the first after `latency + jitter`, the rest
+    paced by `latency_per_token`.
+    """
+
+    def __init__(self, latency: float = 0.05, host: str = "127.0.0.1", port: int = 0, responder=None,
+                 latency_per_token: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, retry_after: float = 1.0, seed: int = 0):
+        self.latency = latency
+        self.latency_per_token = latency_per_token
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.responder = responder
+        self.requests = []
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self, payload):
+        with self._lock:
+            self.requests.append(payload)
+
+    def injected_failure(self):
+        """(status, headers) for a request that should fail, otherwise None."""
+        with self._lock:
+            if not self.error_rate or self._rng.random() >= self.error_rate:
+                return None
+            self.usage["errors"] += 1
+        headers = {"Retry-After": f"{self.retry_after:g}"} if self.error_status == 429 else {}
+        return self.error_status, headers
+
+    def delay_for(self, body, first_token: bool = False) -> float:
+        """Response delay; with first_token=True only the part before streaming starts (no per-token time)."""
+        with self._lock:
+            jitter = self.jitter * self._rng.random() if self.jitter else 0.0
+        tokens = 0 if first_token else body["usage"]["completion_tokens"]
+        return self.latency + self.latency_per_token * tokens + jitter
+
+    def stream_chunks(self, payload, body):
+        """
+        (chunk, delay after it) pairs that stream `body`: one content chunk per word, tool calls
+        whole. The per-token time of the whole completion is spread over the chunks by length.
+        """
+        message = body["choices"][0]["message"]
+        base = {"id": body["id"], "object": "chat.completion.chunk", "created": body["created"], "model": body["model"]}
+        pieces = re.findall(r"\S+\s*|\s+", message["content"] or "")
+        calls = message.get("tool_calls", [])
+        chars = sum(map(len, pieces)) + sum(len(call["function"]["arguments"]) for call in calls)
+        per_char = self.latency_per_token * body["usage"]["completion_tokens"] / max(1, chars)
+
+        def chunk(delta, finish_reason=None):
+            return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        # Like the real API: tool-call turns open with content null, text turns with "".
+        yield chunk({"role": "assistant", "content": None if calls else ""}), 0.0
+        for piece in pieces:
+            yield chunk({"content": piece}), per_char * len(piece)
+        for index, call in enumerate(calls):
+            yield chunk({"tool_calls": [{"index": index, **call}]}), per_char * len(call["function"]["arguments"])
+        yield chunk({}, body["choices"][0]["finish_reason"]), 0.0
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield {**base, "choices": [], "usage": body["usage"]}, 0.0
+        yield "[DONE]", 0.0
+
+    def completion(self, payload):
+        """Build a chat-completion body (echoing the last user message unless a responder is set)."""
+        messages = payload.get("messages", [])
+        if self.responder is not None:
+            answer = self.responder(payload)
+        else:
+            last = messages[-1].get("content", "") if messages else ""
+            answer = f"Mock answer to: {last}"
+        if isinstance(answer, dict):
+            content = answer.get("content")
+            tool_calls = [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])},
+            } for call in answer.get("tool_calls", [])]
+        else:
+            content, tool_calls = answer, []
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        # Rough tokenizer stand-in: ~4 characters per token, counting any schema sent along.
+        prompt_chars = sum(len(str(m.get("content") or "")) + len(json.dumps(m.get("tool_calls") or ""))
+                           for m in messages)
+        prompt_chars += len(json.dumps(payload.get("response_format") or "")) + len(json.dumps(payload.get("tools") or ""))
+        prompt_tokens = prompt_chars // 4
+        completion_tokens = (len(content or "") + len(json.dumps(tool_calls) if tool_calls else "")) // 4
+        with self._lock:
+            self.usage["calls"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["completion_tokens"] += completion_tokens
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def reset_usage(self):
+        with self._lock:
+            self.requests.clear()
+            self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "errors": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock chat-completions server.")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    with MockLLMServer(latency=args.latency, port=args.port, jitter=args.jitter,
+                       error_rate=args.error_rate, error_status=args.error_status) as server:
+        print(f"Mock LLM server listening on {server.base_url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,139 @@
+import random
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+
+# ---------------------------
+# Local Debugging SMTP Server
+# ---------------------------
+# A small SMTP sink for testing the level5 email path without a real mail server. It
+# accepts every message and keeps it in memory (`messages`), prints it with --print, and
+# can inject transient failures (451 on MAIL FROM, from a seeded RNG) and per-connection
+# message limits (the connection is dropped after `max_per_connection` messages) to
+# exercise the sender's retries and reconnects. Point the mailer at it with
+# SMTP_HOST=127.0.0.1 SMTP_PORT=<port>.
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server.mock
+        server.record_connection()
+        self.reply("220 mock-smtp ready")
+        sender, recipients, delivered = None, [], 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", errors="replace").strip().partition(" ")
+            command = command.upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250-mock-smtp" if command == "EHLO" else "250 mock-smtp")
+                if command == "EHLO":
+                    self.reply("250 8BITMIME")
+            elif command == "MAIL":
+                if server.injected_failure():
+                    self.reply("451 4.3.0 Injected transient failure, try again later")
+                    continue
+                sender, recipients = argument, []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(argument)
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                server.deliver(sender, recipients, b"".join(data))
+                delivered += 1
+                self.reply("250 OK: queued")
+                if server.max_per_connection and delivered >= server.max_per_connection:
+                    return  # Drop the connection without a goodbye, like a server enforcing a limit.
+            elif command in ("RSET", "NOOP"):
+                if command == "RSET":
+                    sender, recipients = None, []
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class MockSMTPServer:
+    """Threaded SMTP sink; use as a context manager and read `messages` and `stats` afterwards."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, error_rate: float = 0.0,
+                 max_per_connection: int = 0, print_messages: bool = False, seed: int = 0):
+        self.error_rate = error_rate
+        self.max_per_connection = max_per_connection
+        self.print_messages = print_messages
+        self.messages = []
+        self.stats = {"connections": 0, "messages": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+
+    @property
+    def address(self) -> tuple:
+        return self._server.server_address[:2]
+
+    def record_connection(self):
+        with self._lock:
+            self.stats["connections"] += 1
+
+    def injected_failure(self) -> bool:
+        with self._lock:
+            if not self.error_rate or self._rng.random() >= self.error_rate:
+                return False
+            self.stats["errors"] += 1
+            return True
+
+    def deliver(self, sender, recipients, data: bytes):
+        message = message_from_bytes(data, policy=policy.default)
+        with self._lock:
+            self.messages.append(message)
+            self.stats["messages"] += 1
+        if self.print_messages:
+            print(f"---------- MAIL {sender} -> {', '.join(recipients)} ----------")
+            print(data.decode("utf-8", errors="replace").rstrip())
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local debugging SMTP server that prints every message.")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    with MockSMTPServer(port=args.port, error_rate=args.error_rate, print_messages=True) as server:
+        host, port = server.address
+        print(f"Debugging SMTP server listening on {host}:{port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,511 @@
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+import httpx
+import tracing
+
+# ---------------------------
+# Central Rate Limiter and Retry Scheduler
+# ---------------------------
+# llm_client installs ScheduledTransport under both OpenAI clients, so every model call
+# (sync helpers, async helpers, pydantic_ai agents) passes through one RateLimiter:
+#   - an in-flight limit and token buckets for requests/min and tokens/min, granted in
+#     priority-lane order,
+#   - jittered exponential backoff on 429/5xx/connection errors that honours Retry-After
+#     (a 429 also pauses every other caller until the server's deadline),
+#   - a circuit breaker that fails fast after repeated server errors.
+# The OpenAI SDK's own retries are switched off so attempts are not multiplied.
+
+LANES = {"interactive": 0, "default": 1, "batch": 2}
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+_lane = contextvars.ContextVar("llm_lane", default="default")
+
+
+@contextlib.contextmanager
+def lane(name: str):
+    """Run the enclosed model calls in a priority lane ('interactive', 'default' or 'batch')."""
+    if name not in LANES:
+        raise ValueError(f"Unknown lane {name!r}; expected one of {sorted(LANES)}")
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    """Refills `per_minute / 60` units per second up to `burst_seconds` worth of capacity."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 1.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now) -> float:
+        """Seconds until `amount` can be taken (requests larger than the bucket only wait for a full bucket)."""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= amount  # May go negative for oversized requests; later callers wait it off.
+
+    def give(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; one trial request is let through after
+    `recovery_time`. A trial that gets no answer within another `recovery_time` (or is abandoned)
+    makes way for a new one, so a cancelled trial can't leave the breaker half-open for good.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """'closed' (call normally), 'trial' (the one half-open probe) or None (fail fast)."""
+        with self._lock:
+            if self.state == "closed":
+                return "closed"
+            now = time.monotonic()
+            if now - self.opened_at >= self.recovery_time:  # Open long enough, or the last trial went silent.
+                self.state, self.opened_at = "half_open", now
+                return "trial"
+            return None
+
+    def abandon_trial(self):
+        """The trial ended without an outcome (e.g. cancelled): the next caller may try at once."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state, self.opened_at = "open", time.monotonic() - self.recovery_time
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures = "closed", 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state, self.opened_at = "open", time.monotonic()
+                self.opens += 1
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def retry_after_seconds(headers):
+    """Server-requested delay from retry-after-ms / Retry-After (seconds or HTTP date), else None."""
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RateLimiter:
+    """
+    Shared scheduler for model calls. Admission needs a free in-flight slot (`max_concurrency`)
+    and room in the requests/min and tokens/min buckets; 0 disables a limit. Every acquire()
+    must be paired with release() once the response body is closed (the transports do this
+    in the response's close hook, so streamed bodies count against `max_concurrency` too).
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_concurrency: int = 0, burst_seconds: float = 1.0,
+                 max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, failure_threshold: int = 5,
+                 recovery_time: float = 30.0, completion_estimate: int = 256, seed: int = None):
+        self.requests = TokenBucket(rpm, burst_seconds) if rpm else None
+        self.tokens = TokenBucket(tpm, burst_seconds) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.completion_estimate = completion_estimate
+        self.breaker = CircuitBreaker(failure_threshold, recovery_time)
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (lane priority, sequence)
+        self._wakeups = {}  # ticket -> (loop, future) of an async waiter with no known grant delay
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self.counters = {"granted": 0, "throttled": 0, "throttle_wait_s": 0.0, "max_queue_depth": 0,
+                         "retries": 0, "rate_limited": 0, "server_errors": 0, "connection_errors": 0,
+                         "failed_fast": 0, "gave_up": 0}
+
+    # ----- admission -----
+    def estimate_tokens(self, request: httpx.Request) -> int:
+        """Prompt tokens (~4 bytes each of the JSON body) plus the requested or estimated completion."""
+        if self.tokens is None:
+            return 0
+        body = request.content or b""
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            payload = {}
+        completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or self.completion_estimate
+        return len(body) // 4 + int(completion)
+
+    def _free(self, now) -> bool:
+        """Under the lock: whether a call may skip the queue (nothing queued, no limit in the way)."""
+        return (not self._waiters and self.requests is None and self.tokens is None and now >= self._paused_until
+                and (not self.max_concurrency or self.in_flight < self.max_concurrency))
+
+    def _grant_delay(self, ticket, tokens, now):
+        """Under the lock: 0 if `ticket` was granted now, else seconds to wait (None: wait for a wake-up)."""
+        if self._waiters[0] != ticket or (self.max_concurrency and self.in_flight >= self.max_concurrency):
+            return None
+        delay = self._paused_until - now
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.wait_time(tokens, now))
+        if delay > 0:
+            return delay
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        heapq.heappop(self._waiters)
+        self.in_flight += 1
+        self.counters["granted"] += 1
+        return 0.0
+
+    def _enqueue(self):
+        ticket = (LANES[_lane.get()], next(self._sequence))
+        heapq.heappush(self._waiters, ticket)
+        self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], len(self._waiters))
+        return ticket
+
+    def _dequeue(self, ticket):
+        """Drop a ticket that gave up waiting (cancelled or failed)."""
+        self._wakeups.pop(ticket, None)
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._notify()
+
+    def _notify(self):
+        """
+        Under the lock: something changed (a release, grant or dropped ticket). Sync waiters
+        re-check on the condition; of the async waiters only the head of the queue can be granted,
+        so only its future is resolved.
+        """
+        self._cond.notify_all()
+        if self._waiters:
+            waiter = self._wakeups.pop(self._waiters[0], None)
+            if waiter is not None:
+                loop, future = waiter
+                loop.call_soon_threadsafe(_wake, future)
+
+    def _record_wait(self, waited):
+        if waited > 0.001:
+            self.counters["throttled"] += 1
+            self.counters["throttle_wait_s"] += waited
+            tracing.add_queue_time(waited)
+
+    def _grant_now(self) -> float:
+        self.in_flight += 1
+        self.counters["granted"] += 1
+        return 0.0
+
+    def release(self):
+        """Free the in-flight slot taken by acquire()."""
+        with self._cond:
+            self.in_flight -= 1
+            self._notify()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until the call may go out; returns the seconds spent waiting."""
+        started = time.monotonic()
+        with self._cond:
+            if self._free(started):
+                return self._grant_now()
+            ticket = self._enqueue()
+            try:
+                while True:
+                    delay = self._grant_delay(ticket, tokens, time.monotonic())
+                    if delay == 0:
+                        self._notify()
+                        break
+                    self._cond.wait(timeout=delay if delay is not None else 0.05)
+            except BaseException:
+                self._dequeue(ticket)
+                raise
+            waited = time.monotonic() - started
+            self._record_wait(waited)
+        return waited
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """
+        Async acquire(): sleeps out a known delay (bucket refill, 429 pause), otherwise awaits a
+        future that _notify() resolves when the ticket reaches the head of the queue or a slot frees.
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._free(started):
+                return self._grant_now()
+            ticket = self._enqueue()
+        try:
+            while True:
+                future = None
+                with self._cond:
+                    delay = self._grant_delay(ticket, tokens, time.monotonic())
+                    if delay == 0:
+                        self._notify()
+                        break
+                    if delay is None:
+                        future = loop.create_future()
+                        self._wakeups[ticket] = (loop, future)
+                if future is None:
+                    await asyncio.sleep(delay)
+                else:
+                    await future
+        except BaseException:
+            with self._cond:
+                self._dequeue(ticket)
+            raise
+        waited = time.monotonic() - started
+        with self._cond:
+            self._record_wait(waited)
+        return waited
+
+    # ----- outcomes -----
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def on_response(self, response: httpx.Response, attempt: int):
+        """Record the outcome; returns the delay before retrying, or None if the response is final."""
+        status = response.status_code
+        if status < 500:
+            self.breaker.record_success()  # The server is up, even if it throttles us.
+        else:
+            self.breaker.record_failure()
+        if status not in RETRY_STATUSES:
+            return None
+        retry_after = retry_after_seconds(response.headers)
+        with self._cond:
+            if status == 429:
+                self.counters["rate_limited"] += 1
+                if retry_after is not None:
+                    # Everyone backs off, not just this caller.
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            else:
+                self.counters["server_errors"] += 1
+        return self._retry_delay(attempt, retry_after)
+
+    def on_connection_error(self, attempt: int):
+        with self._cond:
+            self.counters["connection_errors"] += 1
+        self.breaker.record_failure()
+        return self._retry_delay(attempt)
+
+    def _retry_delay(self, attempt, retry_after=None):
+        with self._cond:
+            if attempt >= self.max_retries:
+                self.counters["gave_up"] += 1
+                return None
+            self.counters["retries"] += 1
+        tracing.annotate(retries=attempt + 1)
+        return self.backoff(attempt, retry_after)
+
+    def reconcile(self, estimated: int, body: bytes):
+        """Correct the tokens/min bucket with the usage the server reported."""
+        try:
+            actual = json.loads(body)["usage"]["total_tokens"]
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._cond:
+            if actual > estimated:
+                self.tokens.take(actual - estimated)
+            else:
+                self.tokens.give(estimated - actual)
+
+    def circuit_open_response(self, request: httpx.Request) -> httpx.Response:
+        with self._cond:
+            self.counters["failed_fast"] += 1
+        message = f"Circuit breaker open after repeated server errors; retrying in {self.breaker.recovery_time:g}s."
+        return httpx.Response(503, json={"error": {"message": message, "type": "circuit_open"}}, request=request)
+
+    def stats(self) -> dict:
+        with self._cond:
+            lanes = {name: sum(1 for priority, _ in self._waiters if priority == p) for name, p in LANES.items()}
+            return {**self.counters, "queue_depth": len(self._waiters), "queued_by_lane": lanes, "in_flight": self.in_flight,
+                    "paused_for_s": max(0.0, self._paused_until - time.monotonic()),
+                    "circuit": self.breaker.state, "circuit_opens": self.breaker.opens}
+
+
+class _ReleasingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Response body wrapper that frees the limiter slot when the body is closed, once."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def _release_once(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __iter__(self):
+        yield from self._stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release_once()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release_once()
+
+
+def _wants_reconcile(limiter, response) -> bool:
+    return (limiter.tokens is not None and response.status_code == 200
+            and "json" in response.headers.get("content-type", ""))
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    """httpx transport that admits, retries and meters every request through a RateLimiter."""
+
+    def __init__(self, transport: httpx.BaseTransport, limiter: RateLimiter):
+        self._transport = transport
+        self.limiter = limiter
+
+    def handle_request(self, request):
+        limiter = self.limiter
+        tokens = limiter.estimate_tokens(request)
+        attempt = 0
+        while True:
+            limiter.acquire(tokens)
+            admitted = limiter.breaker.admit()  # After queueing, so a waiting trial doesn't hold the slot.
+            if admitted is None:
+                limiter.release()
+                return limiter.circuit_open_response(request)
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError:
+                limiter.release()
+                delay = limiter.on_connection_error(attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                limiter.release()
+                if admitted == "trial":
+                    limiter.breaker.abandon_trial()
+                raise
+            else:
+                delay = limiter.on_response(response, attempt)
+                if delay is None:
+                    response.stream = _ReleasingStream(response.stream, limiter.release)
+                    if _wants_reconcile(limiter, response):
+                        try:
+                            limiter.reconcile(tokens, response.read())
+                        except BaseException:
+                            response.close()
+                            raise
+                    return response
+                try:
+                    response.close()
+                finally:
+                    limiter.release()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncScheduledTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ScheduledTransport."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter):
+        self._transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request):
+        limiter = self.limiter
+        tokens = limiter.estimate_tokens(request)
+        attempt = 0
+        while True:
+            await limiter.aacquire(tokens)
+            admitted = limiter.breaker.admit()  # After queueing, so a waiting trial doesn't hold the slot.
+            if admitted is None:
+                limiter.release()
+                return limiter.circuit_open_response(request)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError:
+                limiter.release()
+                delay = limiter.on_connection_error(attempt)
+                if delay is None:
+                    raise
+            except BaseException:  # Cancelled (client gone, timeout): no outcome to record.
+                limiter.release()
+                if admitted == "trial":
+                    limiter.breaker.abandon_trial()
+                raise
+            else:
+                delay = limiter.on_response(response, attempt)
+                if delay is None:
+                    response.stream = _ReleasingStream(response.stream, limiter.release)
+                    if _wants_reconcile(limiter, response):
+                        try:
+                            limiter.reconcile(tokens, await response.aread())
+                        except BaseException:
+                            await response.aclose()
+                            raise
+                    return response
+                try:
+                    await response.aclose()
+                finally:
+                    limiter.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,358 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from dotenv import load_dotenv
+import tracing
+
+load_dotenv()
+
+# ---------------------------
+# Semantic Response Cache
+# ---------------------------
+# Persistent SQLite cache for LLM answers. Lookups first try an exact key on the
+# normalized text + model + temperature (no network at all), then optionally fall
+# back to embedding similarity so near-identical questions share an answer.
+#
+# Embeddings are also kept in memory as one normalized NumPy matrix per (namespace, model,
+# temperature), so a similarity lookup is a single matrix-vector product. Scoring holds
+# only the matrix lock, never the database lock. The async helpers run every database call in
+# a thread. Hits update last_access (the LRU order) in batches: every TOUCH_BATCH hits, before
+# an eviction, or after TOUCH_INTERVAL seconds. The entry count is kept in memory, so a put
+# only evicts when it is over `max_entries`; expired rows are swept every EXPIRE_INTERVAL seconds
+# (lookups already ignore them).
+
+TOUCH_BATCH = 64
+TOUCH_INTERVAL = 1.0
+EXPIRE_INTERVAL = 60.0
+
+
+def normalize(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", text.strip().lower()).rstrip("?!. ")
+
+
+class _EmbeddingMatrix:
+    """Normalized embeddings of one cache scope, one row per key, in a growable float32 matrix."""
+
+    def __init__(self, dim: int):
+        import numpy as np
+        self.dim = dim
+        self.keys = []
+        self.rows = {}  # key -> row
+        self.matrix = np.zeros((16, dim), dtype=np.float32)
+        self.created = np.zeros(16, dtype=np.float64)
+
+    def add(self, key, vector, created):
+        import numpy as np
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            return  # Embedded with another model; it can't be compared with this scope.
+        norm = np.linalg.norm(vector)
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+                self.created = np.concatenate([self.created, np.zeros_like(self.created)])
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector / norm if norm else vector
+        self.created[row] = created
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self.keys) - 1
+        if row != last:  # Move the last row into the gap.
+            moved = self.keys[last]
+            self.keys[row], self.rows[moved] = moved, row
+            self.matrix[row], self.created[row] = self.matrix[last], self.created[last]
+        self.keys.pop()
+
+    def best(self, embedding, cutoff):
+        """(key, cosine score) of the most similar live row, or (None, 0.0)."""
+        import numpy as np
+        n = len(self.keys)
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not n or query.shape != (self.dim,) or not norm:
+            return None, 0.0
+        scores = self.matrix[:n] @ (query / norm)
+        scores[self.created[:n] < cutoff] = -np.inf
+        row = int(np.argmax(scores))
+        return self.keys[row], float(scores[row])
+
+
+def openai_embedder(model: str = "text-embedding-3-small"):
+    """Embedding function backed by the shared OpenAI client."""
+    def embed(text: str):
+        from llm_client import get_client
+        return get_client().embeddings.create(model=model, input=text).data[0].embedding
+    return embed
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache with TTL expiry and LRU eviction once `max_entries` is exceeded.
+    Pass an `embed` callable (text -> list of floats) to enable the similarity fallback.
+    """
+
+    def __init__(self, path: str = "response_cache.db", max_entries: int = 10_000, ttl: float = 7 * 24 * 3600,
+                 similarity_threshold: float = 0.95, embed=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self.counters = {"hits_exact": 0, "hits_semantic": 0, "misses": 0, "evictions": 0, "expired": 0}
+        self._lock = threading.Lock()  # The database and the pending touches.
+        self._matrices = {}  # (namespace, model, temperature) -> _EmbeddingMatrix, loaded on first use.
+        self._matrix_lock = threading.Lock()  # Taken after self._lock when both are needed.
+        self._touched = {}  # key -> last access not yet written
+        self._touched_at = time.monotonic()
+        self._swept_at = 0.0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, namespace TEXT, model TEXT, temperature TEXT, text TEXT,"
+            " response TEXT, embedding BLOB, created REAL, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_scope ON responses(namespace, model, temperature)")
+        self._db.commit()
+        self._entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(text, model, temperature, namespace="default") -> str:
+        raw = f"{namespace}\x00{model}\x00{temperature}\x00{normalize(text)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    # ----- lookups -----
+    def get_exact(self, text, model, temperature=None, namespace="default"):
+        key = self.make_key(text, model, temperature, namespace)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._delete_keys(self._db.execute(
+                    "DELETE FROM responses WHERE key = ? RETURNING key, namespace, model, temperature", (key,)))
+                self._db.commit()
+                self.counters["expired"] += 1
+                return None
+            self._touch(key, now)
+            self.counters["hits_exact"] += 1
+            return row[0]
+
+    def get_similar(self, embedding, model, temperature=None, namespace="default"):
+        """
+        Best cached answer whose embedding is at least `similarity_threshold` similar, or None.
+        One matrix-vector product over the scope's embeddings; blocks only other similarity lookups.
+        """
+        cutoff = time.time() - self.ttl
+        matrix = self._matrix((namespace, model, str(temperature)), len(embedding))
+        with self._matrix_lock:
+            best_key, score = matrix.best(embedding, cutoff)
+        if best_key is None or score < self.similarity_threshold:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (best_key,)).fetchone()
+            if row is None:  # Evicted meanwhile.
+                return None
+            self._touch(best_key, time.time())
+            self.counters["hits_semantic"] += 1
+            return row[0]
+
+    def _matrix(self, scope, dim) -> _EmbeddingMatrix:
+        """The scope's in-memory embeddings, read from the database the first time."""
+        matrix = self._matrices.get(scope)
+        if matrix is not None:
+            return matrix
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, embedding, created FROM responses"
+                " WHERE namespace = ? AND model = ? AND temperature = ? AND embedding IS NOT NULL",
+                scope,
+            ).fetchall()
+            with self._matrix_lock:
+                matrix = self._matrices.get(scope)
+                if matrix is None:
+                    matrix = _EmbeddingMatrix(dim)
+                    for key, blob, created in rows:
+                        matrix.add(key, array("f", blob), created)
+                    self._matrices[scope] = matrix
+        return matrix
+
+    def _delete_keys(self, deleted):
+        """Under self._lock: drop rows returned by a DELETE ... RETURNING from the count and the matrices."""
+        deleted = deleted.fetchall()
+        self._entries -= len(deleted)
+        if deleted and self._matrices:
+            with self._matrix_lock:
+                for key, namespace, model, temperature in deleted:
+                    matrix = self._matrices.get((namespace, model, temperature))
+                    if matrix is not None:
+                        matrix.remove(key)
+        return len(deleted)
+
+    def _touch(self, key, now):
+        """Under self._lock: note a hit; last_access is written in batches."""
+        self._touched[key] = now
+        if len(self._touched) >= TOUCH_BATCH or time.monotonic() - self._touched_at >= TOUCH_INTERVAL:
+            self._flush_touches()
+
+    def _flush_touches(self):
+        if self._touched:
+            self._db.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                 [(at, key) for key, at in self._touched.items()])
+            self._db.commit()
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    # ----- writes -----
+    def put(self, text, response, model, temperature=None, namespace="default", embedding=None):
+        now = time.time()
+        key = self.make_key(text, model, temperature, namespace)
+        scope = (namespace, model, str(temperature))
+        blob = array("f", embedding).tobytes() if embedding is not None else None
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is None:
+                self._entries += 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, model, str(temperature), normalize(text), response, blob, now, now),
+            )
+            matrix = self._matrices.get(scope)
+            if matrix is not None:
+                with self._matrix_lock:
+                    if embedding is not None:
+                        matrix.add(key, embedding, now)
+                    else:
+                        matrix.remove(key)
+            self._touched.pop(key, None)
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        """Under self._lock: sweep expired rows now and then, and trim the LRU tail when over capacity."""
+        if time.monotonic() - self._swept_at >= EXPIRE_INTERVAL:
+            self._swept_at = time.monotonic()
+            self.counters["expired"] += self._delete_keys(self._db.execute(
+                "DELETE FROM responses WHERE created < ? RETURNING key, namespace, model, temperature",
+                (now - self.ttl,)))
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            self._flush_touches()  # Eviction goes by last_access.
+            self.counters["evictions"] += self._delete_keys(self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)"
+                " RETURNING key, namespace, model, temperature",
+                (overflow,)))
+
+    # ----- read-through helpers -----
+    def get_or_call(self, text, call, model, temperature=None, namespace="default"):
+        """Return a cached answer for `text`, or run `call()` and cache its result."""
+        cached = self.get_exact(text, model, temperature, namespace)
+        if cached is not None:
+            tracing.annotate(cache="exact")
+            return cached
+        embedding = None
+        if self.embed is not None:
+            embedding = self.embed(normalize(text))
+            cached = self.get_similar(embedding, model, temperature, namespace)
+            if cached is not None:
+                tracing.annotate(cache="semantic")
+                return cached
+        self.counters["misses"] += 1
+        tracing.annotate(cache="miss")
+        response = call()
+        self.put(text, response, model, temperature, namespace, embedding)
+        return response
+
+    async def aget_or_call(self, text, call, model, temperature=None, namespace="default"):
+        """Async variant of get_or_call; `call` is a coroutine function, SQLite and embeds run in a thread."""
+        cached = await asyncio.to_thread(self.get_exact, text, model, temperature, namespace)
+        if cached is not None:
+            tracing.annotate(cache="exact")
+            return cached
+        embedding = None
+        if self.embed is not None:
+            embedding = await asyncio.to_thread(self.embed, normalize(text))
+            cached = await asyncio.to_thread(self.get_similar, embedding, model, temperature, namespace)
+            if cached is not None:
+                tracing.annotate(cache="semantic")
+                return cached
+        self.counters["misses"] += 1
+        tracing.annotate(cache="miss")
+        response = await call()
+        await asyncio.to_thread(self.put, text, response, model, temperature, namespace, embedding)
+        return response
+
+    async def astream_or_call(self, text, stream, model, temperature=None, namespace="default"):
+        """
+        Streaming variant of aget_or_call: `stream()` returns an async generator of text pieces.
+        A cached answer is yielded in one piece; a streamed answer is cached once it has finished.
+        """
+        cached = await asyncio.to_thread(self.get_exact, text, model, temperature, namespace)
+        if cached is None and self.embed is not None:
+            embedding = await asyncio.to_thread(self.embed, normalize(text))
+            cached = await asyncio.to_thread(self.get_similar, embedding, model, temperature, namespace)
+            hit = "semantic"
+        else:
+            embedding, hit = None, "exact"
+        if cached is not None:
+            tracing.annotate(cache=hit)
+            yield cached
+            return
+        self.counters["misses"] += 1
+        tracing.annotate(cache="miss")
+        parts = []
+        pieces = stream()
+        try:
+            async for piece in pieces:
+                parts.append(piece)
+                yield piece
+        finally:
+            await pieces.aclose()
+        await asyncio.to_thread(self.put, text, "".join(parts), model, temperature, namespace, embedding)
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters plus the current number of entries."""
+        with self._lock:
+            entries = self._entries
+        lookups = self.counters["hits_exact"] + self.counters["hits_semantic"] + self.counters["misses"]
+        hits = self.counters["hits_exact"] + self.counters["hits_semantic"]
+        return {**self.counters, "entries": entries, "hit_rate": hits / lookups if lookups else 0.0}
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._db.close()
+
+
+_default_cache = None
+
+
+def get_cache() -> ResponseCache:
+    """
+    Process-wide cache configured from the environment:
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL and
+    RESPONSE_CACHE_SIMILARITY (set it, e.g. to 0.95, to enable the embedding fallback).
+    """
+    global _default_cache
+    if _default_cache is None:
+        similarity = os.getenv("RESPONSE_CACHE_SIMILARITY")
+        _default_cache = ResponseCache(
+            path=os.getenv("RESPONSE_CACHE_PATH", "response_cache.db"),
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600))),
+            similarity_threshold=float(similarity) if similarity else 0.95,
+            embed=openai_embedder() if similarity else None,
+        )
+    return _default_cache
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+import analytics
+
+# ---------------------------
+# Incremental Revenue Summary (sales.csv -> summary.csv)
+# ---------------------------
+# sales.csv is append-only, so re-reading it from the top on every run wastes almost all of
+# the work. This job remembers the byte offset and row count it has folded in, reads only
+# the bytes appended since, and adds them to per-product and per-month partial aggregates
+# kept in a small JSON state file. summary.csv and revenue_per_product.png are rewritten
+# only when their content differs from the summary.csv already on disk.
+#
+# The summary always equals a full recompute over the current file. A replaced file (new
+# inode, i.e. rotation), a file shorter than the offset (truncation) or changed leading
+# bytes (rewritten in place) discard the partials and rebuild from byte 0 of the current
+# file. update() reports this as "rebuilt". After a rotation, the totals of the old file
+# are dropped, and so is any tail of it that was appended after the last run. Run the job
+# right before rotating if those rows matter.
+# Revenue is summed in integer cents, so incremental and full runs agree exactly. A
+# trailing line without a newline is treated as still being written and waits for the
+# next run. Only one job should update a given state file at a time.
+
+SALES_CSV = os.getenv("SALES_CSV", "sales.csv")
+SUMMARY_CSV = os.getenv("SALES_SUMMARY_CSV", "summary.csv")
+SUMMARY_CHART = os.getenv("SALES_SUMMARY_CHART", "revenue_per_product.png")
+STATE_PATH = os.getenv("SALES_SUMMARY_STATE", ".sales_summary_state.json")
+BLOCK_BYTES = int(os.getenv("SALES_SUMMARY_BLOCK_BYTES", str(16 * 1024 * 1024)))
+HEAD_BYTES = 4096  # Leading bytes fingerprinted to notice a file rewritten in place.
+
+REQUIRED_COLUMNS = ("date", "product", "quantity", "price")
+
+
+def _empty_state() -> dict:
+    return {"version": 1, "device": None, "inode": None, "offset": 0, "rows": 0, "dropped": 0,
+            "header": None, "head_sha256": None, "head_len": 0,
+            "products": {}, "periods": {}}
+
+
+def _head_digest(path, length) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _read_text(path):
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _fold(groups, keys, cents, quantities):
+    """Add per-key revenue (cents), quantity and row counts of one chunk into `groups`."""
+    labels, codes = np.unique(keys, return_inverse=True)
+    sums = np.bincount(codes, weights=cents, minlength=len(labels))
+    counts = np.bincount(codes, minlength=len(labels))
+    quantity_sums = np.bincount(codes, weights=quantities, minlength=len(labels))
+    for label, cents_sum, count, quantity in zip(labels.tolist(), sums, counts, quantity_sums):
+        group = groups.setdefault(label, {"revenue_cents": 0, "quantity": 0, "rows": 0})
+        group["revenue_cents"] += int(round(cents_sum))
+        group["quantity"] += int(round(quantity))
+        group["rows"] += int(count)
+
+
+class RevenueSummary:
+    """Append-aware revenue-per-product job; call update() as often as new rows may have arrived."""
+
+    def __init__(self, source: str = None, summary_path: str = None, chart_path: str = None,
+                 state_path: str = None, block_bytes: int = None):
+        self.source = source or SALES_CSV
+        self.summary_path = summary_path or SUMMARY_CSV
+        self.chart_path = chart_path if chart_path is not None else SUMMARY_CHART
+        self.state_path = state_path or STATE_PATH
+        self.block_bytes = block_bytes or BLOCK_BYTES
+        self.state = self._load_state()
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return _empty_state()
+        if state.get("version") != 1 or state.get("source") not in (None, os.path.abspath(self.source)):
+            return _empty_state()
+        return state
+
+    def _save_state(self):
+        self.state["source"] = os.path.abspath(self.source)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def reset_reason(self, stat) -> str:
+        """Why the partials no longer describe the file ('rotated', 'truncated', 'rewritten'), or None."""
+        state = self.state
+        if state["inode"] is None:
+            return None
+        if (stat.st_dev, stat.st_ino) != (state["device"], state["inode"]):
+            return "rotated"
+        if stat.st_size < state["offset"]:
+            return "truncated"
+        if state["head_len"] and _head_digest(self.source, state["head_len"]) != state["head_sha256"]:
+            return "rewritten"
+        return None
+
+    def update(self, full: bool = False) -> dict:
+        """Fold newly appended rows in and refresh the outputs if totals changed; returns run statistics."""
+        started = time.perf_counter()
+        stat = os.stat(self.source)
+        reason = "full" if full else self.reset_reason(stat)
+        if reason is not None:
+            self.state = _empty_state()
+        state = self.state
+        state["device"], state["inode"] = stat.st_dev, stat.st_ino
+        start_offset, start_rows = state["offset"], state["rows"]
+
+        with open(self.source, "rb") as f:
+            f.seek(state["offset"])
+            carry = b""
+            while True:
+                block = f.read(self.block_bytes)
+                if not block:
+                    break
+                data = carry + block
+                cut = data.rfind(b"\n") + 1
+                if cut == 0:
+                    carry = data  # A single line longer than the block; keep reading.
+                    continue
+                self._fold_lines(data[:cut])
+                state["offset"] += cut
+                carry = data[cut:]
+
+        head_len = min(state["offset"], HEAD_BYTES)
+        if head_len != state["head_len"]:
+            state["head_len"] = head_len
+            state["head_sha256"] = _head_digest(self.source, head_len)
+
+        summary_text = self.summary_csv()
+        changed = summary_text != _read_text(self.summary_path)  # Also right after a rebuild or --full.
+        if changed:
+            tmp = self.summary_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(summary_text)
+            os.replace(tmp, self.summary_path)
+        chart = None
+        if self.chart_path and (changed or not os.path.exists(self.chart_path)):
+            chart = self._write_chart()
+        self._save_state()
+        return {
+            "reset": reason, "rebuilt": reason is not None,
+            "bytes_read": state["offset"] - start_offset, "new_rows": state["rows"] - start_rows,
+            "rows": state["rows"], "dropped": state["dropped"], "pending_bytes": stat.st_size - state["offset"],
+            "changed": changed, "wrote_summary": changed, "chart": chart,
+            "seconds": time.perf_counter() - started,
+        }
+
+    def _fold_lines(self, data: bytes):
+        state = self.state
+        text = data.decode("utf-8")
+        if state["header"] is None:
+            header, _, text = text.partition("\n")
+            state["header"] = header.rstrip("\r")
+            columns = [c.strip().lower() for c in state["header"].split(",")]
+            missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+            if missing:
+                raise ValueError(f"{self.source} has no {', '.join(missing)} column(s); header is {state['header']!r}")
+        if not text:
+            return
+        # Reuse the analytics engine's chunked parser (and its rules for malformed rows).
+        columns = [c.strip().lower() for c in state["header"].split(",")]
+        dataset = analytics.Dataset(None, os.path.basename(self.source), columns, text=state["header"] + "\n" + text)
+        for chunk, dropped in analytics.iter_chunks(dataset):
+            state["dropped"] += dropped
+            state["rows"] += len(chunk["value"]) + dropped
+            if not len(chunk["value"]):
+                continue
+            cents = np.rint(chunk["value"] * 100)
+            _fold(state["products"], chunk["product"], cents, chunk["quantity"])
+            _fold(state["periods"], analytics._period_keys(chunk["date"], "month"), cents, chunk["quantity"])
+
+    def revenue_per_product(self) -> dict:
+        return {product: group["revenue_cents"] / 100 for product, group in sorted(self.state["products"].items())}
+
+    def revenue_per_period(self) -> dict:
+        """Revenue per YYYY-MM."""
+        return {period: group["revenue_cents"] / 100 for period, group in sorted(self.state["periods"].items())}
+
+    def summary_csv(self) -> str:
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")  # Quotes product names with commas or quotes.
+        writer.writerow(["product", "revenue"])
+        for product, group in sorted(self.state["products"].items()):
+            cents = group["revenue_cents"]
+            writer.writerow([product, f"{'-' if cents < 0 else ''}{abs(cents) // 100}.{abs(cents) % 100:02d}"])
+        return out.getvalue()
+
+    def _write_chart(self) -> str:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+        except ImportError:
+            return "skipped (matplotlib is not installed)"
+        revenue = self.revenue_per_product()
+        fig, ax = plt.subplots(figsize=(8, 5))
+        ax.bar(list(revenue), list(revenue.values()))
+        ax.set_title("Revenue per product")
+        ax.set_ylabel("Revenue")
+        fig.tight_layout()
+        fig.savefig(self.chart_path)
+        plt.close(fig)
+        return self.chart_path
+
+
+def update_summary(**kwargs) -> dict:
+    """Run one incremental update with the default (environment-configured) paths."""
+    return RevenueSummary(**kwargs).update()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally update summary.csv from sales.csv.")
+    parser.add_argument("--source", default=SALES_CSV)
+    parser.add_argument("--summary", default=SUMMARY_CSV)
+    parser.add_argument("--chart", default=SUMMARY_CHART, help="Chart path ('' to skip the chart).")
+    parser.add_argument("--state", default=STATE_PATH)
+    parser.add_argument("--full", action="store_true", help="Discard the partials and re-read the whole file.")
+    args = parser.parse_args()
+    job = RevenueSummary(args.source, args.summary, args.chart, args.state)
+    stats = job.update(full=args.full)
+    if stats["reset"] in ("rotated", "truncated", "rewritten"):
+        print(f"warning: {args.source} was {stats['reset']}; rebuilt the summary from the current file only",
+              file=sys.stderr)
+    print(", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in stats.items()))
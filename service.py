@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+
+import llm_client
+from response_cache import normalize
+from streaming import sse_event
+
+# ---------------------------
+# HTTP Service
+# ---------------------------
+# Serves the levels over HTTP. POST /route and /tool_calling take {"question": ...}.
+# Concurrent requests are coalesced before any upstream work: identical questions in
+# flight share one answer, and distinct ones arriving within BATCH_WINDOW are handed over
+# as one batch (the router routes a whole batch with a single LLM call). Each endpoint
+# has a bounded queue; when it is full, requests are rejected right away with 503 and
+# Retry-After instead of queueing without limit. All model calls share llm_client's pool.
+#
+# The /stream endpoints answer with server-sent events:
+# one "token" event per piece of text as it arrives from the model, then a "done" event
+# with the time to first token and the total time, or an "error" event; /stream/route
+# returns the route as soon as the streamed routing answer contains it. Run with
+#   python service.py --port 8000
+# and try  curl -N "localhost:8000/stream/simple?question=What+is+the+capital+of+France%3F"
+# Starlette and uvicorn are only needed to serve, not to import the levels.
+
+
+BATCH_WINDOW = float(os.getenv("SERVICE_BATCH_WINDOW", "0.01"))
+MAX_BATCH = int(os.getenv("SERVICE_MAX_BATCH", "16"))
+MAX_PENDING = int(os.getenv("SERVICE_MAX_PENDING", "256"))
+MAX_BATCHES_IN_FLIGHT = int(os.getenv("SERVICE_MAX_BATCHES_IN_FLIGHT", "8"))
+
+# The level functions are blocking; they run on this pool (the sync client is shared too).
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SERVICE_WORKERS", "32")), thread_name_prefix="service")
+
+
+class Overloaded(Exception):
+    """The queue of a MicroBatcher is full."""
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into shared upstream work. Requests with the same key share
+    one future; distinct ones are collected for up to `window` seconds (or `max_batch` items)
+    and passed to `handler(items) -> results` together. At most `max_pending` requests wait in
+    the queue and `max_batches` batches run at once; beyond that submit() raises Overloaded.
+    `dedupe=False` gives every request its own upstream work (for comparisons).
+    """
+
+    def __init__(self, handler, window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH,
+                 max_pending: int = MAX_PENDING, max_batches: int = MAX_BATCHES_IN_FLIGHT, dedupe: bool = True):
+        self.handler = handler
+        self.dedupe = dedupe
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_batches = max_batches
+        self._queue = None
+        self._slots = None
+        self._worker = None
+        self._in_flight = {}
+        self.counters = {"requests": 0, "deduped": 0, "rejected": 0, "batches": 0, "batched_items": 0, "errors": 0}
+
+    def _start(self):
+        # Created on first use so they belong to the server's event loop.
+        self._queue = asyncio.Queue(self.max_pending)
+        self._slots = asyncio.Semaphore(self.max_batches)
+        self._worker = asyncio.get_running_loop().create_task(self._collect())
+
+    async def submit(self, item, key=None):
+        if self._worker is None:
+            self._start()
+        self.counters["requests"] += 1
+        key = (item if key is None else key) if self.dedupe else object()
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.counters["deduped"] += 1
+        elif self._queue.full():
+            self.counters["rejected"] += 1
+            raise Overloaded(f"{self._queue.qsize()} requests already queued")
+        else:
+            future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((key, item))
+        # A client that disconnects must not cancel work other requests are waiting for.
+        return await asyncio.shield(future)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Waiting for a slot lets the queue fill up, which is what pushes back on clients.
+            await self._slots.acquire()
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        self.counters["batches"] += 1
+        self.counters["batched_items"] += len(batch)
+        try:
+            results = await self.handler([item for _, item in batch])
+        except Exception as e:
+            self.counters["errors"] += 1
+            results = [e] * len(batch)
+        finally:
+            self._slots.release()
+        for (key, _), result in zip(batch, results):
+            future = self._in_flight.pop(key)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                future.exception()  # Mark as retrieved in case every waiter has gone away.
+            else:
+                future.set_result(result)
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def stats(self) -> dict:
+        batches = self.counters["batches"]
+        return {**self.counters, "queued": self._queue.qsize() if self._queue else 0, "in_flight": len(self._in_flight),
+                "mean_batch": self.counters["batched_items"] / batches if batches else 0.0}
+
+
+async def route_batch(questions):
+    from level2 import route_many
+    return await asyncio.get_running_loop().run_in_executor(_executor, route_many, questions)
+
+
+async def tool_calling_batch(questions):
+    # Each question needs its own tool calls, so a batch runs concurrently rather than in one prompt.
+    from level3 import tool_calling
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(_executor, tool_calling, q) for q in questions),
+                                return_exceptions=True)
+
+
+async def _param(request, name: str) -> str:
+    """`name` from the query string (EventSource) or a JSON body (POST)."""
+    value = request.query_params.get(name)
+    if value is None and request.method == "POST":
+        value = (await request.json()).get(name)
+    if not value:
+        from starlette.exceptions import HTTPException
+        raise HTTPException(400, f"Missing '{name}'")
+    return value
+
+
+async def _sse(pieces):
+    """Forward text pieces as "token" events and finish with timings."""
+    started = time.perf_counter()
+    ttft_ms = None
+    try:
+        async with aclosing(pieces):
+            async for piece in pieces:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                yield sse_event({"text": piece}, event="token")
+    except Exception as e:
+        yield sse_event({"error": f"{type(e).__name__}: {e}"}, event="error")
+        return
+    yield sse_event({"ttft_ms": ttft_ms, "total_ms": (time.perf_counter() - started) * 1000}, event="done")
+
+
+def _event_stream(pieces):
+    from starlette.responses import StreamingResponse
+    return StreamingResponse(_sse(pieces), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def stream_simple(request):
+    from level1 import stream_simple_processor
+    return _event_stream(stream_simple_processor(await _param(request, "question")))
+
+
+async def stream_report(request):
+    from level4 import stream_data_analysis_agent
+    return _event_stream(stream_data_analysis_agent(await _param(request, "query")))
+
+
+async def stream_route(request):
+    from starlette.responses import JSONResponse
+    from level2 import llm_router_stream
+    started = time.perf_counter()
+    route = await llm_router_stream(await _param(request, "question"))
+    return JSONResponse({"route": route, "ms": (time.perf_counter() - started) * 1000})
+
+
+async def _batched(request, batcher, field):
+    from starlette.responses import JSONResponse
+    question = await _param(request, "question")
+    try:
+        result = await batcher.submit(question, key=normalize(question))
+    except Overloaded as e:
+        return JSONResponse({"error": f"Overloaded: {e}"}, status_code=503, headers={"Retry-After": "1"})
+    return JSONResponse({field: result})
+
+
+def create_app(window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH, max_pending: int = MAX_PENDING,
+               coalesce: bool = True):
+    """The service; coalesce=False turns off batching and in-flight dedupe (queue limits still apply)."""
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    max_batches = MAX_BATCHES_IN_FLIGHT
+    if not coalesce:  # Same number of requests in flight, one per "batch".
+        window, max_batch, max_batches = 0.0, 1, MAX_BATCHES_IN_FLIGHT * max_batch
+    batchers = {
+        "route": MicroBatcher(route_batch, window, max_batch, max_pending, max_batches, dedupe=coalesce),
+        "tool_calling": MicroBatcher(tool_calling_batch, window, max_batch, max_pending, max_batches, dedupe=coalesce),
+    }
+
+    async def route(request):
+        return await _batched(request, batchers["route"], "route")
+
+    async def tool_calling(request):
+        return await _batched(request, batchers["tool_calling"], "answer")
+
+    async def stats(request):
+        return JSONResponse({**{name: b.stats() for name, b in batchers.items()},
+                             "llm": llm_client.get_limiter().stats()})
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        for batcher in batchers.values():
+            batcher.close()
+        await llm_client.aclose()
+
+    return Starlette(
+        routes=[
+            Route("/route", route, methods=["POST"]),
+            Route("/tool_calling", tool_calling, methods=["POST"]),
+            Route("/stats", stats),
+            Route("/stream/simple", stream_simple, methods=["GET", "POST"]),
+            Route("/stream/report", stream_report, methods=["GET", "POST"]),
+            Route("/stream/route", stream_route, methods=["GET", "POST"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve the levels over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-coalesce", action="store_true", help="Disable micro-batching and in-flight dedupe.")
+    args = parser.parse_args()
+    uvicorn.run(create_app(coalesce=not args.no_coalesce), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,138 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+
+# ---------------------------
+# Speculative Branch Execution
+# ---------------------------
+# While a slow decision is being made (level2's routing call), start every cheap branch it
+# can lead to. Once the decision is known, cancel the losers and use the winner's result,
+# which is often already done. A loser that had not started yet costs nothing; one that was
+# already running finishes in the background and its run time is counted as wasted work.
+#
+# Speculation pays while the wasted work stays small. The last SPECULATION_WINDOW
+# losers are tracked. When they waste more than SPECULATION_BUDGET_MS on
+# average, speculation is switched off for SPECULATION_COOLDOWN seconds: requests then run
+# the decision first and only the winning branch after it. stats() reports the wasted
+# work next to the latency saved (sequential time minus the actual time).
+
+SPECULATION_BUDGET_MS = float(os.getenv("SPECULATION_BUDGET_MS", "50"))
+SPECULATION_WINDOW = int(os.getenv("SPECULATION_WINDOW", "50"))
+SPECULATION_COOLDOWN = float(os.getenv("SPECULATION_COOLDOWN", "60"))
+SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "4"))
+
+
+def _timed(branch, argument):
+    started = time.perf_counter()
+    result = branch(argument)
+    return result, time.perf_counter() - started
+
+
+class Speculator:
+    """Runs `decide(x)` with all `branches` (decision -> callable(x)) started alongside it, within a waste budget."""
+
+    def __init__(self, branches: dict, budget_ms: float = None, window: int = None, cooldown: float = None,
+                 workers: int = None):
+        self.branches = branches
+        self.budget_ms = SPECULATION_BUDGET_MS if budget_ms is None else budget_ms
+        self.cooldown = SPECULATION_COOLDOWN if cooldown is None else cooldown
+        self.counters = {"requests": 0, "speculated": 0, "sequential": 0, "disabled": 0, "hits": 0,
+                         "losers_cancelled": 0, "losers_run": 0, "wasted_ms": 0.0, "saved_ms": 0.0}
+        self._recent_waste = deque(maxlen=window or SPECULATION_WINDOW)  # Wasted ms per loser.
+        self._disabled_until = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers or SPECULATION_WORKERS,
+                                            thread_name_prefix="speculation")
+
+    def enabled(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._disabled_until
+
+    def run(self, argument, decide, speculate: bool = True):
+        """(decision, winning branch result or None). `decide` runs on the calling thread."""
+        with self._lock:
+            self.counters["requests"] += 1
+        if not speculate or not self.enabled():
+            return self._sequential(argument, decide)
+        with self._lock:
+            self.counters["speculated"] += 1
+        started = time.perf_counter()
+        futures = {decision: self._executor.submit(contextvars.copy_context().run, _timed, branch, argument)
+                   for decision, branch in self.branches.items()}
+        with tracing.span("speculative_decide", kind="internal", branches=len(futures)) as span:
+            try:
+                decision = decide(argument)
+            except BaseException:
+                for future in futures.values():
+                    if not future.cancel():
+                        future.add_done_callback(self._record_waste)
+                raise
+            decided_s = time.perf_counter() - started
+            for other, future in futures.items():
+                if other == decision:
+                    continue
+                if future.cancel():
+                    with self._lock:
+                        self.counters["losers_cancelled"] += 1
+                    self._account_waste(0.0)
+                else:
+                    future.add_done_callback(self._record_waste)
+            winner = futures.get(decision)
+            if winner is None:
+                result, branch_s = self._run_branch(decision, argument)
+            else:
+                hit = winner.done()
+                result, branch_s = winner.result()
+                with self._lock:
+                    self.counters["hits"] += hit
+            saved_ms = max(0.0, (decided_s + branch_s - (time.perf_counter() - started)) * 1000)
+            with self._lock:
+                self.counters["saved_ms"] += saved_ms
+            span.set(decision=decision, saved_ms=round(saved_ms, 2))
+        return decision, result
+
+    def _sequential(self, argument, decide):
+        with self._lock:
+            self.counters["sequential"] += 1
+        decision = decide(argument)
+        return decision, self._run_branch(decision, argument)[0]
+
+    def _run_branch(self, decision, argument):
+        branch = self.branches.get(decision)
+        return _timed(branch, argument) if branch is not None else (None, 0.0)
+
+    def _record_waste(self, future):
+        """Done-callback of a loser that ran anyway."""
+        if future.cancelled() or future.exception() is not None:
+            wasted_ms = 0.0
+        else:
+            wasted_ms = future.result()[1] * 1000
+        with self._lock:
+            self.counters["losers_run"] += 1
+        self._account_waste(wasted_ms)
+
+    def _account_waste(self, wasted_ms: float):
+        """Add one loser's wasted time and switch speculation off if the recent average is over budget."""
+        with self._lock:
+            self.counters["wasted_ms"] += wasted_ms
+            self._recent_waste.append(wasted_ms)
+            full = len(self._recent_waste) == self._recent_waste.maxlen
+            if full and sum(self._recent_waste) / len(self._recent_waste) > self.budget_ms:
+                self._disabled_until = time.monotonic() + self.cooldown
+                self.counters["disabled"] += 1
+                self._recent_waste.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            speculated = counters["speculated"] or 1
+            counters.update({
+                "enabled": time.monotonic() >= self._disabled_until,
+                "wasted_ms_per_request": counters["wasted_ms"] / speculated,  # Per speculative request.
+                "saved_ms_per_request": counters["saved_ms"] / speculated,
+            })
+        return counters
@@ -0,0 +1,73 @@
+import json
+
+# ---------------------------
+# Streaming Helpers
+# ---------------------------
+# Structured outputs arrive as a JSON object split over many small deltas. FieldParser
+# tracks nesting and string state as the text comes in and hands back each top-level
+# field the moment its value is complete, so a caller can act on `route` before the rest
+# of the object (or the closing brace) has been generated. sse_event formats one
+# server-sent event for the streaming HTTP endpoints.
+
+
+class FieldParser:
+    """Incremental parser for a streamed JSON object that yields completed top-level fields."""
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member = None  # Characters of the current top-level "key": value member.
+        self.fields = {}
+
+    def feed(self, text: str) -> list:
+        """Consume the next piece of the stream; returns [(name, value)] for fields completed by it."""
+        completed = []
+        for char in text:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member = []
+                    continue
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._finish_member())
+                    self._member = None
+                    continue
+            elif char == "," and self._depth == 1:
+                completed.extend(self._finish_member())
+                self._member = []
+                continue
+            if self._member is not None:
+                self._member.append(char)
+        return completed
+
+    def _finish_member(self) -> list:
+        member = "".join(self._member or []).strip()
+        if not member:
+            return []
+        try:
+            parsed = json.loads("{" + member + "}")
+        except ValueError:
+            return []
+        self.fields.update(parsed)
+        return list(parsed.items())
+
+
+def sse_event(data, event: str = None) -> str:
+    """One server-sent event; `data` that is not a string is sent as JSON."""
+    if not isinstance(data, str):
+        data = json.dumps(data)
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,124 @@
+import json
+import re
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Callable
+from pydantic import BaseModel, TypeAdapter
+
+# ---------------------------
+# Tool Registry (function calling)
+# ---------------------------
+# One place for the tools a chat-completions call may use. Each tool's JSON schema is built
+# once and reused for every request. Its arguments are validated straight from the JSON string
+# by a pydantic TypeAdapter built at registration. Calls are dispatched through a name -> tool
+# table. select() is a cheap keyword prefilter: it picks the tools that are relevant to a
+# question, so a request carries only their schemas instead of the whole catalog. A question
+# that matches no keyword gets every tool, so the prefilter never hides the right one.
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+@dataclass
+class Tool:
+    name: str
+    description: str
+    arguments: type[BaseModel]
+    handler: Callable[[BaseModel], str]
+    keywords: frozenset = field(default_factory=frozenset)
+    always: bool = False  # Sent with every request, whatever the prefilter says.
+
+    def __post_init__(self):
+        self.adapter = TypeAdapter(self.arguments)
+        self.keywords = frozenset(word for keyword in self.keywords for word in _words(keyword))
+
+    @cached_property
+    def schema(self) -> dict:
+        """The `tools` entry of this tool (strict function calling)."""
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {**self.arguments.model_json_schema(), "additionalProperties": False},
+                "strict": True,
+            },
+        }
+
+    def validate(self, arguments: str) -> BaseModel:
+        """Parse and validate the JSON arguments of one call (raises pydantic.ValidationError)."""
+        return self.adapter.validate_json(arguments or "{}")
+
+
+class ToolRegistry:
+    """Tools by name, with cached schemas, precompiled validators and a keyword prefilter."""
+
+    def __init__(self, tools=()):
+        self._tools = {}
+        self._schema_lists = {}
+        for tool in tools:
+            self.register(tool)
+
+    def register(self, tool: Tool) -> Tool:
+        if tool.name in self._tools:
+            raise ValueError(f"Tool {tool.name!r} is already registered")
+        self._tools[tool.name] = tool
+        self._schema_lists.clear()
+        return tool
+
+    def tool(self, name: str, description: str, arguments: type[BaseModel], keywords=(), always: bool = False):
+        """Decorator form of register() for a handler function."""
+        def decorator(handler):
+            self.register(Tool(name, description, arguments, handler, frozenset(keywords), always))
+            return handler
+        return decorator
+
+    def __contains__(self, name) -> bool:
+        return name in self._tools
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    @property
+    def names(self) -> list:
+        return list(self._tools)
+
+    def get(self, name: str) -> Tool:
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise ValueError(f"Unknown tool {name!r}") from None
+
+    def schemas(self, names=None) -> list:
+        """The `tools` list for a request; the same list object is returned for the same selection."""
+        key = tuple(self._tools) if names is None else tuple(names)
+        schemas = self._schema_lists.get(key)
+        if schemas is None:
+            schemas = self._schema_lists[key] = [self.get(name).schema for name in key]
+        return schemas
+
+    def select(self, question: str, max_tools: int = None) -> list:
+        """
+        Names of the tools worth offering for `question`, most relevant first: tools sharing a
+        keyword with it, plus the `always` tools. Every tool if none matches.
+        """
+        words = _words(question)
+        scored = [(len(tool.keywords & words), index, tool.name) for index, tool in enumerate(self._tools.values())]
+        matched = [name for score, _, name in sorted(scored, key=lambda s: (-s[0], s[1])) if score]
+        if not matched:
+            return self.names
+        if max_tools:
+            matched = matched[:max_tools]
+        return matched + [name for name, tool in self._tools.items() if tool.always and name not in matched]
+
+    def dispatch(self, name: str, arguments: str) -> str:
+        """Validate the JSON arguments of one call and run its handler."""
+        tool = self.get(name)
+        return tool.handler(tool.validate(arguments))
+
+    def schema_tokens(self, names=None) -> int:
+        """Approximate prompt tokens the schemas of `names` add to a request (~4 characters each)."""
+        return len(json.dumps(self.schemas(names))) // 4
@@ -0,0 +1,279 @@
+import argparse
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from metrics import percentile
+
+# ---------------------------
+# Lightweight Tracing for Agent Runs
+# ---------------------------
+# Records one span per agent run, model request, tool call and LLM helper call, with
+# wall time, queue time (waiting for a concurrency slot), prompt/completion tokens and
+# cache hits. Spans are appended to a JSONL file as they finish, and the file can be
+# converted to OpenTelemetry's OTLP/JSON format. While tracing is disabled, span()
+# returns a shared no-op object, so instrumented code only pays for one flag check.
+#
+# Enable with TRACE_FILE=trace.jsonl or tracing.enable("trace.jsonl").
+
+_enabled = False
+_sink = None
+_sink_lock = threading.Lock()
+_collected = None
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start", "end",
+                 "queue_s", "prompt_tokens", "completion_tokens", "attributes", "error", "_token")
+
+    def __init__(self, name, kind, parent, attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.end = None
+        self.queue_s = 0.0
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def set_queue_time(self, seconds: float):
+        self.queue_s = seconds
+
+    def set_tokens(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    def set_usage(self, usage):
+        """Copy tokens from an OpenAI `usage` object (None is ignored)."""
+        if usage is not None:
+            self.set_tokens(usage.prompt_tokens, usage.completion_tokens)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            pass  # Span held open by an async generator that was closed from another context.
+        self.end = time.time()
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _export(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "kind": self.kind, "start": self.start, "end": self.end,
+            "wall_ms": round((self.end - self.start) * 1000, 3), "queue_ms": round(self.queue_s * 1000, 3),
+            "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+            "attributes": self.attributes, "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled."""
+
+    def set(self, **attributes):
+        pass
+
+    def set_queue_time(self, seconds):
+        pass
+
+    def set_tokens(self, prompt_tokens, completion_tokens):
+        pass
+
+    def set_usage(self, usage):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(path: str = None, collect: bool = False):
+    """Start tracing: append spans to the JSONL file at `path` and/or keep them in memory (collected_spans())."""
+    global _enabled, _sink, _collected
+    disable()
+    if path:
+        _sink = open(path, "a", encoding="utf-8")
+    _collected = [] if collect else None
+    _enabled = True
+
+
+def disable():
+    global _enabled, _sink
+    _enabled = False
+    if _sink is not None:
+        _sink.close()
+        _sink = None
+
+
+def collected_spans() -> list:
+    return list(_collected or [])
+
+
+def _export(span: Span):
+    record = span.to_dict()
+    with _sink_lock:
+        if _collected is not None:
+            _collected.append(record)
+        if _sink is not None:
+            _sink.write(json.dumps(record, default=str) + "\n")
+            _sink.flush()
+
+
+def span(name: str, kind: str = "internal", **attributes):
+    """Context manager for a span nested under the current one (a no-op while tracing is disabled)."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, kind, _current_span.get(), attributes)
+
+
+def annotate(**attributes):
+    """Attach attributes (e.g. cache="exact") to the span that is currently open, if any."""
+    if _enabled:
+        current = _current_span.get()
+        if current is not None:
+            current.set(**attributes)
+
+
+def add_queue_time(seconds: float):
+    """Add time spent waiting for admission (rate limits, concurrency) to the current span."""
+    if _enabled:
+        current = _current_span.get()
+        if current is not None:
+            current.queue_s += seconds
+
+
+def traced_tool(func):
+    """Decorator for async agent tools; place it below @agent.tool."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if not _enabled:
+            return await func(*args, **kwargs)
+        with span(func.__name__, kind="tool_call"):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+if os.getenv("TRACE_FILE"):
+    enable(os.getenv("TRACE_FILE"))
+
+
+# ---------------------------
+# Exporting and Summarizing Trace Files
+# ---------------------------
+def read_spans(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans, service_name: str = "5levels") -> dict:
+    """Convert span dicts into an OTLP/JSON ExportTraceServiceRequest body."""
+    otlp_spans = []
+    for record in spans:
+        attributes = {"span.kind": record["kind"], "queue_ms": record["queue_ms"], **record["attributes"]}
+        if record["prompt_tokens"] is not None:
+            attributes["gen_ai.usage.input_tokens"] = record["prompt_tokens"]
+            attributes["gen_ai.usage.output_tokens"] = record["completion_tokens"]
+        otlp_spans.append({
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            **({"parentSpanId": record["parent_id"]} if record["parent_id"] else {}),
+            "name": record["name"],
+            "kind": 3 if record["kind"] in ("model_request", "llm_call") else 1,  # CLIENT or INTERNAL
+            "startTimeUnixNano": str(int(record["start"] * 1e9)),
+            "endTimeUnixNano": str(int(record["end"] * 1e9)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None],
+            "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": otlp_spans}],
+    }]}
+
+
+def summarize(spans) -> list:
+    """Per (kind, name): calls, total/mean/p95 wall time, queue time, tokens, cache hits and streamed
+    time to first token, hottest first."""
+    groups = defaultdict(list)
+    for record in spans:
+        groups[(record["kind"], record["name"])].append(record)
+    rows = []
+    for (kind, name), records in groups.items():
+        walls = [r["wall_ms"] for r in records]
+        ttfts = [r["attributes"]["ttft_ms"] for r in records if "ttft_ms" in r["attributes"]]
+        rows.append({
+            "kind": kind, "name": name, "calls": len(records),
+            "total_ms": sum(walls), "mean_ms": sum(walls) / len(walls), "p95_ms": percentile(walls, 95),
+            "queue_ms": sum(r["queue_ms"] for r in records),
+            "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in records),
+            "completion_tokens": sum(r["completion_tokens"] or 0 for r in records),
+            "cache_hits": sum(1 for r in records if r["attributes"].get("cache") not in (None, "miss")),
+            "ttft_p50_ms": percentile(ttfts, 50) if ttfts else None,
+            "errors": sum(1 for r in records if r["error"]),
+        })
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect trace files written by tracing.py.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary_cmd = commands.add_parser("summary", help="Show the hot spots of a trace file.")
+    summary_cmd.add_argument("trace")
+    summary_cmd.add_argument("--top", type=int, default=20)
+    otlp_cmd = commands.add_parser("otlp", help="Convert a trace file to OTLP/JSON.")
+    otlp_cmd.add_argument("trace")
+    otlp_cmd.add_argument("output")
+    args = parser.parse_args()
+
+    spans = read_spans(args.trace)
+    if args.command == "otlp":
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(to_otlp(spans), f)
+        print(f"Wrote {len(spans)} spans to {args.output}")
+    else:
+        header = (f"{'kind':<14} {'name':<24} {'calls':>6} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9} "
+                  f"{'queue ms':>9} {'ttft ms':>8} {'prompt tok':>10} {'compl tok':>9} {'cache':>6} {'err':>4}")
+        print(header)
+        print("-" * len(header))
+        for row in summarize(spans)[:args.top]:
+            print(f"{row['kind']:<14} {row['name'][:24]:<24} {row['calls']:>6} {row['total_ms']:>10.1f} "
+                  f"{row['mean_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['queue_ms']:>9.1f} "
+                  f"{'-' if row['ttft_p50_ms'] is None else format(row['ttft_p50_ms'], '.1f'):>8} "
+                  f"{row['prompt_tokens']:>10} {row['completion_tokens']:>9} {row['cache_hits']:>6} {row['errors']:>4}")
+
@@ -0,0 +1,280 @@
+import argparse
+import contextvars
+import glob
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+# ---------------------------
+# Agent Run Transcripts
+# ---------------------------
+# Every step of an agent run (the new request parts, then the model's response) is written
+# to a gzip-compressed, append-only JSON-lines log as it happens. Nothing is kept in memory
+# and nothing is printed, so thousands of runs cost neither RSS nor stdout time. Records:
+#   {"run": id, "seq": n, "t": unix time, "type": "start" | "request" | "response" | "truncated" | "end", ...}
+#
+# - Each process writes its own segment in TRANSCRIPT_DIR (default transcripts/). A new
+#   segment starts after TRANSCRIPT_SEGMENT_BYTES compressed bytes, and only the newest
+#   TRANSCRIPT_MAX_SEGMENTS segments are kept.
+# - TRANSCRIPT_RUN_MAX_BYTES caps the uncompressed size of one run. Past it, a single
+#   "truncated" record is written and later steps are dropped (start and end are always kept).
+# - TRANSCRIPT_SAMPLE_RATE (default 1) keeps the steps of only that fraction of runs. The start
+#   and end records of every run, with its status and error, are always written.
+#
+#   python transcripts.py list            recent runs
+#   python transcripts.py show <run id>   replay one run's steps
+
+TRANSCRIPT_DIR = os.getenv("TRANSCRIPT_DIR", "transcripts")
+SEGMENT_BYTES = int(os.getenv("TRANSCRIPT_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+MAX_SEGMENTS = int(os.getenv("TRANSCRIPT_MAX_SEGMENTS", "20"))
+RUN_MAX_BYTES = int(os.getenv("TRANSCRIPT_RUN_MAX_BYTES", str(256 * 1024)))
+SAMPLE_RATE = float(os.getenv("TRANSCRIPT_SAMPLE_RATE", "1"))
+
+_current = contextvars.ContextVar("transcript", default=None)
+
+
+class TranscriptLog:
+    """Rotating gzip JSON-lines writer; one per process, shared by all its runs (thread-safe)."""
+
+    def __init__(self, directory: str = None, segment_bytes: int = None, max_segments: int = None):
+        self.directory = directory or TRANSCRIPT_DIR
+        self.segment_bytes = segment_bytes or SEGMENT_BYTES
+        self.max_segments = max_segments or MAX_SEGMENTS
+        self.path = None
+        self._raw = None
+        self._gzip = None
+        self._segment = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.directory, f"transcript-{stamp}-{os.getpid()}-{self._segment:04d}.jsonl.gz")
+        self._raw = open(self.path, "ab")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="ab", compresslevel=6)
+        segments = sorted(glob.glob(os.path.join(self.directory, "transcript-*.jsonl.gz")), key=os.path.getmtime)
+        for old in segments[:-self.max_segments]:
+            if old != self.path:
+                os.remove(old)
+
+    def write(self, record: dict):
+        line = (json.dumps(record, default=str) + "\n").encode()
+        with self._lock:
+            if self._gzip is None:
+                self._open()
+            self._gzip.write(line)
+
+    def flush(self):
+        """Make everything written so far readable (a sync flush point in the gzip stream); rotate if due."""
+        with self._lock:
+            if self._gzip is None:
+                return
+            self._gzip.flush(zlib.Z_SYNC_FLUSH)
+            self._raw.flush()
+            if self._raw.tell() >= self.segment_bytes:
+                self._close()
+
+    def _close(self):
+        self._gzip.close()
+        self._raw.close()
+        self._gzip = self._raw = None
+
+    def close(self):
+        with self._lock:
+            if self._gzip is not None:
+                self._close()
+
+
+def _part(part) -> dict:
+    record = {"kind": part.part_kind}
+    if getattr(part, "tool_name", None):
+        record["tool"] = part.tool_name
+    if part.part_kind == "tool-call":
+        record["args"] = part.args if isinstance(part.args, str) else json.dumps(part.args, default=str)
+    else:
+        content = getattr(part, "content", "")
+        record["content"] = content if isinstance(content, str) else json.dumps(content, default=str)
+    return record
+
+
+class RunTranscript:
+    """Writes one run's steps to the log as they happen; holds only counters."""
+
+    def __init__(self, log: TranscriptLog, label: str, max_bytes: int = None, sampled: bool = True, **meta):
+        self.log = log
+        self.run_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.max_bytes = RUN_MAX_BYTES if max_bytes is None else max_bytes
+        self.sampled = sampled
+        self.steps = 0
+        self.bytes = 0
+        self.dropped = 0
+        self._seq = 0
+        self._seen = 0  # Messages of the run's history already written.
+        self._write("start", label=label, sampled=sampled, **meta)
+
+    def _write(self, record_type: str, **fields):
+        self._seq += 1
+        self.log.write({"run": self.run_id, "seq": self._seq, "t": round(time.time(), 3), "type": record_type, **fields})
+
+    def _step(self, record_type: str, parts):
+        if not self.sampled:
+            return
+        if self.bytes >= self.max_bytes:
+            self.dropped += 1
+            return
+        parts = [_part(part) for part in parts]
+        budget, cut = self.max_bytes - self.bytes, False
+        for part in parts:
+            for key in ("content", "args"):
+                text = part.get(key)
+                if text is None:
+                    continue
+                if len(text) > budget:
+                    part[key] = text[:budget] + f"... [{len(text) - budget} characters cut]"
+                    cut = True
+                budget -= min(len(text), budget)
+        self._write(record_type, parts=parts)
+        self.bytes = self.max_bytes - budget
+        self.steps += 1
+        if cut:
+            self._write("truncated", limit_bytes=self.max_bytes)
+
+    def record_history(self, messages):
+        """Write the request messages of the run's history that are new since the last call."""
+        if len(messages) < self._seen:
+            self._seen = 0  # A new agent run inside the same transcript() block.
+        for message in messages[self._seen:]:
+            if message.kind == "request":  # Responses are written by record_response as they arrive.
+                self._step("request", message.parts)
+        self._seen = len(messages) + 1  # + the response this request is about to get.
+
+    def record_response(self, response):
+        self._step("response", response.parts)
+
+    def finish(self, status: str, error: str = None):
+        self._write("end", status=status, error=error, steps=self.steps, bytes=self.bytes, dropped=self.dropped)
+        self.log.flush()
+
+    def summary(self) -> str:
+        extra = f", {self.dropped} dropped over the size cap" if self.dropped else ""
+        kept = "" if self.sampled else " (not sampled: start/end only)"
+        return (f"Transcript {self.run_id}: {self.steps} steps{extra}{kept} in {self.log.path}; "
+                f"replay with: python transcripts.py show {self.run_id}")
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_log() -> TranscriptLog:
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = TranscriptLog()
+        return _log
+
+
+@contextmanager
+def transcript(label: str, sample_rate: float = None, max_bytes: int = None, **meta):
+    """Record the agent runs inside this block to the transcript log; yields the RunTranscript."""
+    rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    run = RunTranscript(get_log(), label, max_bytes, sampled=rate >= 1 or random.random() < rate, **meta)
+    token = _current.set(run)
+    try:
+        yield run
+    except BaseException as e:
+        run.finish("error", f"{type(e).__name__}: {e}")
+        raise
+    else:
+        run.finish("ok")
+    finally:
+        _current.reset(token)
+
+
+def current_transcript():
+    """The RunTranscript of the enclosing transcript() block, or None."""
+    return _current.get()
+
+
+# ---------------------------
+# Reading the Log
+# ---------------------------
+def iter_records(directory: str = None):
+    """Every record in the log, oldest segment first. A segment still being written is read up to its last flush."""
+    directory = directory or TRANSCRIPT_DIR
+    for path in sorted(glob.glob(os.path.join(directory, "transcript-*.jsonl.gz")), key=os.path.getmtime):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        yield json.loads(line)
+        except (EOFError, OSError, zlib.error):
+            continue  # The unfinished tail of a live or crashed segment.
+
+
+def list_runs(directory: str = None, last: int = 20) -> list:
+    """The `last` finished runs (their end records, with label and start time)."""
+    starts, ends = {}, deque(maxlen=last)
+    for record in iter_records(directory):
+        if record["type"] == "start":
+            starts[record["run"]] = record
+        elif record["type"] == "end":
+            start = starts.pop(record["run"], {})
+            ends.append({**record, "label": start.get("label"), "started": start.get("t")})
+    return list(ends)
+
+
+def replay(run_id: str, directory: str = None):
+    """Yield the records of one run (an id prefix is enough) in order."""
+    for record in iter_records(directory):
+        if record["run"].startswith(run_id):
+            yield record
+
+
+def format_record(record: dict, step: int) -> str:
+    if record["type"] in ("request", "response"):
+        lines = [f"Step {step} [{record['type']}]:"]
+        for part in record["parts"]:
+            if part["kind"] == "tool-call":
+                lines.append(f"  Tool Call: {part.get('tool')} with args: {part.get('args')}")
+            elif part["kind"] == "tool-return":
+                lines.append(f"  Tool Return ({part.get('tool')}): {part.get('content')}")
+            else:
+                lines.append(f"  {part['kind'].capitalize()}: {part.get('content')}")
+        return "\n".join(lines) + "\n" + "-" * 50
+    fields = {k: v for k, v in record.items() if k not in ("run", "seq", "t", "type")}
+    return f"[{record['type']}] {json.dumps(fields, default=str)}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect agent run transcripts.")
+    parser.add_argument("--dir", default=TRANSCRIPT_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="Recent runs.")
+    listing.add_argument("--last", type=int, default=20)
+    show = commands.add_parser("show", help="Replay the steps of one run.")
+    show.add_argument("run_id")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for run in list_runs(args.dir, args.last):
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started"])) if run["started"] else "?"
+            print(f"{run['run']}  {started}  {run['label'] or '?':<28} {run['status']:<5} "
+                  f"{run['steps']:>3} steps {run['bytes']:>8} bytes" + (f"  {run['error']}" if run["error"] else ""))
+    else:
+        step = 0
+        for record in replay(args.run_id, args.dir):
+            if record["type"] in ("request", "response"):
+                step += 1
+            print(format_record(record, step))
+        if step == 0:
+            print(f"No steps recorded for run {args.run_id}")